@@ -0,0 +1,34 @@
+"""
+Prometheus指标导出接口
+"""
+
+from flask import Blueprint, Response, request, jsonify
+
+from app.core import metrics
+from app.core.config import Config
+from app.core.logger import LoggerManager
+
+
+metrics_bp = Blueprint('metrics', __name__)
+logger = LoggerManager.get_logger()
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus文本格式的运行指标
+
+    设置了 metrics.key 时需要通过 ?key= 或 Authorization: Bearer 提供密钥
+    """
+    config = Config()
+    if not config.get('metrics.enable', True):
+        return jsonify({'error': '指标接口未启用'}), 404
+
+    correct_key = config.get('metrics.key', '')
+    if correct_key:
+        auth_header = request.headers.get('Authorization', '')
+        key = auth_header[7:] if auth_header.startswith('Bearer ') else request.args.get('key', '')
+        if key != correct_key:
+            logger.warning("指标接口密钥错误")
+            return jsonify({'error': '无效的指标密钥'}), 401
+
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -3,12 +3,18 @@ API路由定义
 """
 
 import os
-from flask import Blueprint, request, jsonify, render_template, send_file, redirect, url_for
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from flask import Blueprint, Response, request, jsonify, render_template, redirect, url_for
 
 from app.core.config import Config
 from app.core.logger import LoggerManager
 from app.core.scheduler import TaskScheduler
-from app.core.netflix_checker import NetflixChecker
+from app.core.results_service import ResultsService, CachedBody, GZIP_MIN_SIZE
+from app.core.result_index import RESULT_QUERY_ARGS
+from app.core.subscription_service import SubscriptionService, STATUS_FILTERS, SORT_KEYS
+from app.core.history_store import HistoryStore
 from app.api.auth import require_auth, check_access_key, generate_token
 
 
@@ -98,12 +104,14 @@ def get_scheduler_status():
         if scheduler:
             status = {
                 'running': scheduler.is_running(),
-                'task_running': scheduler.is_task_running()
+                'task_running': scheduler.is_task_running(),
+                'run': scheduler.get_run()
             }
         else:
             status = {
                 'running': False,
-                'task_running': False
+                'task_running': False,
+                'run': None
             }
 
         return jsonify({
@@ -167,56 +175,196 @@ def run_task_now():
             config = Config()
             scheduler = TaskScheduler(config)
 
-        if scheduler.run_task_now():
+        run = scheduler.run_task_now()
+        if run:
             return jsonify({
                 'success': True,
-                'message': '任务已开始执行'
+                'message': '任务已开始执行',
+                'run_id': run.run_id
             })
         else:
-            return jsonify({'error': '任务正在执行中'}), 400
+            return jsonify({'error': '任务正在执行中'}), 409
 
     except Exception as e:
         logger.error(f"执行任务错误: {e}")
         return jsonify({'error': '执行失败'}), 500
 
 
+@api_bp.route('/scan', methods=['GET'])
+@require_auth
+def get_scan():
+    """正在执行或最近一次执行的检测任务及其进度"""
+    try:
+        run = scheduler.get_run() if scheduler else None
+        return jsonify({'success': True, 'run': run})
+    except Exception as e:
+        logger.error(f"获取检测任务错误: {e}")
+        return jsonify({'error': '获取检测任务失败'}), 500
+
+
+@api_bp.route('/scan/cancel', methods=['POST'])
+@require_auth
+def cancel_scan():
+    """取消正在执行的检测任务，可传入 run_id 避免误取消新开始的任务"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if not scheduler or not scheduler.is_task_running():
+            return jsonify({'error': '没有正在执行的任务'}), 404
+
+        if scheduler.cancel_run(data.get('run_id')):
+            return jsonify({
+                'success': True,
+                'message': '已请求取消，当前节点检测完成后停止',
+                'run': scheduler.get_run()
+            })
+        return jsonify({'error': '任务已结束或ID不匹配'}), 409
+    except Exception as e:
+        logger.error(f"取消检测任务错误: {e}")
+        return jsonify({'error': '取消失败'}), 500
+
+
+def _get_scheduler() -> TaskScheduler:
+    global scheduler
+    if not scheduler:
+        scheduler = TaskScheduler(Config())
+    return scheduler
+
+
+@api_bp.route('/jobs', methods=['GET'])
+@require_auth
+def list_jobs():
+    """最近提交的任务"""
+    try:
+        return jsonify({'success': True, 'jobs': _get_scheduler().get_jobs()})
+    except Exception as e:
+        logger.error(f"获取任务列表错误: {e}")
+        return jsonify({'error': '获取任务列表失败'}), 500
+
+
+@api_bp.route('/jobs', methods=['POST'])
+@require_auth
+def submit_job():
+    """提交任务，例如 {"kind": "check_nodes", "names": ["节点A", "节点B"]}
+
+    kind 可选 full_scan、recheck_unlocked（复检当前解锁的节点）、check_nodes（检测指定节点）
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        names = data.get('names')
+        if names is not None and not isinstance(names, list):
+            return jsonify({'error': 'names 必须是节点名称列表'}), 400
+
+        job = _get_scheduler().submit_job(data.get('kind', ''), names)
+        return jsonify({'success': True, 'job': job.to_dict()}), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"提交任务错误: {e}")
+        return jsonify({'error': '提交任务失败'}), 500
+
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    """任务状态、进度和结果"""
+    job = _get_scheduler().get_job(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
+@api_bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+@require_auth
+def cancel_job(job_id):
+    """取消排队中或执行中的任务"""
+    sched = _get_scheduler()
+    job = sched.get_job(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    if not sched.cancel_job(job_id):
+        return jsonify({'error': '任务已结束'}), 409
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
 @api_bp.route('/logs', methods=['GET'])
 @require_auth
 def get_logs():
-    """获取日志"""
+    """获取日志，传入 since=<序号> 时只返回该序号之后的新日志"""
     try:
         limit = request.args.get('limit', 100, type=int)
-        logs = LoggerManager.get_logs(limit)
+        since = request.args.get('since', type=int)
+
+        if since is None:
+            logs = LoggerManager.get_logs(limit)
+            return jsonify({
+                'success': True,
+                'logs': logs,
+                'last_seq': logs[-1]['seq'] if logs else LoggerManager.last_log_seq()
+            })
 
+        logs, last_seq, truncated = LoggerManager.get_logs_since(since, limit)
         return jsonify({
             'success': True,
-            'logs': logs
+            'logs': logs,
+            # 下次请求使用的序号；limit截断时为本次最后一条，保证不丢不重
+            'last_seq': logs[-1]['seq'] if logs else last_seq,
+            'truncated': truncated
         })
     except Exception as e:
         logger.error(f"获取日志错误: {e}")
         return jsonify({'error': '获取日志失败'}), 500
 
 
+def _cached_response(cached: CachedBody, mimetype: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """返回预先序列化的响应体，支持 ETag / Last-Modified 协商缓存和 gzip 压缩"""
+    use_gzip = len(cached.body) >= GZIP_MIN_SIZE and request.accept_encodings['gzip'] > 0
+
+    response = Response(cached.gzipped() if use_gzip else cached.body, mimetype=mimetype, headers=headers)
+    # 压缩与未压缩内容不同，ETag需要区分
+    response.set_etag(f"{cached.etag}-gz" if use_gzip else cached.etag)
+    if cached.last_modified:
+        response.last_modified = datetime.fromtimestamp(cached.last_modified, tz=timezone.utc)
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _paged_results():
+    """按查询参数返回一页检测结果"""
+    index, meta = ResultsService().result_index()
+    status = request.args.get('status')
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError(f"不支持的排序方向: {order}")
+
+    page = index.query(offset=request.args.get('offset', 0, type=int),
+                       limit=request.args.get('limit', 100, type=int),
+                       sort=request.args.get('sort', 'name'),
+                       order=order,
+                       status=[s for s in status.split(',') if s] if status else None,
+                       region=request.args.get('region') or None,
+                       type=request.args.get('type') or None,
+                       name=request.args.get('name') or None)
+    return jsonify({'success': True, **page, **meta, 'facets': index.facets})
+
+
 @api_bp.route('/results', methods=['GET'])
 @require_auth
 def get_results():
-    """获取检测结果"""
-    try:
-        config = Config()
-        checker = NetflixChecker(config)
-        results = checker.load_results()
+    """获取检测结果
 
-        if results:
-            return jsonify({
-                'success': True,
-                'results': results
-            })
-        else:
-            return jsonify({
-                'success': True,
-                'results': None,
-                'message': '暂无检测结果'
-            })
+    不带参数时返回完整结果；带 offset/limit/sort/order/status/region/type/name
+    任一参数时返回分页结果，例如 ?offset=0&limit=200&sort=delay&status=full,partial
+    """
+    try:
+        if any(arg in request.args for arg in RESULT_QUERY_ARGS):
+            return _paged_results()
+        # 检测进行中时同时返回本轮已得出的部分结果
+        return _cached_response(ResultsService().results_body(), 'application/json')
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {e}'}), 400
     except Exception as e:
         logger.error(f"获取结果错误: {e}")
         return jsonify({'error': '获取结果失败'}), 500
@@ -227,14 +375,11 @@ def get_results():
 def download_results():
     """下载检测结果"""
     try:
-        results_file = "/app/results/netflix_check_results.json"
-        if os.path.exists(results_file):
-            return send_file(
-                results_file,
-                as_attachment=True,
-                download_name='netflix_results.json',
-                mimetype='application/json'
-            )
+        cached = ResultsService().download_body()
+        if cached is not None:
+            return _cached_response(cached, 'application/json', {
+                'Content-Disposition': 'attachment; filename="netflix_results.json"'
+            })
         else:
             return jsonify({'error': '结果文件不存在'}), 404
     except Exception as e:
@@ -242,6 +387,78 @@ def download_results():
         return jsonify({'error': '下载失败'}), 500
 
 
+def _history_filters() -> dict:
+    """从查询参数解析历史记录过滤条件"""
+    status = request.args.get('status')
+    run_id = request.args.get('run_id')
+    return {
+        'fingerprint': request.args.get('fingerprint') or None,
+        'name': request.args.get('name') or None,
+        'region': request.args.get('region') or None,
+        'status': [s for s in status.split(',') if s] if status else None,
+        'since': request.args.get('since') or None,
+        'until': request.args.get('until') or None,
+        'run_id': int(run_id) if run_id else None
+    }
+
+
+@api_bp.route('/history', methods=['GET'])
+@require_auth
+def get_history():
+    """按条件分页查询历史检测结果，翻页时传入上一页返回的 next_cursor"""
+    try:
+        store = HistoryStore(Config())
+        if not store.enabled:
+            return jsonify({'error': '历史记录未启用'}), 404
+
+        page = store.query(limit=request.args.get('limit', 100, type=int),
+                           cursor=request.args.get('cursor') or None,
+                           **_history_filters())
+        return jsonify({'success': True, **page})
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {e}'}), 400
+    except Exception as e:
+        logger.error(f"查询历史记录错误: {e}")
+        return jsonify({'error': '查询历史记录失败'}), 500
+
+
+@api_bp.route('/history/nodes', methods=['GET'])
+@require_auth
+def get_history_nodes():
+    """按节点聚合的历史记录，例如 ?region=SG&status=full&since=2024-01-01"""
+    try:
+        store = HistoryStore(Config())
+        if not store.enabled:
+            return jsonify({'error': '历史记录未启用'}), 404
+
+        page = store.nodes(limit=request.args.get('limit', 100, type=int),
+                           cursor=request.args.get('cursor') or None,
+                           **_history_filters())
+        return jsonify({'success': True, **page})
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {e}'}), 400
+    except Exception as e:
+        logger.error(f"查询历史节点错误: {e}")
+        return jsonify({'error': '查询历史记录失败'}), 500
+
+
+@api_bp.route('/history/runs', methods=['GET'])
+@require_auth
+def get_history_runs():
+    """历史检测轮次"""
+    try:
+        store = HistoryStore(Config())
+        if not store.enabled:
+            return jsonify({'error': '历史记录未启用'}), 404
+
+        page = store.runs(limit=request.args.get('limit', 20, type=int),
+                          before=request.args.get('cursor', type=int))
+        return jsonify({'success': True, **page})
+    except Exception as e:
+        logger.error(f"查询检测轮次错误: {e}")
+        return jsonify({'error': '查询历史记录失败'}), 500
+
+
 @api_bp.route('/version', methods=['GET'])
 @require_auth
 def get_version():
@@ -274,7 +491,10 @@ def set_scheduler(sched):
 
 @api_bp.route('/subscription', methods=['GET'])
 def get_netflix_subscription():
-    """获取Netflix解锁节点订阅"""
+    """获取Netflix解锁节点订阅
+
+    可选参数: status=full|partial|all（默认full）, region=地区代码, sort=delay
+    """
     try:
         subscription_key = request.args.get('key', '')
 
@@ -289,27 +509,18 @@ def get_netflix_subscription():
             logger.warning(f"订阅密钥错误: {subscription_key}")
             return jsonify({'error': '无效的订阅密钥'}), 401
 
-        subscription_file = "results/netflix_unlocked_proxies.yaml"
-        if not os.path.exists(subscription_file):
-            logger.info("订阅文件不存在，返回空订阅")
-            empty_subscription = {
-                'proxies': []
-            }
-            import yaml
-            return yaml.dump(empty_subscription, allow_unicode=True), 200, {
-                'Content-Type': 'text/plain; charset=utf-8',
-                'Content-Disposition': 'inline; filename="netflix_proxies.yaml"'
-            }
-
-        with open(subscription_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        status = request.args.get('status', 'full')
+        region = request.args.get('region', '')
+        sort = request.args.get('sort', '')
+        if status not in STATUS_FILTERS or sort not in SORT_KEYS:
+            return jsonify({'error': '无效的筛选参数'}), 400
 
-        logger.info(f"订阅文件已提供给用户")
+        cached = SubscriptionService().get(status, region, sort)
+        logger.debug(f"订阅已提供给用户 status={status} region={region} sort={sort}")
 
-        return content, 200, {
-            'Content-Type': 'text/plain; charset=utf-8',
+        return _cached_response(cached, 'text/plain', {
             'Content-Disposition': 'inline; filename="netflix_proxies.yaml"'
-        }
+        })
 
     except Exception as e:
         logger.error(f"获取订阅错误: {e}")
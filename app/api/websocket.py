@@ -1,23 +1,220 @@
 """
 WebSocket支持 - 实时日志推送
 """
-import time
 import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
 from flask_socketio import emit, join_room, leave_room, disconnect
 from flask import request
 from app.core.logger import LoggerManager
+from app.core.events import EventBus
 from app.api.auth import verify_token
 
 logger = LoggerManager.get_logger()
 
 connected_clients = set()
 authenticated_clients = set()
-log_push_thread = None
-stop_log_push = False
+log_fanout = None
+scan_forwarder = None
+
+# 合并推送的进度事件：scan_progress 为完整检测，job_progress 为指定节点检测
+PROGRESS_EVENTS = ('scan_progress', 'job_progress')
+
+
+class _ThreadNotifier:
+    """线程模式下的新日志通知"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, timeout: float):
+        self._event.wait(timeout)
+        self._event.clear()
+
+
+class _GeventNotifier:
+    """gevent模式下的新日志通知
+
+    日志可能在检测线程等其他系统线程中产生，通过事件循环的async watcher
+    跨线程唤醒运行在事件循环上的推送协程。
+    """
+
+    def __init__(self):
+        from gevent import get_hub
+        from gevent.event import Event
+
+        self._event = Event()
+        self._watcher = get_hub().loop.async_()
+        self._watcher.ref = False
+        self._watcher.start(self._event.set)
+
+    def notify(self):
+        self._watcher.send()
+
+    def wait(self, timeout: float):
+        self._event.wait(timeout)
+        self._event.clear()
+
+
+def _make_notifier(socketio):
+    return _GeventNotifier() if socketio.async_mode == 'gevent' else _ThreadNotifier()
+
+
+class LogFanout:
+    """日志推送
+
+    有新日志时被唤醒，等待flush_interval合并突发日志后，按每个客户端各自的序号
+    只推送它尚未收到的日志；没有订阅的客户端时推送协程退出。
+    """
+
+    def __init__(self, socketio, flush_interval: float = 0.2, max_batch: int = 500):
+        self.socketio = socketio
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.cursors: Dict[str, int] = {}
+        self._running = False
+        self._notifier = None
+
+    def subscribe(self, sid: str, cursor: int):
+        """客户端订阅日志，cursor为该客户端已收到的最新序号"""
+        self.cursors[sid] = cursor
+        self._ensure_running()
+        # 客户端可能落后于最新日志，唤醒一次补发
+        self._notifier.notify()
+
+    def unsubscribe(self, sid: str):
+        """客户端取消订阅"""
+        self.cursors.pop(sid, None)
+
+    def _ensure_running(self):
+        if self._running:
+            return
+        if self._notifier is None:
+            self._notifier = _make_notifier(self.socketio)
+            LoggerManager.add_listener(self._notifier.notify)
+        self._running = True
+        self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        try:
+            while self.cursors:
+                self._notifier.wait(timeout=5)
+                if not self.cursors:
+                    break
+                self.socketio.sleep(self.flush_interval)
+                self._flush()
+        except Exception as e:
+            logger.error(f"推送日志错误: {e}")
+        finally:
+            self._running = False
+            # 退出前又有客户端订阅时重新启动
+            if self.cursors:
+                self._ensure_running()
+
+    def _flush(self):
+        """按客户端序号推送新日志，序号相同的客户端共用一次读取"""
+        batches = {}
+        backlog = False
+        for sid, cursor in list(self.cursors.items()):
+            if cursor not in batches:
+                batches[cursor] = LoggerManager.get_logs_since(cursor, self.max_batch)[0]
+            logs = batches[cursor]
+            if not logs:
+                continue
+
+            self.socketio.emit('new_logs', {'logs': logs, 'last_seq': logs[-1]['seq']}, to=sid)
+            if sid in self.cursors:
+                self.cursors[sid] = logs[-1]['seq']
+            backlog = backlog or len(logs) >= self.max_batch
+
+        # 单次推送达到上限时还有剩余日志，立即进入下一轮
+        if backlog:
+            self._notifier.notify()
+
+
+class ScanEventForwarder:
+    """检测事件转发
+
+    有客户端加入 scan 房间时订阅事件总线，合并flush_interval内的进度事件，
+    将其中的节点结果一次推送；没有客户端时取消订阅并退出。
+    """
+
+    def __init__(self, socketio, flush_interval: float = 0.5):
+        self.socketio = socketio
+        self.flush_interval = flush_interval
+        self.members = set()
+        self._pending = deque()
+        self._running = False
+        self._notifier = None
+
+    def join(self, sid: str):
+        self.members.add(sid)
+        self._ensure_running()
+
+    def leave(self, sid: str):
+        self.members.discard(sid)
+
+    def _on_event(self, event: str, data: Dict):
+        # 在检测线程中调用，只入队并唤醒推送协程
+        self._pending.append((event, data))
+        self._notifier.notify()
+
+    def _ensure_running(self):
+        if self._running:
+            return
+        if self._notifier is None:
+            self._notifier = _make_notifier(self.socketio)
+        EventBus.subscribe(self._on_event)
+        self._running = True
+        self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        try:
+            while self.members:
+                self._notifier.wait(timeout=5)
+                if not self.members:
+                    break
+                self.socketio.sleep(self.flush_interval)
+                self._flush()
+        except Exception as e:
+            logger.error(f"推送检测进度错误: {e}")
+        finally:
+            EventBus.unsubscribe(self._on_event)
+            self._pending.clear()
+            self._running = False
+            if self.members:
+                self._ensure_running()
+
+    def _flush(self):
+        """按顺序推送事件，同一任务的进度事件合并为一条，完整检测和指定节点检测分开推送"""
+        batches: Dict[Tuple[str, Optional[str]], Tuple[List[Dict], Dict]] = {}
+        while self._pending:
+            event, data = self._pending.popleft()
+            if event in PROGRESS_EVENTS:
+                key = (event, data['run_id'])
+                results = batches[key][0] if key in batches else []
+                results.append(data['result'])
+                batches[key] = (results, data)
+                continue
+            self._emit_progress(batches)
+            self.socketio.emit(event, data, to='scan')
+        self._emit_progress(batches)
+
+    def _emit_progress(self, batches: Dict[Tuple[str, Optional[str]], Tuple[List[Dict], Dict]]):
+        for (event, _), (results, latest) in batches.items():
+            stats = {k: v for k, v in latest.items() if k != 'result'}
+            self.socketio.emit(event, {'results': results, 'stats': stats}, to='scan')
+        batches.clear()
 
 
 def setup_websocket(socketio):
     """设置WebSocket事件处理"""
+    global log_fanout, scan_forwarder
+    log_fanout = LogFanout(socketio)
+    scan_forwarder = ScanEventForwarder(socketio)
 
     @socketio.on('connect')
     def handle_connect(auth=None):
@@ -32,13 +229,6 @@ def setup_websocket(socketio):
                 authenticated_clients.add(client_id)
                 logger.info(f"WebSocket客户端连接并认证成功: {client_id}")
                 emit('connected', {'message': '已连接到日志推送服务', 'authenticated': True})
-
-                global log_push_thread, stop_log_push
-                if not log_push_thread or not log_push_thread.is_alive():
-                    stop_log_push = False
-                    log_push_thread = threading.Thread(target=push_logs, args=(socketio,))
-                    log_push_thread.daemon = True
-                    log_push_thread.start()
             else:
                 logger.warning(f"WebSocket客户端认证失败: {client_id}")
                 emit('error', {'message': '认证失败'})
@@ -56,15 +246,26 @@ def setup_websocket(socketio):
         client_id = request.sid
         connected_clients.discard(client_id)
         authenticated_clients.discard(client_id)
+        log_fanout.unsubscribe(client_id)
+        scan_forwarder.leave(client_id)
         logger.info(f"WebSocket客户端断开: {client_id}")
 
-        if not connected_clients:
-            global stop_log_push
-            stop_log_push = True
+    @socketio.on('join_scan')
+    def handle_join_scan():
+        """加入检测进度房间"""
+        client_id = request.sid
+
+        if client_id not in authenticated_clients:
+            emit('error', {'message': '未认证'})
+            return
+
+        join_room('scan')
+        scan_forwarder.join(client_id)
+        emit('joined', {'room': 'scan'})
 
     @socketio.on('join_logs')
-    def handle_join_logs():
-        """加入日志房间"""
+    def handle_join_logs(data=None):
+        """加入日志房间，重连时可带上 since 只补发断开期间的日志"""
         client_id = request.sid
 
         if client_id not in authenticated_clients:
@@ -74,9 +275,19 @@ def setup_websocket(socketio):
         join_room('logs')
         emit('joined', {'room': 'logs'})
 
+        since: Optional[int] = data.get('since') if isinstance(data, dict) else None
+        if isinstance(since, int):
+            truncated = LoggerManager.get_logs_since(since, 0)[2]
+            if not truncated:
+                # 断开期间的日志由推送协程按序号补发
+                log_fanout.subscribe(client_id, since)
+                return
+
         # 发送最近的日志
         recent_logs = LoggerManager.get_logs(50)
-        emit('logs_history', {'logs': recent_logs})
+        last_seq = recent_logs[-1]['seq'] if recent_logs else LoggerManager.last_log_seq()
+        emit('logs_history', {'logs': recent_logs, 'last_seq': last_seq})
+        log_fanout.subscribe(client_id, last_seq)
 
     @socketio.on('leave_logs')
     def handle_leave_logs():
@@ -87,29 +298,5 @@ def setup_websocket(socketio):
             return
 
         leave_room('logs')
+        log_fanout.unsubscribe(client_id)
         emit('left', {'room': 'logs'})
-
-
-def push_logs(socketio):
-    """推送日志到客户端（只推送给已认证的客户端）"""
-    last_log_count = len(LoggerManager.get_logs())
-
-    while not stop_log_push:
-        try:
-            current_logs = LoggerManager.get_logs()
-            current_count = len(current_logs)
-
-            if current_count > last_log_count:
-                new_logs = current_logs[last_log_count:]
-
-                socketio.emit('new_logs', {
-                    'logs': new_logs
-                }, room='logs', skip_sid=[sid for sid in connected_clients if sid not in authenticated_clients])
-
-                last_log_count = current_count
-
-            time.sleep(1)
-
-        except Exception as e:
-            logger.error(f"推送日志错误: {e}")
-            time.sleep(5)
\ No newline at end of file
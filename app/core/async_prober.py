@@ -0,0 +1,235 @@
+"""
+基于asyncio的Netflix检测引擎
+"""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+try:
+    import aiohttp
+except ImportError:  # 未安装aiohttp时回退到同步引擎
+    aiohttp = None
+
+from app.core import metrics
+from app.core.logger import LoggerManager
+
+if TYPE_CHECKING:
+    from app.core.netflix_checker import NetflixChecker
+
+
+def is_available() -> bool:
+    """异步引擎依赖是否可用"""
+    return aiohttp is not None
+
+
+def _connect_trace() -> 'aiohttp.TraceConfig':
+    """记录新建连接（含代理握手和TLS）的耗时，写入请求的 trace_request_ctx"""
+    async def on_start(session, context, params):
+        if context.trace_request_ctx is not None:
+            context.trace_request_ctx['connect_started'] = time.monotonic()
+
+    async def on_end(session, context, params):
+        timing = context.trace_request_ctx
+        if timing is not None and 'connect_started' in timing:
+            # 重定向到其他主机时会新建多个连接，累计全部建立连接的时间
+            timing['connect'] = timing.get('connect', 0) + time.monotonic() - timing.pop('connect_started')
+
+    trace = aiohttp.TraceConfig()
+    trace.on_connection_create_start.append(on_start)
+    trace.on_connection_create_end.append(on_end)
+    return trace
+
+
+class AsyncNetflixProber:
+    """异步检测引擎
+
+    每个节点的独立监听端口对应一个连接池，在有限并发下同时检测大量节点；
+    节点代理不可达时会取消该节点其余的在途请求。结果格式与同步引擎一致。
+    """
+
+    def __init__(self, checker: 'NetflixChecker', concurrency: int = 100):
+        self.checker = checker
+        self.logger = LoggerManager.get_logger()
+        self.concurrency = max(1, concurrency)
+
+    def check_all(self, proxies: List[Dict],
+                  on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+        """检测所有代理，返回与输入顺序一致的结果列表"""
+        return asyncio.run(self._check_all(proxies, on_result))
+
+    async def _check_all(self, proxies: List[Dict],
+                         on_result: Optional[Callable[[Dict], None]]) -> List[Dict]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: List[Optional[Dict]] = [None] * len(proxies)
+
+        async def run(index: int, proxy: Dict):
+            async with semaphore:
+                results[index] = await self._check_proxy(proxy)
+            if on_result:
+                on_result(results[index])
+
+        tasks = [asyncio.create_task(run(i, proxy)) for i, proxy in enumerate(proxies)]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return results
+
+    async def _check_proxy(self, proxy: Dict) -> Dict:
+        """检测单个节点"""
+        checker = self.checker
+        proxy_name = proxy.get('name', 'Unknown')
+        result = checker._new_result(proxy)
+        started = time.monotonic()
+        switch_seconds: Optional[float] = None
+
+        try:
+            loop = asyncio.get_running_loop()
+            ready = await loop.run_in_executor(None, checker.clash_manager.ensure_node_ready, proxy_name)
+            switch_seconds = time.monotonic() - started
+            if not ready:
+                result['details'] = '所在Clash实例不可用'
+                self.logger.error(f"[{proxy_name}] 所在Clash实例不可用")
+                return result
+
+            node_proxies = checker._get_node_proxies(proxy_name)
+            if node_proxies is None:
+                result['details'] = '节点没有独立监听端口'
+                return result
+            proxy_url = node_proxies['https']
+
+            timeout = aiohttp.ClientTimeout(total=checker.timeout)
+            connector = aiohttp.TCPConnector(limit=len(checker.test_urls) + 1, ttl_dns_cache=300)
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                             headers=checker._request_headers(),
+                                             trace_configs=[_connect_trace()]) as session:
+                current_ip = await self._check_current_ip(session, proxy_url)
+                self.logger.info(f"[{proxy_name}] 当前IP: {current_ip}")
+
+                test_results = await self._test_urls(session, proxy_url, proxy_name)
+
+            checker._summarize_tests(result, test_results)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result['status'] = 'failed'
+            result['details'] = f'测试错误: {str(e)}'
+            self.logger.error(f"检测代理 {proxy_name} 时出错: {e}", exc_info=True)
+        finally:
+            metrics.observe_node(result, time.monotonic() - started, switch_seconds)
+
+        return result
+
+    async def _test_urls(self, session: 'aiohttp.ClientSession', proxy_url: str,
+                         proxy_name: str) -> List[Dict]:
+        """并发请求所有测试URL，节点代理不可达时取消其余请求"""
+        urls = self.checker.test_urls
+        tasks = [asyncio.create_task(self._test_single_url(session, url, proxy_url, proxy_name))
+                 for url in urls]
+        outcomes: List[Optional[Tuple[bool, Optional[str], Optional[str]]]] = [None] * len(tasks)
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                outcomes[tasks.index(task)] = task.result()
+            if any(o is not None and o[2] == 'Proxy Error' for o in outcomes):
+                for task in pending:
+                    task.cancel()
+                break
+
+        test_results = []
+        for url, outcome in zip(urls, outcomes):
+            success, region, _ = outcome or (False, None, 'Cancelled')
+            test_results.append({
+                'url': url,
+                'success': success,
+                'region': region
+            })
+        return test_results
+
+    async def _test_single_url(self, session: 'aiohttp.ClientSession', url: str, proxy_url: str,
+                               proxy_name: str) -> Tuple[bool, Optional[str], Optional[str]]:
+        """测试单个URL
+
+        返回: (是否成功, 地区码, 响应内容)
+        """
+        started = time.monotonic()
+        timing: Dict[str, float] = {}
+        bytes_read = 0
+        outcome = 'error'
+        region: Optional[str] = None
+        try:
+            self.logger.debug(f"[{proxy_name}] 正在请求: {url}")
+            async with session.get(url, proxy=proxy_url, allow_redirects=True,
+                                   trace_request_ctx=timing) as response:
+                # 复用连接时没有 connect 阶段，ttfb 从请求开始计算，包含全部重定向
+                timing['ttfb'] = time.monotonic() - started - timing.get('connect', 0)
+                self.logger.debug(f"[{proxy_name}] 响应状态码: {response.status}")
+                self.logger.debug(f"[{proxy_name}] 最终URL: {response.url}")
+
+                if response.status != 200:
+                    outcome = 'http_error'
+                    return False, None, f"HTTP {response.status}"
+
+                checker = self.checker
+                if not checker.streaming:
+                    body = await response.read()
+                    bytes_read = len(body)
+                    content = body.decode(response.get_encoding(), errors='replace')
+                    analyzed = checker._analyze_response(str(response.url), content, proxy_name)
+                    outcome = 'success' if analyzed[0] else 'blocked'
+                    region = analyzed[1]
+                    return analyzed
+
+                content_type = response.headers.get('Content-Type', '')
+                if not checker._is_html(content_type):
+                    self.logger.debug(f"[{proxy_name}] 非HTML响应: {content_type}")
+                    outcome = 'unexpected_content'
+                    return False, None, f"Unexpected Content-Type: {content_type}"
+
+                scanner = checker._new_scanner(str(response.url), response.charset)
+                async for chunk in response.content.iter_chunked(checker.STREAM_CHUNK_SIZE):
+                    if scanner.feed(chunk):
+                        break
+                bytes_read = scanner.bytes_read
+                analyzed = checker._analyze_scan(str(response.url), scanner, proxy_name)
+                outcome = 'success' if analyzed[0] else 'blocked'
+                region = analyzed[1]
+                return analyzed
+
+        except asyncio.TimeoutError:
+            self.logger.debug(f"[{proxy_name}] 请求超时")
+            outcome = 'timeout'
+            return False, None, "Timeout"
+        except (aiohttp.ClientProxyConnectionError, aiohttp.ClientHttpProxyError) as e:
+            self.logger.debug(f"[{proxy_name}] 代理连接错误: {e}")
+            outcome = 'proxy_error'
+            return False, None, "Proxy Error"
+        except aiohttp.ClientError as e:
+            self.logger.debug(f"[{proxy_name}] 连接错误: {e}")
+            outcome = 'connection_error'
+            return False, None, "Connection Error"
+        except asyncio.CancelledError:
+            outcome = 'cancelled'
+            raise
+        finally:
+            metrics.observe_probe(outcome, time.monotonic() - started, ttfb=timing.get('ttfb'),
+                                  connect=timing.get('connect'), bytes_read=bytes_read, region=region)
+
+    async def _check_current_ip(self, session: 'aiohttp.ClientSession', proxy_url: str) -> str:
+        """检查节点出口IP"""
+        try:
+            async with session.get('http://ip-api.com/json', proxy=proxy_url,
+                                   timeout=aiohttp.ClientTimeout(total=10)) as response:
+                data = await response.json(content_type=None)
+                return f"{data.get('query')} ({data.get('country')})"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"获取IP失败: {e}")
+            return "Unknown"
@@ -3,21 +3,36 @@ Clash管理模块
 """
 
 import os
-import yaml
+import json
 import requests
 import subprocess
+import threading
 import time
 import signal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import quote
 from typing import Dict, List, Tuple, Optional
 
+from app.core import metrics, yaml_utils
 from app.core.logger import LoggerManager
 from app.core.config import Config
+from app.core.clash_pool import ClashWorkerPool
+from app.core.clash_process import ClashProcess
+from app.core.fingerprint import proxy_fingerprint
+from app.core.subscription_cache import SubscriptionCache
 
 
 class LocalClashManager:
     """本地Clash管理器"""
 
+    # 主mihomo进程在所有管理器实例间共享，调度器和Web启动流程各自创建的管理器操作同一进程
+    _process: Optional[ClashProcess] = None
+    _process_lock = threading.Lock()
+    # 多实例工作池同样共享，每轮检测新建的管理器沿用上一轮启动的实例句柄
+    _pool: Optional[ClashWorkerPool] = None
+
     def __init__(self, config: Config):
         self.config = config
         self.logger = LoggerManager.get_logger()
@@ -25,46 +40,161 @@ class LocalClashManager:
         self.clash_secret = config.get('clash.secret', '')
         self.temp_dir = Path("temp")
         self.temp_dir.mkdir(exist_ok=True)
-        self.clash_process = None
         self.clash_config_path = Path("/root/.config/mihomo/config.yaml")
+        self.clash_binary = config.get('clash.binary', '/usr/local/bin/clash')
         self.session = requests.Session()
+        # 每个节点独立监听端口（节点名 -> 端口），用于并发检测
+        self.listener_ports: Dict[str, int] = {}
+        # 跨订阅去重后保留的节点名 -> 被折叠的同连接参数节点
+        self.proxy_aliases: Dict[str, List[Dict]] = {}
+        self.aliases_path = self.temp_dir / "proxy_aliases.json"
+        self.subscription_cache = SubscriptionCache(str(self.temp_dir / "subscriptions"))
+        # 最近一次合并配置中的节点，用于确认热加载后新配置已生效
+        self._expected_proxy: Optional[str] = None
+        # 多实例模式：clash.pool.size > 1 时启动多个mihomo实例分片承载节点
+        pool_size = int(config.get('clash.pool.size', 1) or 1)
+        self.pool = self._get_pool(pool_size) if pool_size > 1 else None
 
     def download_and_merge_configs(self, urls: List[str]) -> Tuple[Optional[str], List[Dict]]:
         """下载并合并多个配置文件"""
         all_proxies = []
         configs = []
 
-        for i, url in enumerate(urls):
-            self.logger.info(f"下载配置 {i + 1}/{len(urls)}: {url}")
-            try:
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-
-                config_data = yaml.safe_load(response.text)
-                configs.append(config_data)
+        workers = max(1, min(len(urls), int(self.config.get('subscription.download_workers', 8))))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Download") as executor:
+            downloaded = list(executor.map(lambda args: self._fetch_config(*args),
+                                           [(i, url, len(urls)) for i, url in enumerate(urls)]))
 
-                if 'proxies' in config_data:
-                    proxies = config_data['proxies']
-                    all_proxies.extend(proxies)
-                    self.logger.info(f"从配置 {i + 1} 提取了 {len(proxies)} 个代理")
+        for i, text in enumerate(downloaded):
+            if text is None:
+                continue
 
+            try:
+                if not configs:
+                    # 第一个可用的订阅作为基础配置，需要完整解析策略组和规则
+                    config_data = yaml_utils.safe_load(text)
+                    if not isinstance(config_data, dict):
+                        raise ValueError("配置格式错误")
+                else:
+                    config_data = {'proxies': yaml_utils.extract_proxies(text)}
             except Exception as e:
-                self.logger.error(f"下载配置失败 {url}: {e}")
+                self.logger.error(f"解析配置 {i + 1} 失败: {e}")
                 continue
 
+            configs.append(config_data)
+
+            if 'proxies' in config_data:
+                proxies = config_data['proxies'] or []
+                all_proxies.extend(proxies)
+                self.logger.info(f"从配置 {i + 1} 提取了 {len(proxies)} 个代理")
+
         if not configs:
             self.logger.error("没有成功下载任何配置")
             return None, []
 
+        all_proxies = self._deduplicate_proxies(all_proxies)
+        self._expected_proxy = all_proxies[0].get('name') if all_proxies else None
+
         merged_config = self._merge_configs(configs, all_proxies)
 
+        if self.pool is not None:
+            # 检测端口由各实例分别监听，主配置中不再保留
+            self.pool.prepare(merged_config, self.listener_ports)
+            merged_config.pop('listeners', None)
+
         self.clash_config_path.parent.mkdir(parents=True, exist_ok=True)
         with open(self.clash_config_path, 'w', encoding='utf-8') as f:
-            yaml.dump(merged_config, f, allow_unicode=True, sort_keys=False)
+            yaml_utils.dump(merged_config, f, allow_unicode=True, sort_keys=False)
 
         self.logger.info(f"配置已保存到: {self.clash_config_path}")
         return str(self.clash_config_path), all_proxies
 
+    def _fetch_config(self, index: int, url: str, total: int) -> Optional[str]:
+        """下载单个订阅原文，未变化(304)或下载失败时使用上次成功的缓存"""
+        self.logger.info(f"下载配置 {index + 1}/{total}: {url}")
+        meta, cached = self.subscription_cache.load(url)
+
+        headers = {}
+        if cached is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            response = requests.get(url, timeout=30, headers=headers)
+
+            if response.status_code == 304 and cached is not None:
+                self.logger.info(f"配置 {index + 1} 未变化，使用缓存")
+                return cached
+
+            response.raise_for_status()
+
+            # 哪个订阅作为基础配置要等全部下载完成后才能确定，这里只做粗略校验并缓存原文
+            text = response.text
+            if not yaml_utils.has_proxies_key(text):
+                raise ValueError("配置格式错误: 没有proxies")
+
+            self.subscription_cache.store(url, response.headers.get('ETag'),
+                                          response.headers.get('Last-Modified'), text)
+            return text
+
+        except Exception as e:
+            self.logger.error(f"下载配置失败 {url}: {e}")
+            if cached is not None:
+                self.logger.warning(f"配置 {index + 1} 使用上次成功下载的缓存")
+                return cached
+            return None
+
+    def _deduplicate_proxies(self, proxies: List[Dict]) -> List[Dict]:
+        """按连接指纹去重，记录保留节点与其别名的对应关系"""
+        kept = []
+        kept_by_fingerprint: Dict[str, Dict] = {}
+        aliases: Dict[str, List[Dict]] = {}
+
+        for proxy in proxies:
+            fingerprint = proxy_fingerprint(proxy)
+            if fingerprint in kept_by_fingerprint:
+                aliases.setdefault(kept_by_fingerprint[fingerprint]['name'], []).append(proxy)
+            else:
+                kept_by_fingerprint[fingerprint] = proxy
+                kept.append(proxy)
+
+        # 同名节点出现在多个订阅中时不记为别名，否则展开结果时会重复出现同名节点
+        seen_names = {p.get('name') for p in kept}
+        for name in list(aliases):
+            unique = []
+            for alias in aliases[name]:
+                if alias.get('name') not in seen_names:
+                    seen_names.add(alias.get('name'))
+                    unique.append(alias)
+            if unique:
+                aliases[name] = unique
+            else:
+                del aliases[name]
+
+        self.proxy_aliases = aliases
+        try:
+            with open(self.aliases_path, 'w', encoding='utf-8') as f:
+                json.dump(aliases, f, ensure_ascii=False)
+        except Exception as e:
+            self.logger.error(f"保存节点别名失败: {e}")
+
+        collapsed = len(proxies) - len(kept)
+        if collapsed:
+            self.logger.info(f"跨订阅去重: 折叠了 {collapsed} 个重复节点，保留 {len(kept)} 个")
+        return kept
+
+    def get_proxy_aliases(self) -> Dict[str, List[Dict]]:
+        """获取去重时折叠的别名节点，当前实例没有时从上次合并的记录加载"""
+        if not self.proxy_aliases and self.aliases_path.exists():
+            try:
+                with open(self.aliases_path, 'r', encoding='utf-8') as f:
+                    self.proxy_aliases = json.load(f)
+            except Exception as e:
+                self.logger.error(f"加载节点别名失败: {e}")
+        return self.proxy_aliases
+
     def _merge_configs(self, configs: List[Dict], all_proxies: List[Dict]) -> Dict:
         """合并多个配置文件"""
         merged = {
@@ -112,7 +242,7 @@ class LocalClashManager:
             base_config = configs[0]
 
             if 'proxy-groups' in base_config:
-                merged['proxy-groups'] = base_config['proxy-groups']
+                merged['proxy-groups'] = self._filter_proxy_groups(base_config['proxy-groups'], all_proxies)
 
             if 'rules' in base_config:
                 merged['rules'] = base_config['rules']
@@ -121,12 +251,171 @@ class LocalClashManager:
                 if key in base_config:
                     merged[key] = base_config[key]
 
+        listeners = self._build_check_listeners(all_proxies)
+        if listeners:
+            merged['listeners'] = listeners
+
         return merged
 
+    def _filter_proxy_groups(self, groups: List[Dict], all_proxies: List[Dict]) -> List[Dict]:
+        """移除策略组中引用的已去重节点，避免mihomo因找不到节点而拒绝加载配置"""
+        removed = set()
+        for aliases in self.proxy_aliases.values():
+            removed.update(alias.get('name') for alias in aliases)
+        removed -= {proxy.get('name') for proxy in all_proxies}
+        if not removed:
+            return groups
+
+        filtered = []
+        for group in groups:
+            group = dict(group)
+            if isinstance(group.get('proxies'), list):
+                group['proxies'] = [name for name in group['proxies'] if name not in removed]
+                if not group['proxies'] and not group.get('use'):
+                    group['proxies'] = ['DIRECT']
+            filtered.append(group)
+        return filtered
+
+    def _build_check_listeners(self, all_proxies: List[Dict]) -> List[Dict]:
+        """为每个节点生成独立的mixed监听端口，检测时无需切换GLOBAL"""
+        self.listener_ports = {}
+
+        listener_config = self.config.get('clash.check_listeners', {}) or {}
+        if not listener_config.get('enable', True):
+            if self.pool is None:
+                return []
+            self.logger.warning("多实例模式依赖独立监听端口，忽略 check_listeners.enable=false")
+
+        base_port = int(listener_config.get('base_port', 20000))
+        listen = listener_config.get('listen', '127.0.0.1')
+
+        names = []
+        seen = set()
+        for proxy in all_proxies:
+            name = proxy.get('name')
+            if name and name not in seen:
+                seen.add(name)
+                names.append(name)
+
+        if base_port + len(names) > 65535:
+            self.logger.warning(f"节点数量过多({len(names)})，端口范围超出，禁用独立监听端口")
+            return []
+
+        listeners = []
+        for i, name in enumerate(names):
+            port = base_port + i
+            listeners.append({
+                'name': f'nf-check-{i}',
+                'type': 'mixed',
+                'listen': listen,
+                'port': port,
+                'proxy': name
+            })
+            self.listener_ports[name] = port
+
+        self.logger.info(f"已为 {len(listeners)} 个节点生成独立监听端口 ({base_port}-{base_port + len(listeners) - 1})")
+        return listeners
+
+    def load_installed_proxies(self) -> List[Dict]:
+        """读取Clash当前使用的配置中的节点并恢复独立监听端口，无需重新下载和加载配置
+
+        多实例模式的分片信息不在主配置中，返回空列表。
+        """
+        if self.pool is not None or not self.clash_config_path.exists():
+            return []
+        try:
+            with open(self.clash_config_path, 'r', encoding='utf-8') as f:
+                installed = yaml_utils.safe_load(f) or {}
+        except Exception as e:
+            self.logger.error(f"读取当前Clash配置失败: {e}")
+            return []
+
+        self.listener_ports = {l['proxy']: l['port'] for l in installed.get('listeners') or []
+                               if l.get('proxy') and l.get('port')}
+        return installed.get('proxies') or []
+
+    def get_listener_port(self, proxy_name: str) -> Optional[int]:
+        """获取节点的独立监听端口，没有则返回None"""
+        return self.listener_ports.get(proxy_name)
+
+    def ensure_node_ready(self, proxy_name: str) -> bool:
+        """确保承载节点的Clash实例可用，多实例模式下会自动重启崩溃的实例"""
+        if self.pool is None:
+            return True
+        return self.pool.ensure_worker(proxy_name)
+
+    def _get_controller_url(self, proxy_name: str) -> str:
+        """获取承载节点的Clash实例控制地址"""
+        if self.pool is not None:
+            worker = self.pool.worker_for(proxy_name)
+            if worker is not None:
+                return worker.api_url
+        return self.clash_api_url
+
+    def test_proxy_delay(self, proxy_name: str, timeout_ms: int = 3000,
+                         test_url: str = 'http://www.gstatic.com/generate_204') -> Tuple[bool, Optional[int]]:
+        """通过控制器测试节点延迟
+
+        返回: (是否完成测试, 延迟毫秒)，节点不可达时延迟为None；
+        控制器本身不可访问时视为未完成测试
+        """
+        headers = {'Authorization': f'Bearer {self.clash_secret}'} if self.clash_secret else {}
+        try:
+            response = requests.get(
+                f"{self._get_controller_url(proxy_name)}/proxies/{quote(proxy_name, safe='')}/delay",
+                params={'timeout': timeout_ms, 'url': test_url},
+                headers=headers,
+                timeout=timeout_ms / 1000 + 5
+            )
+            if response.status_code == 200:
+                data = response.json()
+                if not isinstance(data, dict):
+                    raise ValueError(f"非预期的响应: {response.text[:100]}")
+                return True, data.get('delay')
+        except ValueError as e:
+            # 控制器前面的代理或拦截页面返回的非JSON内容，按未完成测试处理
+            self.logger.debug(f"[{proxy_name}] 延迟测试响应无法解析: {e}")
+            return False, None
+        except Exception as e:
+            self.logger.debug(f"[{proxy_name}] 延迟测试请求失败: {e}")
+            return False, None
+
+        if response.status_code in (408, 503, 504):
+            return True, None
+
+        self.logger.debug(f"[{proxy_name}] 延迟测试返回异常状态码: {response.status_code}")
+        return False, None
+
+    def batch_test_delays(self, proxy_names: List[str], timeout_ms: int = 3000,
+                          test_url: str = 'http://www.gstatic.com/generate_204',
+                          max_workers: int = 50) -> Dict[str, Optional[int]]:
+        """并发测试多个节点的延迟，只返回完成测试的节点（不可达节点延迟为None）"""
+        delays: Dict[str, Optional[int]] = {}
+        if not proxy_names:
+            return delays
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(proxy_names))),
+                                thread_name_prefix="DelayTest") as executor:
+            outcomes = executor.map(lambda name: self.test_proxy_delay(name, timeout_ms, test_url), proxy_names)
+            for name, (tested, delay) in zip(proxy_names, outcomes):
+                if tested:
+                    delays[name] = delay
+
+        return delays
+
+    def get_pool_status(self) -> List[Dict]:
+        """多实例模式下各实例的状态"""
+        if self.pool is None:
+            return []
+        return self.pool.status()
+
 
     def start_clash(self) -> bool:
         """启动Clash进程"""
         try:
+            if self.pool is not None and self.pool.workers:
+                return self.pool.start_all()
+
             if self._check_clash_running():
                 self.logger.info("Clash已经在运行")
                 return True
@@ -135,39 +424,17 @@ class LocalClashManager:
                 self.logger.error(f"配置文件不存在: {self.clash_config_path}")
                 return False
 
-            cmd = f'nohup /usr/local/bin/clash -d /root/.config/mihomo > /root/.config/mihomo/clash.log 2>&1 &'
-            self.logger.info(f"启动Clash: {cmd}")
-
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+            process = self._get_process()
+            self.logger.info(f"启动Clash: {process.binary} -d {process.work_dir}")
 
-            if result.returncode != 0:
-                self.logger.error(f"执行启动命令失败: {result.stderr}")
-                return False
-
-            time.sleep(3)
-
-            if self._check_clash_running():
-                self.logger.info("Clash启动成功")
-                try:
-                    pid_result = subprocess.run("pgrep -f '/usr/local/bin/clash -d'",
-                                                shell=True, capture_output=True, text=True)
-                    if pid_result.returncode == 0:
-                        pid = pid_result.stdout.strip()
-                        self.logger.info(f"Clash PID: {pid}")
-                except:
-                    pass
+            if process.start(self.config.get('clash.start_timeout', 30)):
+                self.logger.info(f"Clash启动成功 PID: {process.pid}")
                 return True
             else:
                 self.logger.error("Clash启动后API不可访问")
-                try:
-                    with open('/root/.config/mihomo/clash.log', 'r') as f:
-                        last_lines = f.readlines()[-20:]  # 读取最后20行
-                        self.logger.error(f"Clash日志: {''.join(last_lines)}")
-                except Exception as e:
-                    self.logger.error(f"无法读取日志: {e}")
+                self.logger.error("Clash日志: " + '\n'.join(process.logs(20)))
                 return False
 
-
         except Exception as e:
             self.logger.error(f"启动Clash异常: {e}")
             return False
@@ -175,23 +442,21 @@ class LocalClashManager:
     def stop_clash(self) -> bool:
         """停止Clash进程"""
         try:
-            if self.clash_process:
-                self.logger.info("正在停止Clash进程...")
-                self.clash_process.terminate()
-
-                try:
-                    self.clash_process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    # 强制终止
-                    self.logger.warning("正常终止超时，强制终止Clash")
-                    self.clash_process.kill()
-                    self.clash_process.wait()
-
-                self.clash_process = None
-
+            # 关闭多实例模式后，之前启动的实例同样需要停止
+            pool = LocalClashManager._pool
+            if pool is not None:
+                pool.stop_all()
+
+            process = LocalClashManager._process
+            if process is not None and process.is_alive():
+                self.logger.info(f"正在停止Clash进程 PID: {process.pid}...")
+            if process is not None:
+                process.stop()
+
+            # 清理不是由本进程启动的残留实例（例如上次运行遗留）
             try:
                 result = subprocess.run(
-                    ['pgrep', '-f', 'clash'],
+                    ['pgrep', '-f', f"{self.clash_binary} -d {self.clash_config_path.parent}$"],
                     capture_output=True,
                     text=True
                 )
@@ -203,7 +468,8 @@ class LocalClashManager:
                             os.kill(int(pid), signal.SIGTERM)
                         except:
                             pass
-                    time.sleep(2)
+                    if not self._wait_until_stopped():
+                        self.logger.warning("等待Clash退出超时")
 
             except Exception as e:
                 self.logger.error(f"查找Clash进程失败: {e}")
@@ -218,13 +484,9 @@ class LocalClashManager:
     def restart_clash(self, config_path: str = None) -> bool:
         """重启Clash"""
         try:
-            if config_path and config_path != str(self.clash_config_path):
-                import shutil
-                shutil.copy2(config_path, self.clash_config_path)
-                self.logger.info(f"已更新配置文件: {self.clash_config_path}")
+            self._install_config(config_path)
 
             self.stop_clash()
-            time.sleep(2)
 
             return self.start_clash()
 
@@ -232,12 +494,133 @@ class LocalClashManager:
             self.logger.error(f"重启Clash失败: {e}")
             return False
 
-    def _check_clash_running(self) -> bool:
+    def apply_config(self, config_path: str = None) -> bool:
+        """应用新配置：Clash正常运行时通过控制器热加载，失败时才完整重启"""
+        try:
+            self._install_config(config_path)
+
+            if self.pool is not None and self.pool.workers:
+                return self.pool.apply_all()
+
+            if self._check_clash_running(timeout=2):
+                if self._reload_config():
+                    return True
+                self.logger.warning("热加载配置失败，改为重启Clash")
+                metrics.MIHOMO_RESTARTS.inc(reason='reload')
+
+            return self.restart_clash()
+
+        except Exception as e:
+            self.logger.error(f"应用配置失败: {e}")
+            return False
+
+    def _get_pool(self, size: int) -> ClashWorkerPool:
+        """获取共享的多实例工作池，实例数量变化时在下次生成分片配置时调整"""
+        with LocalClashManager._process_lock:
+            if LocalClashManager._pool is None:
+                LocalClashManager._pool = ClashWorkerPool(self.config, size)
+            LocalClashManager._pool.size = size
+            return LocalClashManager._pool
+
+    def _get_process(self) -> ClashProcess:
+        """获取共享的主进程托管对象"""
+        with LocalClashManager._process_lock:
+            if LocalClashManager._process is None:
+                supervisor = self.config.get('clash.supervisor', {}) or {}
+                LocalClashManager._process = ClashProcess(
+                    self.clash_binary,
+                    self.clash_config_path.parent,
+                    self.clash_api_url,
+                    self.clash_secret,
+                    max_restarts=int(supervisor.get('max_restarts', 5)),
+                    check_interval=float(supervisor.get('check_interval', 2))
+                )
+            return LocalClashManager._process
+
+    @property
+    def clash_process(self) -> Optional[ClashProcess]:
+        """当前托管的主mihomo进程，未由本进程启动时为None"""
+        return LocalClashManager._process
+
+    def get_process_status(self) -> Dict:
+        """主mihomo进程状态"""
+        process = LocalClashManager._process
+        if process is None:
+            return {'pid': None, 'running': self._check_clash_running(timeout=2), 'managed': False}
+        return {**process.status(), 'managed': True}
+
+    def _install_config(self, config_path: Optional[str]):
+        """将指定配置复制到Clash配置目录"""
+        if config_path and config_path != str(self.clash_config_path):
+            import shutil
+            shutil.copy2(config_path, self.clash_config_path)
+            self.logger.info(f"已更新配置文件: {self.clash_config_path}")
+
+    def _reload_config(self) -> bool:
+        """通过控制器重新加载配置文件，并确认新配置已生效"""
+        headers = {'Authorization': f'Bearer {self.clash_secret}'} if self.clash_secret else {}
+        try:
+            response = requests.put(
+                f"{self.clash_api_url}/configs",
+                params={'force': 'true'},
+                json={'path': str(self.clash_config_path.resolve())},
+                headers=headers,
+                timeout=60
+            )
+        except Exception as e:
+            self.logger.error(f"热加载配置请求失败: {e}")
+            return False
+
+        if response.status_code != 204:
+            self.logger.error(f"热加载配置失败: HTTP {response.status_code} {response.text[:200]}")
+            return False
+
+        if not self._wait_until_ready(self.config.get('clash.start_timeout', 30), self._expected_proxy):
+            self.logger.error("热加载后新配置未生效")
+            return False
+
+        self.logger.info("Clash配置已热加载")
+        return True
+
+    def _wait_until_ready(self, timeout: float, proxy_name: Optional[str] = None) -> bool:
+        """轮询控制器直到可访问；指定节点时还需确认该节点已加载"""
+        headers = {'Authorization': f'Bearer {self.clash_secret}'} if self.clash_secret else {}
+        deadline = time.time() + timeout
+        interval = 0.05
+
+        while True:
+            try:
+                if proxy_name:
+                    url = f"{self.clash_api_url}/proxies/{quote(proxy_name, safe='')}"
+                else:
+                    url = f"{self.clash_api_url}/version"
+                if requests.get(url, headers=headers, timeout=2).status_code == 200:
+                    return True
+            except Exception:
+                pass
+
+            if time.time() >= deadline:
+                return False
+            time.sleep(interval)
+            interval = min(interval * 2, 1)
+
+    def _wait_until_stopped(self, timeout: float = 5) -> bool:
+        """轮询控制器直到不可访问"""
+        deadline = time.time() + timeout
+        interval = 0.05
+        while self._check_clash_running(timeout=1):
+            if time.time() >= deadline:
+                return False
+            time.sleep(interval)
+            interval = min(interval * 2, 0.5)
+        return True
+
+    def _check_clash_running(self, timeout: float = 5) -> bool:
         """检查Clash是否在运行"""
         try:
             response = requests.get(
                 f"{self.clash_api_url}/version",
-                timeout=5,
+                timeout=timeout,
                 headers={'Authorization': f'Bearer {self.clash_secret}'} if self.clash_secret else {}
             )
             return response.status_code == 200
@@ -245,32 +628,64 @@ class LocalClashManager:
             return False
 
     def switch_proxy(self, proxy_name: str) -> bool:
-        """切换代理"""
+        """切换代理，并确认GLOBAL已指向目标节点后才返回"""
         try:
             headers = {}
             if self.clash_secret:
                 headers['Authorization'] = f'Bearer {self.clash_secret}'
 
             # 切换GLOBAL代理组
-            response = requests.put(
+            response = self.session.put(
                 f"{self.clash_api_url}/proxies/GLOBAL",
                 json={'name': proxy_name},
                 headers=headers,
                 timeout=10
             )
 
-            if response.status_code == 204:
-                self.logger.info(f"成功切换到代理: {proxy_name}")
-                time.sleep(0.5)
-                return True
-            else:
+            if response.status_code != 204:
                 self.logger.error(f"切换代理失败: {response.status_code}")
                 return False
 
+            if not self._confirm_switch(proxy_name, headers):
+                self.logger.error(f"切换代理未生效: {proxy_name}")
+                return False
+
+            # 关闭旧连接，避免复用上一个节点建立的连接
+            self._close_connections(headers)
+            self.logger.info(f"成功切换到代理: {proxy_name}")
+            return True
+
         except Exception as e:
             self.logger.error(f"切换代理异常: {e}")
             return False
 
+    def _confirm_switch(self, proxy_name: str, headers: Dict[str, str]) -> bool:
+        """轮询GLOBAL直到当前节点与目标一致"""
+        timeout = self.config.get('clash.switch_confirm_timeout', 2)
+        deadline = time.time() + timeout
+        interval = 0.02
+
+        while True:
+            try:
+                response = self.session.get(f"{self.clash_api_url}/proxies/GLOBAL",
+                                            headers=headers, timeout=5)
+                if response.status_code == 200 and response.json().get('now') == proxy_name:
+                    return True
+            except Exception as e:
+                self.logger.debug(f"读取GLOBAL状态失败: {e}")
+
+            if time.time() >= deadline:
+                return False
+            time.sleep(interval)
+            interval = min(interval * 2, 0.2)
+
+    def _close_connections(self, headers: Dict[str, str]):
+        """通过控制器关闭所有现有连接"""
+        try:
+            self.session.delete(f"{self.clash_api_url}/connections", headers=headers, timeout=5)
+        except Exception as e:
+            self.logger.debug(f"关闭旧连接失败: {e}")
+
     def get_current_proxy(self) -> Optional[str]:
         """获取当前使用的代理"""
         try:
@@ -316,10 +731,16 @@ class LocalClashManager:
     def get_clash_logs(self, lines: int = 100) -> List[str]:
         """获取Clash日志"""
         try:
-            if self.clash_process:
-                return ["Clash正在运行"]
-            else:
-                return ["Clash未运行"]
+            process = LocalClashManager._process
+            if process is not None and process.logs(lines):
+                return process.logs(lines)
+
+            log_path = self.clash_config_path.parent / 'clash.log'
+            if log_path.exists():
+                with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+                    return [line.rstrip('\n') for line in deque(f, maxlen=lines)]
+
+            return ["Clash未运行"]
         except Exception as e:
             self.logger.error(f"获取Clash日志失败: {e}")
             return [f"获取日志失败: {e}"]
@@ -0,0 +1,293 @@
+"""
+Clash多实例工作池模块
+"""
+
+import copy
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+from app.core import metrics, yaml_utils
+from app.core.logger import LoggerManager
+from app.core.config import Config
+from app.core.clash_process import ClashProcess
+
+
+# 需要从主配置目录共享给各实例的地理数据文件，避免每个实例启动时重复下载
+GEO_DATA_FILES = ['Country.mmdb', 'geoip.metadb', 'GeoIP.dat', 'GeoSite.dat', 'ASN.mmdb']
+
+
+class ClashWorker:
+    """单个mihomo实例，负责一个节点分片
+
+    进程的启动、输出转发、就绪等待和崩溃重启由 ClashProcess 负责，
+    这里只维护分片信息、热加载和检测前的可用性检查。
+    """
+
+    def __init__(self, index: int, work_dir: Path, controller_port: int, mixed_port: int,
+                 secret: str = '', binary: str = '/usr/local/bin/clash',
+                 max_restarts: int = 5, check_interval: float = 2):
+        self.index = index
+        self.work_dir = work_dir
+        self.controller_port = controller_port
+        self.mixed_port = mixed_port
+        self.secret = secret
+        self.api_url = f"http://127.0.0.1:{controller_port}"
+        self.proxy_names: List[str] = []
+        self.process = ClashProcess(binary, work_dir, self.api_url, secret,
+                                    max_restarts=max_restarts, check_interval=check_interval,
+                                    name=self.name)
+        self.healthy = False
+        self.restarts = 0
+        self.last_error = ''
+        self.lock = threading.Lock()
+        self.logger = LoggerManager.get_logger()
+
+    @property
+    def name(self) -> str:
+        return f"worker-{self.index}"
+
+    @property
+    def config_path(self) -> Path:
+        return self.work_dir / 'config.yaml'
+
+    def _headers(self) -> Dict[str, str]:
+        return {'Authorization': f'Bearer {self.secret}'} if self.secret else {}
+
+    def _api_ok(self) -> bool:
+        try:
+            response = requests.get(f"{self.api_url}/version", timeout=2, headers=self._headers())
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    def start(self, timeout: float = 30) -> bool:
+        """启动实例并等待控制器可访问"""
+        if not self.config_path.exists():
+            self.last_error = f"配置文件不存在: {self.config_path}"
+            self.logger.error(f"[{self.name}] {self.last_error}")
+            return False
+
+        if not self.process.start(timeout):
+            self.last_error = self.process.last_error
+            self.healthy = False
+            return False
+
+        self.healthy = True
+        self.last_error = ''
+        self.logger.info(f"[{self.name}] 启动成功 PID: {self.process.pid}, "
+                         f"控制端口: {self.controller_port}, 节点数: {len(self.proxy_names)}")
+        return True
+
+    def stop(self):
+        """停止实例"""
+        self.process.stop()
+        self.healthy = False
+
+    def reload(self, timeout: float = 30) -> bool:
+        """通过控制器热加载分片配置"""
+        try:
+            response = requests.put(f"{self.api_url}/configs", params={'force': 'true'},
+                                    json={'path': str(self.config_path.resolve())},
+                                    headers=self._headers(), timeout=timeout)
+            if response.status_code != 204:
+                self.last_error = f"热加载失败: HTTP {response.status_code}"
+                self.logger.warning(f"[{self.name}] {self.last_error}")
+                return False
+        except Exception as e:
+            self.last_error = f"热加载失败: {e}"
+            self.logger.warning(f"[{self.name}] {self.last_error}")
+            return False
+
+        self.healthy = self._api_ok()
+        if self.healthy:
+            self.last_error = ''
+            self.logger.info(f"[{self.name}] 配置已热加载，节点数: {len(self.proxy_names)}")
+        return self.healthy
+
+    def check_health(self) -> bool:
+        """检查进程存活且控制器可访问，没有进程句柄时只检查控制器"""
+        alive = self.process.process is None or self.process.is_alive()
+        self.healthy = alive and self._api_ok()
+        if not self.healthy and not self.last_error:
+            self.last_error = "进程已退出" if not alive else "控制器不可访问"
+        return self.healthy
+
+    def ensure_running(self, max_restarts: int = 3) -> bool:
+        """确保实例可用，崩溃时在重启次数限制内自动重启"""
+        with self.lock:
+            if self.healthy and self.process.is_alive():
+                return True
+
+            if self.check_health():
+                return True
+
+            if self.restarts >= max_restarts:
+                return False
+
+            self.restarts += 1
+            metrics.MIHOMO_RESTARTS.inc(reason='worker')
+            self.logger.warning(f"[{self.name}] 实例不可用({self.last_error})，"
+                                f"第 {self.restarts}/{max_restarts} 次重启")
+            return self.start()
+
+    def status(self) -> Dict:
+        """实例状态"""
+        return {
+            'name': self.name,
+            'pid': self.process.pid,
+            'controller_port': self.controller_port,
+            'mixed_port': self.mixed_port,
+            'proxies': len(self.proxy_names),
+            'healthy': self.healthy,
+            'restarts': self.restarts,
+            'last_error': self.last_error
+        }
+
+
+class ClashWorkerPool:
+    """多个mihomo实例组成的工作池，每个实例承载一部分节点"""
+
+    def __init__(self, config: Config, size: int):
+        self.config = config
+        self.logger = LoggerManager.get_logger()
+        self.size = size
+        pool_config = config.get('clash.pool', {}) or {}
+        self.base_dir = Path(pool_config.get('dir', '/root/.config/mihomo/pool'))
+        self.controller_base_port = int(pool_config.get('controller_base_port', 9100))
+        self.mixed_base_port = int(pool_config.get('mixed_base_port', 7900))
+        self.max_restarts = int(pool_config.get('max_restarts', 3))
+        self.geo_data_dir = Path(pool_config.get('geo_data_dir', '/root/.config/mihomo'))
+        self.binary = config.get('clash.binary', '/usr/local/bin/clash')
+        self.secret = config.get('clash.secret', '')
+        supervisor = config.get('clash.supervisor', {}) or {}
+        self.supervisor_restarts = int(supervisor.get('max_restarts', 5))
+        self.check_interval = float(supervisor.get('check_interval', 2))
+        self.workers: List[ClashWorker] = []
+        self._worker_by_proxy: Dict[str, ClashWorker] = {}
+
+    def prepare(self, merged_config: Dict, listener_ports: Dict[str, int]) -> bool:
+        """将合并后的配置按节点切分，为每个实例生成独立配置"""
+        proxies = merged_config.get('proxies', [])
+        if not proxies:
+            return False
+
+        size = max(1, min(self.size, len(proxies)))
+
+        # 保留已有实例以便热加载，多余的实例直接停止
+        for worker in self.workers[size:]:
+            worker.stop()
+        existing = self.workers[:size]
+        self.workers = []
+        self._worker_by_proxy = {}
+
+        shards: List[List[Dict]] = [[] for _ in range(size)]
+        for i, proxy in enumerate(proxies):
+            shards[i % size].append(proxy)
+
+        listener_by_name = {l['proxy']: l for l in merged_config.get('listeners', [])}
+
+        for index, shard in enumerate(shards):
+            work_dir = self.base_dir / f"worker-{index}"
+            work_dir.mkdir(parents=True, exist_ok=True)
+            self._link_geo_data(work_dir)
+
+            if index < len(existing):
+                worker = existing[index]
+            else:
+                worker = ClashWorker(index, work_dir,
+                                     controller_port=self.controller_base_port + index,
+                                     mixed_port=self.mixed_base_port + index,
+                                     secret=self.secret,
+                                     binary=self.binary,
+                                     max_restarts=self.supervisor_restarts,
+                                     check_interval=self.check_interval)
+            worker.proxy_names = [p['name'] for p in shard if p.get('name')]
+
+            # 分片配置不保留原订阅的策略组和规则，避免引用其他分片的节点
+            shard_config = {k: copy.deepcopy(v) for k, v in merged_config.items()
+                            if k not in ('proxies', 'proxy-groups', 'rules', 'rule-providers', 'listeners')}
+            for key in ('port', 'socks-port', 'redir-port', 'tproxy-port'):
+                shard_config.pop(key, None)
+            shard_config['mixed-port'] = worker.mixed_port
+            shard_config['external-controller'] = f"127.0.0.1:{worker.controller_port}"
+            shard_config['proxies'] = shard
+            shard_config['listeners'] = [listener_by_name[name] for name in worker.proxy_names
+                                         if name in listener_by_name and name in listener_ports]
+
+            with open(worker.config_path, 'w', encoding='utf-8') as f:
+                yaml_utils.dump(shard_config, f, allow_unicode=True, sort_keys=False)
+
+            for name in worker.proxy_names:
+                self._worker_by_proxy[name] = worker
+            self.workers.append(worker)
+
+        self.logger.info(f"已生成 {len(self.workers)} 个实例配置，"
+                         f"每个实例约 {len(proxies) // len(self.workers)} 个节点")
+        return True
+
+    def _link_geo_data(self, work_dir: Path):
+        """共享主配置目录中的地理数据文件"""
+        for filename in GEO_DATA_FILES:
+            source = self.geo_data_dir / filename
+            target = work_dir / filename
+            if source.exists() and not target.exists():
+                try:
+                    os.symlink(source, target)
+                except OSError as e:
+                    self.logger.debug(f"链接地理数据失败 {filename}: {e}")
+
+    def start_all(self) -> bool:
+        """并行启动所有实例，只要有一个实例可用即视为成功"""
+        if not self.workers:
+            self.logger.error("工作池没有可启动的实例")
+            return False
+
+        with ThreadPoolExecutor(max_workers=len(self.workers), thread_name_prefix="ClashPool") as executor:
+            started = list(executor.map(lambda w: w.start(), self.workers))
+
+        healthy = sum(1 for ok in started if ok)
+        self.logger.info(f"工作池启动完成: {healthy}/{len(self.workers)} 个实例可用")
+        return healthy > 0
+
+    def apply_all(self) -> bool:
+        """应用新生成的分片配置：可用的实例热加载，其余实例重新启动"""
+        if not self.workers:
+            self.logger.error("工作池没有可启动的实例")
+            return False
+
+        def apply(worker: ClashWorker) -> bool:
+            if worker.check_health() and worker.reload():
+                return True
+            return worker.start()
+
+        with ThreadPoolExecutor(max_workers=len(self.workers), thread_name_prefix="ClashPool") as executor:
+            applied = list(executor.map(apply, self.workers))
+
+        healthy = sum(1 for ok in applied if ok)
+        self.logger.info(f"工作池配置已应用: {healthy}/{len(self.workers)} 个实例可用")
+        return healthy > 0
+
+    def stop_all(self):
+        """停止所有实例"""
+        for worker in self.workers:
+            worker.stop()
+
+    def worker_for(self, proxy_name: str) -> Optional[ClashWorker]:
+        """获取承载节点的实例"""
+        return self._worker_by_proxy.get(proxy_name)
+
+    def ensure_worker(self, proxy_name: str) -> bool:
+        """确保节点所在实例可用"""
+        worker = self.worker_for(proxy_name)
+        if worker is None:
+            return False
+        return worker.ensure_running(self.max_restarts)
+
+    def status(self) -> List[Dict]:
+        """所有实例状态"""
+        return [worker.status() for worker in self.workers]
@@ -0,0 +1,230 @@
+"""
+mihomo进程托管模块
+"""
+
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+from app.core import metrics
+from app.core.logger import LoggerManager
+
+
+# mihomo输出格式: time="..." level=info msg="..."
+_LOG_LEVEL_RE = re.compile(r'\blevel=(\w+)')
+
+
+class ClashProcess:
+    """由本进程直接启动并监督的mihomo子进程
+
+    启动时持有Popen句柄，标准输出逐行转发到日志并保留最近的若干行；
+    后台线程检测进程意外退出并按退避间隔自动重启。主进程和多实例模式下的
+    各个实例都由它托管，name 用于区分日志来源。
+    """
+
+    def __init__(self, binary: str, work_dir: Path, api_url: str, secret: str = '',
+                 log_lines: int = 500, max_restarts: int = 5, check_interval: float = 2,
+                 name: Optional[str] = None):
+        self.name = name
+        # 日志前缀: 主进程为 "Clash启动失败"，实例为 "[worker-0] 启动失败"
+        self.label = f"[{name}] " if name else "Clash"
+        self.binary = binary
+        self.work_dir = work_dir
+        self.api_url = api_url
+        self.secret = secret
+        self.max_restarts = max_restarts
+        self.check_interval = check_interval
+        self.logger = LoggerManager.get_logger()
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self.last_error = ''
+        self.started_at: Optional[float] = None
+        self._logs = deque(maxlen=log_lines)
+        self._lock = threading.RLock()
+        self._stopping = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    @property
+    def log_path(self) -> Path:
+        return self.work_dir / 'clash.log'
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _headers(self) -> Dict[str, str]:
+        return {'Authorization': f'Bearer {self.secret}'} if self.secret else {}
+
+    def start(self, timeout: float = 30) -> bool:
+        """启动进程并等待控制器就绪，成功后启动监督线程"""
+        with self._lock:
+            self._stopping.clear()
+            if not self._spawn():
+                return False
+            ready = self.wait_ready(timeout)
+            if not ready:
+                self.last_error = self.last_error or "启动超时，控制器不可访问"
+                self.logger.error(f"{self.label}启动失败: {self.last_error}")
+                self._terminate()
+                return False
+
+        self._ensure_supervisor()
+        return True
+
+    def _spawn(self) -> bool:
+        self._terminate()
+        try:
+            self.process = subprocess.Popen(
+                [self.binary, '-d', str(self.work_dir)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                stdin=subprocess.DEVNULL,
+                bufsize=1,
+                text=True,
+                encoding='utf-8',
+                errors='replace'
+            )
+        except Exception as e:
+            self.last_error = f"启动失败: {e}"
+            self.logger.error(f"{self.label}{self.last_error}")
+            self.process = None
+            return False
+
+        self.last_error = ''
+        self.started_at = time.time()
+        threading.Thread(target=self._pump_output, args=(self.process,),
+                         name=f"ClashOutput-{self.name}" if self.name else "ClashOutput", daemon=True).start()
+        return True
+
+    def wait_ready(self, timeout: float) -> bool:
+        """以指数退避轮询 /version，进程退出或超时返回False"""
+        deadline = time.time() + timeout
+        interval = 0.05
+        while True:
+            if not self.is_alive():
+                code = self.process.returncode if self.process else None
+                self.last_error = f"进程已退出，返回码: {code}"
+                return False
+            try:
+                response = requests.get(f"{self.api_url}/version", headers=self._headers(), timeout=2)
+                if response.status_code == 200:
+                    return True
+            except Exception:
+                pass
+
+            if time.time() >= deadline:
+                return False
+            time.sleep(interval)
+            interval = min(interval * 2, 1)
+
+    def _pump_output(self, process: subprocess.Popen):
+        """逐行读取进程输出，写入clash.log并转发到日志"""
+        tag = f"[clash:{self.name}]" if self.name else "[clash]"
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as log_file:
+                for line in process.stdout:
+                    line = line.rstrip('\n')
+                    if not line:
+                        continue
+                    self._logs.append(line)
+                    log_file.write(line + '\n')
+                    log_file.flush()
+
+                    match = _LOG_LEVEL_RE.search(line)
+                    level = match.group(1).lower() if match else ''
+                    if level in ('error', 'fatal'):
+                        self.logger.error(f"{tag} {line}")
+                    elif level == 'warning':
+                        self.logger.warning(f"{tag} {line}")
+                    else:
+                        self.logger.debug(f"{tag} {line}")
+        except Exception as e:
+            self.logger.debug(f"读取Clash输出结束: {e}")
+
+    def _ensure_supervisor(self):
+        if self._supervisor is None or not self._supervisor.is_alive():
+            self._supervisor = threading.Thread(
+                target=self._supervise, daemon=True,
+                name=f"ClashSupervisor-{self.name}" if self.name else "ClashSupervisor")
+            self._supervisor.start()
+
+    def _supervise(self):
+        """检测进程意外退出并自动重启，连续稳定运行一分钟后重置重启计数"""
+        while not self._stopping.wait(self.check_interval):
+            with self._lock:
+                if self._stopping.is_set():
+                    break
+                if self.is_alive():
+                    if self.restarts and self.started_at and time.time() - self.started_at > 60:
+                        self.restarts = 0
+                    continue
+
+                code = self.process.returncode if self.process else None
+                if self.restarts >= self.max_restarts:
+                    self.last_error = f"进程已退出，返回码: {code}，已达最大重启次数"
+                    self.logger.error(f"{self.label}{self.last_error}")
+                    break
+
+                self.restarts += 1
+                metrics.MIHOMO_RESTARTS.inc(reason='crash')
+                self.logger.warning(f"{self.label}进程意外退出(返回码: {code})，"
+                                    f"第 {self.restarts}/{self.max_restarts} 次重启")
+
+            # 退避等待放在锁外，期间允许stop()打断
+            if self._stopping.wait(min(2 ** (self.restarts - 1), 30)):
+                break
+
+            with self._lock:
+                if self._stopping.is_set():
+                    break
+                # 等待期间可能已由 start() 重新启动
+                if self.is_alive():
+                    continue
+                if self._spawn() and self.wait_ready(30):
+                    self.logger.info(f"{self.label}已重启 PID: {self.pid}")
+                else:
+                    self.logger.error(f"{self.label}重启失败: {self.last_error}")
+
+    def stop(self, timeout: float = 5):
+        """停止进程和监督线程"""
+        self._stopping.set()
+        with self._lock:
+            self._terminate(timeout)
+
+    def _terminate(self, timeout: float = 5):
+        if self.process is None:
+            return
+
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.logger.warning(f"{self.label}正常终止超时，强制终止")
+                self.process.kill()
+                self.process.wait()
+
+        self.process = None
+
+    def logs(self, lines: int = 100) -> List[str]:
+        """最近的进程输出"""
+        return list(self._logs)[-lines:]
+
+    def status(self) -> Dict:
+        """进程状态"""
+        return {
+            'pid': self.pid,
+            'running': self.is_alive(),
+            'restarts': self.restarts,
+            'started_at': self.started_at,
+            'last_error': self.last_error
+        }
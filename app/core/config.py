@@ -4,10 +4,11 @@
 
 import os
 
-import yaml
 from typing import Any, Dict
 from threading import Lock
 
+from app.core import yaml_utils
+
 
 class Config:
     """配置管理器 - 单例模式"""
@@ -55,7 +56,7 @@ class Config:
 
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r', encoding='utf-8') as f:
-                    self._config = yaml.safe_load(f) or {}
+                    self._config = yaml_utils.safe_load(f) or {}
                 print(f"[Config] 成功加载配置文件")
                 return True
             else:
@@ -78,10 +79,10 @@ class Config:
             with self._config_lock:
                 os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
                 with open(self.config_file, 'w', encoding='utf-8') as f:
-                    yaml.dump(self._config, f,
-                             default_flow_style=False,
-                             allow_unicode=True,
-                             sort_keys=False)
+                    yaml_utils.dump(self._config, f,
+                                    default_flow_style=False,
+                                    allow_unicode=True,
+                                    sort_keys=False)
                 print(f"[Config] 配置已保存到: {self.config_file}")
                 return True
         except Exception as e:
@@ -0,0 +1,45 @@
+"""
+进程内事件总线模块
+"""
+
+from typing import Callable, Dict, List
+
+from app.core.logger import LoggerManager
+
+
+EventCallback = Callable[[str, Dict], None]
+
+
+class EventBus:
+    """进程内事件总线
+
+    检测线程发布检测进度等事件，Web层订阅后转发给浏览器。
+    发布在发布者线程中同步调用订阅回调，回调需线程安全且不能阻塞。
+    """
+
+    _subscribers: List[EventCallback] = []
+
+    @classmethod
+    def subscribe(cls, callback: EventCallback):
+        """订阅所有事件"""
+        # 写时复制，发布线程遍历时不受影响
+        if callback not in cls._subscribers:
+            cls._subscribers = cls._subscribers + [callback]
+
+    @classmethod
+    def unsubscribe(cls, callback: EventCallback):
+        """取消订阅"""
+        cls._subscribers = [c for c in cls._subscribers if c != callback]
+
+    @classmethod
+    def has_subscribers(cls) -> bool:
+        return bool(cls._subscribers)
+
+    @classmethod
+    def publish(cls, event: str, data: Dict):
+        """发布事件"""
+        for callback in cls._subscribers:
+            try:
+                callback(event, data)
+            except Exception as e:
+                LoggerManager.get_logger().debug(f"事件处理失败 {event}: {e}")
@@ -0,0 +1,18 @@
+"""
+节点指纹模块
+"""
+
+import hashlib
+import json
+from typing import Dict
+
+
+# 只影响展示、不影响连接的字段
+DISPLAY_ONLY_KEYS = {'name'}
+
+
+def proxy_fingerprint(proxy: Dict) -> str:
+    """根据节点的连接参数（类型、服务器、端口、凭据等）生成稳定指纹，与显示名称无关"""
+    params = {k: v for k, v in proxy.items() if k not in DISPLAY_ONLY_KEYS}
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
@@ -0,0 +1,264 @@
+"""
+检测结果历史存储模块
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.core.logger import LoggerManager
+from app.core.config import Config
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    checked_at REAL NOT NULL,
+    total INTEGER NOT NULL,
+    full INTEGER NOT NULL,
+    partial INTEGER NOT NULL,
+    blocked INTEGER NOT NULL,
+    failed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    fingerprint TEXT,
+    name TEXT NOT NULL,
+    type TEXT,
+    server TEXT,
+    port INTEGER,
+    status TEXT NOT NULL,
+    region TEXT,
+    delay INTEGER,
+    details TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_checked_at ON results (checked_at);
+CREATE INDEX IF NOT EXISTS idx_results_fingerprint ON results (fingerprint, checked_at);
+CREATE INDEX IF NOT EXISTS idx_results_region ON results (region, checked_at);
+CREATE INDEX IF NOT EXISTS idx_results_status ON results (status, checked_at);
+CREATE INDEX IF NOT EXISTS idx_results_run ON results (run_id);
+"""
+
+RESULT_COLUMNS = ('id', 'run_id', 'fingerprint', 'name', 'type', 'server', 'port',
+                  'status', 'region', 'delay', 'details', 'checked_at')
+
+MAX_PAGE_SIZE = 1000
+
+
+def _to_timestamp(value) -> Optional[float]:
+    """将ISO时间或时间戳转换为时间戳"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _to_iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+class HistoryStore:
+    """SQLite保存的历史检测结果，每轮检测批量写入一次
+
+    查询按 (checked_at, id) 倒序做键集分页，游标为上一页最后一行的 "checked_at:id"，
+    翻页不随偏移量变慢。
+    """
+
+    _initialized = set()
+    _init_lock = threading.Lock()
+
+    def __init__(self, config: Config, db_path: Optional[str] = None):
+        self.logger = LoggerManager.get_logger()
+        self.enabled = config.get('history.enable', True)
+        self.db_path = db_path or config.get('history.db', 'results/history.db')
+        self.retention_days = config.get('history.retention_days', 90)
+        if self.enabled:
+            self._ensure_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self):
+        with HistoryStore._init_lock:
+            if self.db_path in HistoryStore._initialized:
+                return
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = self._connect()
+            try:
+                # WAL模式下写入检测结果时不阻塞Web接口的查询
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(SCHEMA)
+                conn.commit()
+            finally:
+                conn.close()
+            HistoryStore._initialized.add(self.db_path)
+
+    def record_run(self, results: List[Dict], summary: Dict) -> Optional[int]:
+        """在一个事务中写入一轮检测的所有结果，返回本轮ID
+
+        复用缓存的结果和去重折叠的别名节点不是本轮实际检测的，不写入历史。
+        """
+        if not self.enabled:
+            return None
+
+        checked_at = _to_timestamp(summary.get('check_time')) or datetime.now().timestamp()
+        rows = []
+        for r in results:
+            if r.get('cached') or r.get('alias_of'):
+                continue
+            rows.append((r.get('fingerprint'), r.get('name', 'Unknown'), r.get('type'), r.get('server'),
+                         r.get('port') if isinstance(r.get('port'), int) else None,
+                         r.get('status', 'failed'), r.get('region'), r.get('delay'), r.get('details'),
+                         _to_timestamp(r.get('check_time')) or checked_at))
+
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    'INSERT INTO runs (checked_at, total, full, partial, blocked, failed) VALUES (?, ?, ?, ?, ?, ?)',
+                    (checked_at, summary.get('total', 0), summary.get('full', 0), summary.get('partial', 0),
+                     summary.get('blocked', 0), summary.get('failed', 0)))
+                run_id = cursor.lastrowid
+                conn.executemany(
+                    'INSERT INTO results (run_id, fingerprint, name, type, server, port, status, region, '
+                    'delay, details, checked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    [(run_id,) + row for row in rows])
+
+                if self.retention_days:
+                    cutoff = (datetime.now() - timedelta(days=self.retention_days)).timestamp()
+                    conn.execute('DELETE FROM results WHERE checked_at < ?', (cutoff,))
+                    conn.execute('DELETE FROM runs WHERE checked_at < ?', (cutoff,))
+
+            self.logger.info(f"历史记录已写入 {len(rows)} 条结果")
+            return run_id
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _filters(fingerprint: Optional[str] = None, name: Optional[str] = None,
+                 region: Optional[str] = None, status: Optional[List[str]] = None,
+                 since=None, until=None, run_id: Optional[int] = None) -> Tuple[List[str], List]:
+        clauses, params = [], []
+        if fingerprint:
+            clauses.append('fingerprint = ?')
+            params.append(fingerprint)
+        if name:
+            clauses.append('name = ?')
+            params.append(name)
+        if region:
+            clauses.append('region = ?')
+            params.append(region.upper())
+        if status:
+            clauses.append(f"status IN ({', '.join('?' * len(status))})")
+            params.extend(status)
+        if since is not None:
+            clauses.append('checked_at >= ?')
+            params.append(_to_timestamp(since))
+        if until is not None:
+            clauses.append('checked_at < ?')
+            params.append(_to_timestamp(until))
+        if run_id is not None:
+            clauses.append('run_id = ?')
+            params.append(run_id)
+        return clauses, params
+
+    def query(self, limit: int = 100, cursor: Optional[str] = None, **filters) -> Dict:
+        """按条件查询历史结果，返回 {'items', 'next_cursor'}"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = self._filters(**filters)
+
+        if cursor:
+            checked_at, last_id = cursor.split(':', 1)
+            clauses.append('(checked_at < ? OR (checked_at = ? AND id < ?))')
+            params.extend([float(checked_at), float(checked_at), int(last_id)])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = (f"SELECT {', '.join(RESULT_COLUMNS)} FROM results {where} "
+               f"ORDER BY checked_at DESC, id DESC LIMIT ?")
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+        finally:
+            conn.close()
+
+        items = [self._row_to_dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = f"{last['checked_at']!r}:{last['id']}"
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def nodes(self, limit: int = 100, cursor: Optional[str] = None, **filters) -> Dict:
+        """按节点聚合：满足条件的节点、命中次数及最近一次命中，按指纹键集分页"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses, params = self._filters(**filters)
+        clauses.append('fingerprint IS NOT NULL')
+        if cursor:
+            clauses.append('fingerprint > ?')
+            params.append(cursor)
+
+        sql = (f"SELECT fingerprint, COUNT(*) AS hits, MAX(checked_at) AS last_checked_at, "
+               f"GROUP_CONCAT(DISTINCT region) AS regions FROM results "
+               f"WHERE {' AND '.join(clauses)} GROUP BY fingerprint ORDER BY fingerprint LIMIT ?")
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+            items = []
+            for row in rows[:limit]:
+                latest = conn.execute(
+                    'SELECT name, type, server, port, status, region, delay FROM results '
+                    'WHERE fingerprint = ? ORDER BY checked_at DESC LIMIT 1', (row['fingerprint'],)).fetchone()
+                items.append({
+                    'fingerprint': row['fingerprint'],
+                    'hits': row['hits'],
+                    'last_checked': _to_iso(row['last_checked_at']),
+                    'regions': sorted(filter(None, (row['regions'] or '').split(','))),
+                    'latest': dict(latest) if latest else None
+                })
+        finally:
+            conn.close()
+
+        next_cursor = rows[limit - 1]['fingerprint'] if len(rows) > limit else None
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def runs(self, limit: int = 20, before: Optional[int] = None) -> Dict:
+        """最近的检测轮次"""
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sql = 'SELECT * FROM runs'
+        params: List = []
+        if before is not None:
+            sql += ' WHERE id < ?'
+            params.append(int(before))
+        sql += ' ORDER BY id DESC LIMIT ?'
+
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params + [limit + 1]).fetchall()
+        finally:
+            conn.close()
+
+        items = []
+        for row in rows[:limit]:
+            item = dict(row)
+            item['check_time'] = _to_iso(item.pop('checked_at'))
+            items.append(item)
+        next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+        return {'items': items, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict:
+        item = dict(row)
+        item['check_time'] = _to_iso(item.pop('checked_at'))
+        return item
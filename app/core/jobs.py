@@ -0,0 +1,46 @@
+"""
+检测任务队列的任务定义
+"""
+
+import time
+import uuid
+from typing import Dict, Iterable, Optional
+
+from app.core.scan_run import ScanRun
+
+
+FULL_SCAN = 'full_scan'
+RECHECK_UNLOCKED = 'recheck_unlocked'
+CHECK_NODES = 'check_nodes'
+JOB_KINDS = (FULL_SCAN, RECHECK_UNLOCKED, CHECK_NODES)
+
+
+class Job:
+    """队列中的一个任务
+
+    full_scan 下载订阅、应用配置并检测全部节点；recheck_unlocked 和 check_nodes
+    只检测部分节点，使用Clash当前已加载的配置，可以与完整检测同时进行。
+    执行状态和取消由 run 负责，排队中的任务状态为 pending。
+    """
+
+    def __init__(self, kind: str, names: Optional[Iterable[str]] = None):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.names = [n for n in (names or []) if n]
+        self.submitted_at = time.time()
+        self.run = ScanRun(trigger=f'job:{kind}')
+        self.summary: Optional[Dict] = None
+
+    @property
+    def is_full_scan(self) -> bool:
+        return self.kind == FULL_SCAN
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'names': self.names,
+            'submitted_at': self.submitted_at,
+            'summary': self.summary,
+            **self.run.to_dict()
+        }
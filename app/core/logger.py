@@ -6,8 +6,67 @@ import os
 import sys
 import logging
 import logging.handlers
+from collections import deque
 from datetime import datetime
-from typing import Optional
+from itertools import islice
+from threading import Lock
+from typing import Callable, List, Optional, Tuple
+
+
+class LogRingBuffer:
+    """固定容量的线程安全日志环形缓冲区
+
+    每条日志分配单调递增的序号，读取方记住最后看到的序号，
+    之后只取更新的日志；缓冲区写满后最旧的日志被覆盖。
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self._entries = deque(maxlen=capacity)
+        self._lock = Lock()
+        self._last_seq = 0
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    def append(self, entry: dict) -> int:
+        """写入一条日志，返回其序号"""
+        with self._lock:
+            self._last_seq += 1
+            entry['seq'] = self._last_seq
+            self._entries.append(entry)
+            return self._last_seq
+
+    def latest(self, limit: int = 100) -> List[dict]:
+        """最近的limit条日志"""
+        with self._lock:
+            return self._tail(min(limit, len(self._entries)))
+
+    def since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[dict], int, bool]:
+        """序号大于seq的日志，返回 (日志, 最新序号, 是否有日志已被覆盖而丢失)
+
+        指定limit时只返回最早的limit条，读取方可以用返回的最后一条日志序号继续读取。
+        seq 大于最新序号说明服务已重启、序号重新计数，此时返回全部日志并视为有日志丢失。
+        """
+        with self._lock:
+            last_seq = self._last_seq
+            reset = seq > last_seq
+            pending = last_seq if reset else last_seq - seq
+            available = min(pending, len(self._entries))
+            entries = self._tail(available)
+        if limit is not None:
+            entries = entries[:limit]
+        return entries, last_seq, reset or pending > available
+
+    def _tail(self, count: int) -> List[dict]:
+        tail = list(islice(reversed(self._entries), count))
+        tail.reverse()
+        return tail
+
+    def clear(self):
+        """清空日志，序号继续递增"""
+        with self._lock:
+            self._entries.clear()
 
 
 class LoggerManager:
@@ -15,8 +74,9 @@ class LoggerManager:
 
     _instance = None
     _logger = None
-    _log_buffer = []  # 日志缓冲区
     _max_buffer_size = 1000  # 最大缓冲区大小
+    _log_buffer = LogRingBuffer(_max_buffer_size)  # 日志缓冲区
+    _listeners: List[Callable[[], None]] = []  # 新日志通知，回调需线程安全且不能阻塞
 
     def __new__(cls):
         if cls._instance is None:
@@ -41,14 +101,38 @@ class LoggerManager:
 
         cls._log_buffer.append(log_entry)
 
-        # 限制缓冲区大小
-        if len(cls._log_buffer) > cls._max_buffer_size:
-            cls._log_buffer.pop(0)
+        for listener in cls._listeners:
+            try:
+                listener()
+            except Exception:
+                pass
+
+    @classmethod
+    def add_listener(cls, listener: Callable[[], None]):
+        """注册新日志通知回调"""
+        # 写时复制，写日志的线程遍历时不受影响
+        if listener not in cls._listeners:
+            cls._listeners = cls._listeners + [listener]
+
+    @classmethod
+    def remove_listener(cls, listener: Callable[[], None]):
+        """取消新日志通知回调"""
+        cls._listeners = [l for l in cls._listeners if l != listener]
 
     @classmethod
     def get_logs(cls, limit: int = 100) -> list:
         """获取最近的日志"""
-        return cls._log_buffer[-limit:]
+        return cls._log_buffer.latest(limit)
+
+    @classmethod
+    def get_logs_since(cls, seq: int, limit: Optional[int] = None) -> Tuple[List[dict], int, bool]:
+        """获取序号大于seq的日志，返回 (日志, 最新序号, 是否有日志已丢失)"""
+        return cls._log_buffer.since(seq, limit)
+
+    @classmethod
+    def last_log_seq(cls) -> int:
+        """最新一条日志的序号"""
+        return cls._log_buffer.last_seq
 
     @classmethod
     def clear_logs(cls):
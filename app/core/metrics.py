@@ -0,0 +1,217 @@
+"""
+运行指标模块 - 计数器、仪表和直方图，按Prometheus文本格式导出
+"""
+
+import math
+from threading import Lock
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# 单次请求各阶段耗时（秒）
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+# 单次请求读取的字节数
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 131072, 262144, 524288, 1048576)
+# 一轮检测或一个阶段的耗时（秒）
+SCAN_BUCKETS = (1, 10, 30, 60, 300, 600, 1200, 1800, 3600, 7200, 14400)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = Lock()
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple('' if labels.get(n) is None else str(labels.get(n)) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key: Tuple[str, ...], value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    """只增不减的计数"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可任意设置的当前值"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """按上界分桶统计的观测值分布"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, key: Tuple[str, ...], state) -> List[str]:
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric: _Metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+PROBE_PHASE_SECONDS = REGISTRY.histogram(
+    'netflix_probe_phase_seconds',
+    '单次检测请求各阶段耗时，按请求结果和响应中的地区: connect 新建连接（含代理握手和TLS，'
+    '仅异步引擎单独记录）, ttfb 从发起请求到收到最终响应头（含全部重定向，同步引擎同时包含建立连接和TLS）, '
+    'body 读取响应体',
+    ('phase', 'outcome', 'region'))
+NODE_SWITCH_SECONDS = REGISTRY.histogram(
+    'netflix_node_switch_seconds', '检测前切换到节点的耗时，按节点结果状态和地区', ('status', 'region'))
+PROBE_REQUESTS = REGISTRY.counter(
+    'netflix_probe_requests_total', 'Netflix检测请求数，按结果分类', ('outcome',))
+PROBE_RESPONSE_BYTES = REGISTRY.histogram(
+    'netflix_probe_response_bytes', '单次检测读取的响应体字节数', buckets=BYTES_BUCKETS)
+PROBE_BYTES = REGISTRY.counter(
+    'netflix_probe_bytes_total', '检测读取的响应体总字节数')
+NODE_RESULTS = REGISTRY.counter(
+    'netflix_node_results_total', '实际检测的节点结果数，按状态和地区', ('status', 'region'))
+NODE_CHECK_SECONDS = REGISTRY.histogram(
+    'netflix_node_check_seconds', '单个节点检测总耗时，按状态和地区', ('status', 'region'))
+SCAN_DURATION_SECONDS = REGISTRY.histogram(
+    'netflix_scan_duration_seconds', '检测任务总耗时，按任务类型和结束状态', ('kind', 'state'),
+    buckets=SCAN_BUCKETS)
+SCAN_STAGE_SECONDS = REGISTRY.histogram(
+    'netflix_scan_stage_seconds', '完整检测各阶段耗时: download, apply, prefilter, check, save', ('stage',),
+    buckets=SCAN_BUCKETS)
+SCAN_NODES_PER_SECOND = REGISTRY.gauge(
+    'netflix_scan_nodes_per_second', '当前或最近一轮检测的速度（不含缓存和恢复的节点）')
+SCAN_PENDING_NODES = REGISTRY.gauge(
+    'netflix_scan_pending_nodes', '当前检测中尚未得出结果的节点数')
+JOB_QUEUE_DEPTH = REGISTRY.gauge(
+    'netflix_job_queue_depth', '任务队列中排队的任务数', ('lane',))
+MIHOMO_RESTARTS = REGISTRY.counter(
+    'netflix_mihomo_restarts_total', 'mihomo重启次数: crash 崩溃后自动重启, worker 多实例中的实例重启, '
+    'reload 热加载失败后重启', ('reason',))
+
+
+def observe_probe(outcome: str, total: float, ttfb: Optional[float] = None,
+                  connect: Optional[float] = None, bytes_read: int = 0, region: Optional[str] = None):
+    """记录一次检测请求，各阶段耗时按请求结果和响应中识别出的地区分类
+
+    ttfb 为发起请求到收到最终响应头的时间（含重定向）减去 connect；无法单独测量 connect 时
+    ttfb 包含建立连接和TLS的时间，body 为其余时间。
+    """
+    PROBE_REQUESTS.inc(outcome=outcome)
+    labels = {'outcome': outcome, 'region': region}
+    if connect is not None:
+        PROBE_PHASE_SECONDS.observe(connect, phase='connect', **labels)
+    if ttfb is not None:
+        PROBE_PHASE_SECONDS.observe(ttfb, phase='ttfb', **labels)
+        PROBE_PHASE_SECONDS.observe(max(0.0, total - ttfb - (connect or 0)), phase='body', **labels)
+    if bytes_read:
+        PROBE_RESPONSE_BYTES.observe(bytes_read)
+        PROBE_BYTES.inc(bytes_read)
+
+
+def observe_node(result: Dict, total: float, switch: Optional[float] = None):
+    """记录一个节点的检测耗时；切换节点的耗时在结果确定后按节点状态和地区记录"""
+    labels = {'status': result['status'], 'region': result['region']}
+    if switch is not None:
+        NODE_SWITCH_SECONDS.observe(switch, **labels)
+    NODE_CHECK_SECONDS.observe(total, **labels)
+
+
+def render() -> str:
+    return REGISTRY.render()
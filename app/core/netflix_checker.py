@@ -6,22 +6,145 @@ import os
 import json
 import time
 import requests
-import re
+import codecs
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-
-import yaml
+from typing import Callable, Dict, List, Optional, Tuple
 
+from app.core import async_prober, metrics, yaml_utils
 from app.core.logger import LoggerManager
 from app.core.config import Config
 from app.core.clash_manager import LocalClashManager
+from app.core.region_extractor import DEFAULT_EXTRACTOR, region_from_url
+from app.core.fingerprint import proxy_fingerprint
+from app.core.result_cache import ResultCache
+from app.core.result_journal import ResultJournal
+from app.core.history_store import HistoryStore
+from app.core.results_service import ResultsService
+from app.core.subscription_service import SubscriptionService
+from app.core.events import EventBus
+from app.core.scan_run import ScanCancelled, ScanRun
+
+
+class ScanProgress:
+    """一轮检测的进度统计：各状态数量、检测速度和预计完成时间
+
+    缓存和恢复的结果计入完成数，但不参与速度计算。
+    """
+
+    STATUSES = ('full', 'partial', 'blocked', 'failed')
+
+    def __init__(self, total: int, run_id: Optional[str] = None):
+        self.total = total
+        self.run_id = run_id
+        self.started_at = time.time()
+        self.completed = 0
+        self.checked = 0
+        self.counts = {status: 0 for status in self.STATUSES}
+        self._lock = threading.Lock()
+
+    def add_known(self, result: Dict):
+        """计入无需检测的结果（缓存命中或从日志恢复）"""
+        with self._lock:
+            self.completed += 1
+            self.counts[result['status']] = self.counts.get(result['status'], 0) + 1
+
+    def record(self, result: Dict) -> Dict:
+        """计入一个检测结果，返回进度事件"""
+        with self._lock:
+            self.completed += 1
+            self.checked += 1
+            self.counts[result['status']] = self.counts.get(result['status'], 0) + 1
+            event = self.snapshot()
+        event['result'] = result
+        return event
+
+    def snapshot(self) -> Dict:
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        rate = self.checked / elapsed
+        remaining = self.total - self.completed
+        eta = remaining / rate if rate > 0 else None
+        return {
+            'run_id': self.run_id,
+            'total': self.total,
+            'completed': self.completed,
+            'counts': dict(self.counts),
+            'elapsed': round(elapsed, 1),
+            'rate': round(rate, 2),
+            'eta': round(eta, 1) if eta is not None else None,
+            'eta_time': datetime.fromtimestamp(time.time() + eta).isoformat() if eta is not None else None
+        }
+
+
+class ResponseScanner:
+    """增量扫描响应体，命中错误信息或地区信息后即可停止读取"""
+
+    # 相邻分块之间保留的重叠字符数，避免标记被分块截断
+    OVERLAP = 256
+    HEAD_SIZE = 200
+
+    def __init__(self, error_msg: str, match_region: Callable[[str], Optional[Tuple[str, str]]],
+                 need_region: bool = True, max_bytes: int = 512 * 1024, encoding: Optional[str] = None):
+        self.error_msg = error_msg
+        self.match_region = match_region
+        self.need_region = need_region
+        self.max_bytes = max_bytes
+        try:
+            self._decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._tail = ''
+        self.head = ''
+        self.bytes_read = 0
+        self.blocked = False
+        self.region: Optional[str] = None
+        self.region_source: Optional[str] = None
+        self.finished_early = False
+
+    def feed(self, chunk: bytes) -> bool:
+        """输入一个分块，返回True表示已得到结论可以停止读取"""
+        if not chunk:
+            return False
+
+        self.bytes_read += len(chunk)
+        text = self._decoder.decode(chunk)
+        if len(self.head) < self.HEAD_SIZE:
+            self.head = (self.head + text)[:self.HEAD_SIZE]
+
+        window = self._tail + text
+        self._tail = window[-self.OVERLAP:]
+
+        if self.error_msg and self.error_msg in window:
+            self.blocked = True
+            self.finished_early = True
+            return True
+
+        if self.need_region and self.region is None:
+            matched = self.match_region(window)
+            if matched:
+                self.region, self.region_source = matched
+                self.finished_early = True
+                return True
+
+        if self.bytes_read >= self.max_bytes:
+            self.finished_early = True
+            return True
+
+        return False
+
 
 class NetflixChecker:
     """Netflix解锁检测器"""
-    def __init__(self, config: Config):
+
+    STREAM_CHUNK_SIZE = 16 * 1024
+    # 完整检测与指定节点检测可能同时结束，结果文件和订阅文件的读取、合并和写入依次进行
+    _results_lock = threading.Lock()
+
+    def __init__(self, config: Config, clash_manager: Optional[LocalClashManager] = None):
         self.config = config
         self.logger = LoggerManager.get_logger()
-        self.clash_manager = LocalClashManager(config)
+        self.clash_manager = clash_manager or LocalClashManager(config)
         # Netflix配置
         self.test_urls = config.get('netflix.test_urls', [
             "https://www.netflix.com/title/70143836",
@@ -32,210 +155,344 @@ class NetflixChecker:
         self.user_agent = config.get('netflix.user_agent',
                                      'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
         self.accept_language = config.get('netflix.accept_language', 'en-US,en;q=0.9')
+        self.max_workers = config.get('netflix.max_workers', 10)
+        self.url_interval = config.get('netflix.url_interval', 0)
+        # 流式读取响应：命中错误信息或地区后立即停止，最多读取max_body_bytes字节
+        self.streaming = config.get('netflix.streaming', True)
+        self.max_body_bytes = config.get('netflix.max_body_bytes', 512 * 1024)
+        # 检测引擎: sync(线程) / async(asyncio)
+        self.engine = config.get('netflix.engine', 'sync')
+        self.async_concurrency = config.get('netflix.async_concurrency', 100)
+        # 检测前通过Clash延迟接口批量过滤不可达节点
+        prefilter_config = config.get('netflix.prefilter', {}) or {}
+        self.prefilter_enabled = prefilter_config.get('enable', True)
+        self.prefilter_timeout = prefilter_config.get('timeout', 3000)
+        self.prefilter_url = prefilter_config.get('url', 'http://www.gstatic.com/generate_204')
+        self.prefilter_workers = prefilter_config.get('max_workers', 50)
         # 代理配置
-        proxy_config = config.get('clash.proxy', {})
+        self.proxy_config = config.get('clash.proxy', {})
+        self.proxies = self._build_proxies(self.proxy_config['port'])
+        # 结果存储
+        self.results_file = "results/netflix_check_results.json"
+        os.makedirs(os.path.dirname(self.results_file), exist_ok=True)
+        self.result_cache = ResultCache(config)
+        # 本轮检测的结果日志，逐个节点落盘，中断后可恢复
+        self.journal = ResultJournal(config)
+        self._delays: Dict[str, Optional[int]] = {}
+        self._progress: Optional[ScanProgress] = None
+        # 完整检测发布 scan_progress；指定节点检测可能与完整检测同时进行，单独发布 job_progress
+        self._progress_event = 'scan_progress'
+        self._run: Optional[ScanRun] = None
+        # 本轮完整检测开始的时间，保存时保留这之后由指定节点检测写入的更新结果
+        self._scan_started_at: Optional[datetime] = None
+        # 结果写入日志、计入进度和发布事件的顺序保持一致，前端据此判断推送的结果是否已包含在接口返回中
+        self._record_lock = threading.Lock()
+
+    def _build_proxies(self, port: int) -> Dict[str, str]:
+        """构造指向本地Clash端口的requests代理配置"""
+        proxy_config = self.proxy_config
         if proxy_config.get('auth'):
             proxy_url = f"http://{proxy_config['user']}:{proxy_config['pass']}@" \
-                        f"{proxy_config['host']}:{proxy_config['port']}"
+                        f"{proxy_config['host']}:{port}"
         else:
-            proxy_url = f"http://{proxy_config['host']}:{proxy_config['port']}"
-        self.proxies = {
+            proxy_url = f"http://{proxy_config['host']}:{port}"
+        return {
             'http': proxy_url,
             'https': proxy_url
         }
-        # 结果存储
-        self.results_file = "results/netflix_check_results.json"
-        os.makedirs(os.path.dirname(self.results_file), exist_ok=True)
 
-    def _test_single_url(self, url: str, proxy_name: str) -> Tuple[bool, Optional[str], Optional[str]]:
+    def _get_node_proxies(self, proxy_name: str) -> Optional[Dict[str, str]]:
+        """获取节点独立监听端口对应的代理配置，没有独立端口时返回None"""
+        port = self.clash_manager.get_listener_port(proxy_name)
+        if port is None:
+            return None
+        return self._build_proxies(port)
+
+    def _test_single_url(self, url: str, proxy_name: str,
+                         proxies: Optional[Dict[str, str]] = None) -> Tuple[bool, Optional[str], Optional[str]]:
         """测试单个URL
 
         返回: (是否成功, 地区码, 响应内容)
         """
+        started = time.monotonic()
+        ttfb: Optional[float] = None
+        bytes_read = 0
+        outcome = 'error'
+        region: Optional[str] = None
         try:
-            headers = {
-                'User-Agent': self.user_agent,
-                'Accept-Language': self.accept_language,
-                # 添加防缓存头
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+            headers = self._request_headers()
 
             # 创建新的session避免缓存
             session = requests.Session()
-            session.proxies = self.proxies
+            session.proxies = proxies or self.proxies
 
             self.logger.debug(f"[{proxy_name}] 正在请求: {url}")
 
+            # 始终以流式发起请求，收到最终响应头即返回；response.elapsed 只包含最后一跳，
+            # 这里从发起请求开始计时，建立连接、TLS握手和重定向都计入等待响应头的时间
             response = session.get(
                 url,
                 headers=headers,
                 timeout=self.timeout,
-                allow_redirects=True
+                allow_redirects=True,
+                stream=True
             )
+            ttfb = time.monotonic() - started
 
             self.logger.debug(f"[{proxy_name}] 响应状态码: {response.status_code}")
             self.logger.debug(f"[{proxy_name}] 最终URL: {response.url}")
 
-            if response.status_code == 200:
-                content = response.text
-
-                # 检查是否被封锁
-                if self.error_msg in content:
-                    self.logger.debug(f"[{proxy_name}] 检测到错误信息: {self.error_msg}")
-                    return False, None, content
-
-                # 从最终URL提取地区
-                final_url = response.url
-                self.logger.debug(f"[{proxy_name}] 分析最终URL: {final_url}")
-
-                # 尝试从URL路径中提取地区码
-                # 格式: https://www.netflix.com/sg/title/xxx 或 https://www.netflix.com/sg-en/title/xxx
-                match = re.search(r'netflix\.com/([a-z]{2}(?:-[a-z]{2})?)/title', final_url, re.IGNORECASE)
-                if match:
-                    region = match.group(1).upper()
-                    self.logger.debug(f"[{proxy_name}] 从URL提取到地区: {region}")
-                else:
-                    # 如果URL中没有地区，尝试从内容提取
-                    self.logger.debug(f"[{proxy_name}] URL中未找到地区信息，尝试从内容提取")
-                    region = self._extract_region_from_content(content, proxy_name)
-                    if not region:
-                        # 检查是否直接跳转到了主域名
-                        if "www.netflix.com/title" in final_url and "/title" == final_url.split("netflix.com")[1][:6]:
-                            region = 'US'  # 默认为美国
-                            self.logger.debug(f"[{proxy_name}] 使用默认地区: US")
-
-                session.close()
-                return True, region, content
-            else:
+            try:
+                if response.status_code != 200:
+                    outcome = 'http_error'
+                    return False, None, f"HTTP {response.status_code}"
+
+                if not self.streaming:
+                    bytes_read = len(response.content)
+                    analyzed = self._analyze_response(response.url, response.text, proxy_name)
+                    outcome = 'success' if analyzed[0] else 'blocked'
+                    region = analyzed[1]
+                    return analyzed
+
+                content_type = response.headers.get('Content-Type', '')
+                if not self._is_html(content_type):
+                    self.logger.debug(f"[{proxy_name}] 非HTML响应: {content_type}")
+                    outcome = 'unexpected_content'
+                    return False, None, f"Unexpected Content-Type: {content_type}"
+
+                scanner = self._new_scanner(response.url, response.encoding)
+                for chunk in response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE):
+                    if scanner.feed(chunk):
+                        break
+                bytes_read = scanner.bytes_read
+                analyzed = self._analyze_scan(response.url, scanner, proxy_name)
+                outcome = 'success' if analyzed[0] else 'blocked'
+                region = analyzed[1]
+                return analyzed
+            finally:
+                # 提前结束读取时直接关闭连接，不再下载剩余内容
+                response.close()
                 session.close()
-                return False, None, f"HTTP {response.status_code}"
 
         except requests.exceptions.Timeout:
             self.logger.debug(f"[{proxy_name}] 请求超时")
+            outcome = 'timeout'
             return False, None, "Timeout"
         except requests.exceptions.ConnectionError as e:
             self.logger.debug(f"[{proxy_name}] 连接错误: {e}")
+            outcome = 'connection_error'
             return False, None, "Connection Error"
         except Exception as e:
             self.logger.error(f"[{proxy_name}] 测试URL时出错: {e}")
             return False, None, str(e)
+        finally:
+            metrics.observe_probe(outcome, time.monotonic() - started, ttfb=ttfb, bytes_read=bytes_read,
+                                  region=region)
+
+    def _request_headers(self) -> Dict[str, str]:
+        """Netflix请求头"""
+        return {
+            'User-Agent': self.user_agent,
+            'Accept-Language': self.accept_language,
+            # 添加防缓存头
+            'Cache-Control': 'no-cache, no-store, must-revalidate',
+            'Pragma': 'no-cache',
+            'Expires': '0'
+        }
+
+    def _analyze_response(self, final_url: str, content: str,
+                          proxy_name: str) -> Tuple[bool, Optional[str], Optional[str]]:
+        """分析状态码为200的响应，同步和异步引擎共用
+
+        返回: (是否成功, 地区码, 响应内容)
+        """
+        # 检查是否被封锁
+        if self.error_msg in content:
+            self.logger.debug(f"[{proxy_name}] 检测到错误信息: {self.error_msg}")
+            return False, None, content
+
+        return True, self._resolve_region(final_url, content, proxy_name), content
+
+    def _analyze_scan(self, final_url: str, scanner: 'ResponseScanner',
+                      proxy_name: str) -> Tuple[bool, Optional[str], Optional[str]]:
+        """分析流式扫描的结果，不保留响应内容
+
+        返回: (是否成功, 地区码, None)
+        """
+        self.logger.debug(f"[{proxy_name}] 已读取 {scanner.bytes_read} 字节"
+                          f"{'（提前结束）' if scanner.finished_early else ''}")
+
+        if scanner.blocked:
+            self.logger.debug(f"[{proxy_name}] 检测到错误信息: {self.error_msg}")
+            return False, None, None
+
+        if scanner.region:
+            self.logger.debug(f"[{proxy_name}] 从内容提取到地区 ({scanner.region_source}): {scanner.region}")
+        return True, self._resolve_region(final_url, scanner.head, proxy_name, scanner.region), None
+
+    def _resolve_region(self, final_url: str, content: str, proxy_name: str,
+                        content_region: Optional[str] = None) -> Optional[str]:
+        """依次从最终URL、响应内容确定地区，都没有时按主域名跳转规则默认为US"""
+        # 从最终URL提取地区
+        self.logger.debug(f"[{proxy_name}] 分析最终URL: {final_url}")
+
+        region = self._region_from_url(final_url)
+        if region:
+            self.logger.debug(f"[{proxy_name}] 从URL提取到地区: {region}")
+            return region
+
+        # 如果URL中没有地区，尝试从内容提取
+        self.logger.debug(f"[{proxy_name}] URL中未找到地区信息，尝试从内容提取")
+        region = content_region or self._extract_region_from_content(content, proxy_name)
+        if not region:
+            # 检查是否直接跳转到了主域名
+            if "www.netflix.com/title" in final_url and "/title" == final_url.split("netflix.com")[1][:6]:
+                region = 'US'  # 默认为美国
+                self.logger.debug(f"[{proxy_name}] 使用默认地区: US")
+
+        return region
+
+    @staticmethod
+    def _region_from_url(final_url: str) -> Optional[str]:
+        """从URL路径中提取地区码"""
+        return region_from_url(final_url)
+
+    @staticmethod
+    def _is_html(content_type: str) -> bool:
+        """响应头是否为网页，缺失时按网页处理"""
+        return not content_type or 'html' in content_type.lower()
+
+    def _new_scanner(self, final_url: str, encoding: Optional[str]) -> 'ResponseScanner':
+        """创建响应流扫描器，URL中已有地区时只需查找错误信息"""
+        return ResponseScanner(self.error_msg, self._match_region,
+                               need_region=self._region_from_url(str(final_url)) is None,
+                               max_bytes=self.max_body_bytes,
+                               encoding=encoding)
+
+    @staticmethod
+    def _match_region(content: str) -> Optional[Tuple[str, str]]:
+        """匹配内容中的地区信息，返回 (地区码, 匹配来源)"""
+        return DEFAULT_EXTRACTOR.extract(content)
 
     def _extract_region_from_content(self, content: str, proxy_name: str) -> Optional[str]:
         """从响应内容中提取地区信息"""
-        # 尝试多种模式匹配地区
-        patterns = [
-            (r'"geoCountry":"([A-Z]{2})"', 'geoCountry'),
-            (r'"countryCode":"([A-Z]{2})"', 'countryCode'),
-            (r'data-geo="([A-Z]{2})"', 'data-geo'),
-            (r'"location":"([A-Z]{2})"', 'location'),
-            (r'\"geolocation\"\s*:\s*\"([A-Z]{2})\"', 'geolocation'),
-            (r'window\.netflix\.reactContext\.models\.geo\.country\s*=\s*["\']([A-Z]{2})["\']', 'reactContext')
-        ]
-
-        for pattern, name in patterns:
-            match = re.search(pattern, content)
-            if match:
-                region = match.group(1)
-                self.logger.debug(f"[{proxy_name}] 从内容提取到地区 ({name}): {region}")
-                return region
+        matched = self._match_region(content)
+        if matched:
+            region, name = matched
+            self.logger.debug(f"[{proxy_name}] 从内容提取到地区 ({name}): {region}")
+            return region
 
         # 记录一小段内容用于调试
         self.logger.debug(f"[{proxy_name}] 未能从内容提取地区，响应片段: {content[:200]}")
         return None
 
-    def check_single_proxy(self, proxy: Dict) -> Dict:
-        """检测单个代理的Netflix解锁状态"""
-        proxy_name = proxy.get('name', 'Unknown')
-        result = {
-            'name': proxy_name,
+    def _new_result(self, proxy: Dict) -> Dict:
+        """初始化单个节点的检测结果"""
+        return {
+            'name': proxy.get('name', 'Unknown'),
+            'fingerprint': proxy_fingerprint(proxy),
             'type': proxy.get('type', ''),
             'server': proxy.get('server', ''),
             'port': proxy.get('port', ''),
             'status': 'failed',
             'region': None,
+            'delay': None,
             'details': '',
             'check_time': datetime.now().isoformat()
         }
 
-        try:
-            self.logger.debug(f"准备切换到代理: {proxy_name}")
-            if not self.clash_manager.switch_proxy(proxy_name):
-                result['details'] = '切换代理失败'
-                self.logger.error(f"切换到代理 {proxy_name} 失败")
-                return result
+    def _summarize_tests(self, result: Dict, test_results: List[Dict]):
+        """根据各URL的测试结果确定节点状态"""
+        proxy_name = result['name']
+        regions_found = [t['region'] for t in test_results if t['success'] and t['region']]
+
+        # 记录测试结果
+        self.logger.debug(f"[{proxy_name}] 测试结果: {test_results}")
+
+        # 分析结果
+        successful_tests = [t for t in test_results if t['success']]
+
+        if len(successful_tests) == len(self.test_urls):
+            # 所有URL都成功 - 完全解锁
+            result['status'] = 'full'
+            # 检查地区是否一致
+            unique_regions = list(set(regions_found))
+            if len(unique_regions) == 1:
+                result['region'] = unique_regions[0]
+            elif len(unique_regions) > 1:
+                # 多个地区，可能有问题
+                result['region'] = regions_found[0]
+                self.logger.warning(f"[{proxy_name}] 检测到多个地区: {unique_regions}")
+            else:
+                result['region'] = 'US'
+            result['details'] = f'完全解锁 - {result["region"]}'
+        elif successful_tests:
+            # 部分URL成功 - 仅解锁自制剧
+            result['status'] = 'partial'
+            result['region'] = regions_found[0] if regions_found else None
+            result['details'] = f'仅解锁自制剧 - {result["region"] or "未知地区"}'
+        else:
+            # 所有测试都失败 - 无法解锁
+            result['status'] = 'blocked'
+            result['details'] = 'Netflix检测到代理或无法访问'
 
-            time.sleep(0.5)
+    def check_single_proxy(self, proxy: Dict) -> Dict:
+        """检测单个代理的Netflix解锁状态"""
+        proxy_name = proxy.get('name', 'Unknown')
+        result = self._new_result(proxy)
+        started = time.monotonic()
+        switch_seconds: Optional[float] = None
 
+        try:
+            if not self.clash_manager.ensure_node_ready(proxy_name):
+                result['details'] = '所在Clash实例不可用'
+                self.logger.error(f"[{proxy_name}] 所在Clash实例不可用")
+                return result
 
-            # 验证代理是否真的切换了
-            # current_proxy = self.clash_manager.get_current_proxy()
-            # self.logger.info(f"当前代理: {current_proxy}")
+            # 优先使用节点独立监听端口，否则切换GLOBAL后走公共端口
+            node_proxies = self._get_node_proxies(proxy_name)
+            if node_proxies is None:
+                self.logger.debug(f"准备切换到代理: {proxy_name}")
+                if not self.clash_manager.switch_proxy(proxy_name):
+                    result['details'] = '切换代理失败'
+                    self.logger.error(f"切换到代理 {proxy_name} 失败")
+                    return result
+            switch_seconds = time.monotonic() - started
 
-            current_ip = self.check_current_ip()
-            self.logger.info(f"当前IP: {current_ip}")
+            current_ip = self.check_current_ip(node_proxies)
+            self.logger.info(f"[{proxy_name}] 当前IP: {current_ip}")
 
             test_results = []
-            regions_found = []
 
             for i, url in enumerate(self.test_urls):
                 self.logger.debug(f"[{proxy_name}] 测试URL {i+1}/{len(self.test_urls)}")
-                success, region, content = self._test_single_url(url, proxy_name)
+                success, region, content = self._test_single_url(url, proxy_name, node_proxies)
                 test_results.append({
                     'url': url,
                     'success': success,
                     'region': region
                 })
-                if success and region:
-                    regions_found.append(region)
-
-                # 每个URL之间稍微等待一下
-                if i < len(self.test_urls) - 1:
-                    time.sleep(1)
-
-            # 记录测试结果
-            self.logger.debug(f"[{proxy_name}] 测试结果: {test_results}")
-
-            # 分析结果
-            successful_tests = [t for t in test_results if t['success']]
-
-            if len(successful_tests) == len(self.test_urls):
-                # 所有URL都成功 - 完全解锁
-                result['status'] = 'full'
-                # 检查地区是否一致
-                unique_regions = list(set(regions_found))
-                if len(unique_regions) == 1:
-                    result['region'] = unique_regions[0]
-                elif len(unique_regions) > 1:
-                    # 多个地区，可能有问题
-                    result['region'] = regions_found[0]
-                    self.logger.warning(f"[{proxy_name}] 检测到多个地区: {unique_regions}")
-                else:
-                    result['region'] = 'US'
-                result['details'] = f'完全解锁 - {result["region"]}'
-            elif successful_tests:
-                # 部分URL成功 - 仅解锁自制剧
-                result['status'] = 'partial'
-                result['region'] = regions_found[0] if regions_found else None
-                result['details'] = f'仅解锁自制剧 - {result["region"] or "未知地区"}'
-            else:
-                # 所有测试都失败 - 无法解锁
-                result['status'] = 'blocked'
-                result['details'] = 'Netflix检测到代理或无法访问'
+
+                # 可选：每个URL之间等待一下
+                if self.url_interval > 0 and i < len(self.test_urls) - 1:
+                    time.sleep(self.url_interval)
+
+            self._summarize_tests(result, test_results)
 
         except Exception as e:
             result['status'] = 'failed'
             result['details'] = f'测试错误: {str(e)}'
             self.logger.error(f"检测代理 {proxy_name} 时出错: {e}", exc_info=True)
+        finally:
+            metrics.observe_node(result, time.monotonic() - started, switch_seconds)
 
         return result
 
-    def check_current_ip(self) -> str:
+    def check_current_ip(self, proxies: Optional[Dict[str, str]] = None) -> str:
         """检查当前使用的IP地址"""
         try:
             response = requests.get('http://ip-api.com/json',
-                                    proxies=self.proxies,
+                                    proxies=proxies or self.proxies,
                                     timeout=10)
             data = response.json()
             return f"{data.get('query')} ({data.get('country')})"
@@ -244,79 +501,281 @@ class NetflixChecker:
             return "Unknown"
 
 
-    def check_all_proxies(self, proxies: List[Dict], max_workers: int = 1) -> List[Dict]:
-        """检测所有代理"""
-        results = []
-        total = len(proxies)
-        self.logger.info(f"开始检测 {total} 个代理")
+    def check_all_proxies(self, proxies: List[Dict], max_workers: Optional[int] = None,
+                          run: Optional[ScanRun] = None) -> List[Dict]:
+        """检测所有代理
+
+        缓存中未过期的节点直接复用上次结果，其余节点重新检测。
+        传入 run 时在节点之间检查取消请求，取消后抛出 ScanCancelled。
+        """
+        self.logger.info(f"开始检测 {len(proxies)} 个代理")
+        self._scan_started_at = datetime.now()
 
         # 设置日志级别为DEBUG以获取更多信息
         self.logger.setLevel(logging.DEBUG)
 
-        # 单线程顺序检测
+        results: List[Optional[Dict]] = [None] * len(proxies)
+        fingerprints = [proxy_fingerprint(p) for p in proxies]
+        self._delays = {}
+        self._run = run
+
+        # 上一轮中断时已完成的节点直接取日志中的结果
+        resumed = self.journal.begin(fingerprints, len(proxies), run.run_id if run else None)
+        pending = []
         for i, proxy in enumerate(proxies):
-            proxy_name = proxy.get('name', 'Unknown')
-            self.logger.info(f"检测进度: {i + 1}/{total} - {proxy_name}")
-
-            result = self.check_single_proxy(proxy)
-            results.append(result)
-
-            # 记录结果
-            status_emoji = {
-                'full': '✅',
-                'partial': '⚠️',
-                'blocked': '❌',
-                'failed': '💔'
-            }.get(result['status'], '❓')
-
-            log_msg = f"{status_emoji} {result['name']} - {result['status']}"
-            if result['region']:
-                log_msg += f" - {result['region']}"
-            log_msg += f" - {result['details']}"
-            self.logger.info(log_msg)
-
-            # 每10个节点输出进度
-            if (i + 1) % 10 == 0:
-                unlocked_count = sum(1 for r in results if r['status'] in ['full', 'partial'])
-                self.logger.info(f"已测试 {i + 1} 个节点，找到 {unlocked_count} 个可解锁节点")
+            if fingerprints[i] in resumed:
+                results[i] = self._result_from_journal(proxy, resumed[fingerprints[i]])
+            else:
+                pending.append(i)
+
+        if self.result_cache.enabled:
+            removed = self.result_cache.prune(fingerprints)
+            uncached = []
+            for i in pending:
+                cached = self.result_cache.get_fresh(fingerprints[i])
+                if cached:
+                    results[i] = self._result_from_cache(proxies[i], cached)
+                    self.journal.append(results[i])
+                else:
+                    uncached.append(i)
+            self.logger.info(f"结果缓存: 复用 {len(pending) - len(uncached)} 个, "
+                             f"需检测 {len(uncached)} 个, 清理失效 {removed} 个")
+            pending = uncached
+
+        self._progress = ScanProgress(len(proxies), self.journal.run_id)
+        for result in results:
+            if result is not None:
+                self._progress.add_known(result)
+        if run is not None:
+            run.progress = self._progress
+        EventBus.publish('scan_started', self._progress.snapshot())
+
+        try:
+            checked = self._check_live_proxies([proxies[i] for i in pending], max_workers)
+        except ScanCancelled:
+            self.journal.cancel()
+            raise
+        finally:
+            self.journal.close()
+
+        for i, result in zip(pending, checked):
+            results[i] = result
+            if self.result_cache.enabled:
+                self.result_cache.put(fingerprints[i], result)
+
+        if self.result_cache.enabled:
+            self.result_cache.save()
 
         return results
 
-    def save_results(self, results: List[Dict]):
-        """保存检测结果"""
-        try:
-            # 添加汇总信息
-            summary = {
-                'check_time': datetime.now().isoformat(),
-                'total': len(results),
-                'full': sum(1 for r in results if r['status'] == 'full'),
-                'partial': sum(1 for r in results if r['status'] == 'partial'),
-                'blocked': sum(1 for r in results if r['status'] == 'blocked'),
-                'failed': sum(1 for r in results if r['status'] == 'failed')
-            }
+    def _result_from_journal(self, proxy: Dict, journaled: Dict) -> Dict:
+        """用结果日志中的记录构造本次结果，名称等展示字段取当前订阅"""
+        result = self._new_result(proxy)
+        for key in ('status', 'region', 'delay', 'details', 'check_time', 'cached'):
+            if key in journaled:
+                result[key] = journaled[key]
+        return result
 
-            # 按地区统计
-            region_stats = {}
-            for r in results:
-                if r['status'] in ['full', 'partial'] and r['region']:
-                    region = r['region']
-                    if region not in region_stats:
-                        region_stats[region] = {'full': 0, 'partial': 0}
-                    region_stats[region][r['status']] += 1
+    def _record_result(self, result: Dict):
+        """单个节点得出结果后立即写入结果日志"""
+        if result.get('delay') is None:
+            result['delay'] = self._delays.get(result['name'])
+        metrics.NODE_RESULTS.inc(status=result['status'], region=result['region'])
+        with self._record_lock:
+            self.journal.append(result)
+            if self._progress is None:
+                return
+            event = self._progress.record(result)
+            EventBus.publish(self._progress_event, event)
+        if self._progress_event == 'scan_progress':
+            metrics.SCAN_NODES_PER_SECOND.set(event['rate'])
+            metrics.SCAN_PENDING_NODES.set(event['total'] - event['completed'])
+
+    def _check_cancelled(self):
+        if self._run is not None:
+            self._run.check_cancelled()
+
+    def _result_from_cache(self, proxy: Dict, cached: Dict) -> Dict:
+        """用缓存结果构造本次结果，名称等展示字段取当前订阅"""
+        result = self._new_result(proxy)
+        for key in ('status', 'region', 'delay', 'details', 'check_time'):
+            result[key] = cached.get(key, result[key])
+        result['cached'] = True
+        return result
 
-            summary['regions'] = region_stats
+    def _check_live_proxies(self, proxies: List[Dict], max_workers: Optional[int] = None) -> List[Dict]:
+        """先通过延迟测试过滤不可达节点，只有存活节点进入Netflix检测"""
+        if not proxies:
+            return []
 
-            data = {
-                'summary': summary,
-                'results': results
-            }
+        if not self.prefilter_enabled:
+            return self._check_proxies(proxies, max_workers)
 
-            with open(self.results_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+        results: List[Optional[Dict]] = [None] * len(proxies)
+        started = time.monotonic()
+        delays = self._prefilter_delays(proxies)
+        metrics.SCAN_STAGE_SECONDS.observe(time.monotonic() - started, stage='prefilter')
+        self._delays = delays
+        self._check_cancelled()
 
-            self.logger.info(f"结果已保存到: {self.results_file}")
+        live_indexes = []
+        for i, proxy in enumerate(proxies):
+            name = proxy.get('name', 'Unknown')
+            if name in delays and delays[name] is None:
+                result = self._new_result(proxy)
+                result['details'] = '节点不可达（延迟测试超时）'
+                results[i] = result
+                self._record_result(result)
+            else:
+                live_indexes.append(i)
+
+        live_results = self._check_proxies([proxies[i] for i in live_indexes], max_workers)
+        for i, result in zip(live_indexes, live_results):
+            result['delay'] = delays.get(result['name'])
+            results[i] = result
+
+        return results
 
-            self.save_clash_subscription(results)
+    def _prefilter_delays(self, proxies: List[Dict]) -> Dict[str, Optional[int]]:
+        """批量测试节点延迟，返回完成测试的节点延迟（不可达为None）"""
+        names = [p.get('name', 'Unknown') for p in proxies]
+        self.logger.info(f"开始延迟预检 {len(names)} 个节点，超时 {self.prefilter_timeout}ms")
+
+        started = time.time()
+        delays = self.clash_manager.batch_test_delays(names, self.prefilter_timeout,
+                                                      self.prefilter_url, self.prefilter_workers)
+        dead = sum(1 for d in delays.values() if d is None)
+        untested = len(names) - len(delays)
+
+        self.logger.info(f"延迟预检完成，耗时 {time.time() - started:.2f}秒 - "
+                         f"存活: {len(delays) - dead}, 不可达: {dead}, 未完成测试: {untested}")
+        return delays
+
+    def _check_proxies(self, proxies: List[Dict], max_workers: Optional[int] = None) -> List[Dict]:
+        """对节点执行Netflix检测
+
+        节点都有独立监听端口时按max_workers并发检测，否则退化为切换GLOBAL的顺序检测
+        """
+        total = len(proxies)
+        results: List[Optional[Dict]] = [None] * total
+
+        has_listeners = all(self.clash_manager.get_listener_port(p.get('name', '')) for p in proxies)
+
+        if self.engine == 'async':
+            if not async_prober.is_available():
+                self.logger.warning("未安装aiohttp，使用同步检测引擎")
+            elif not has_listeners:
+                self.logger.warning("存在未分配独立监听端口的节点，使用同步检测引擎")
+            else:
+                return self._check_all_async(proxies)
+
+        workers = max(1, int(max_workers or self.max_workers or 1))
+        if workers > 1 and not has_listeners:
+            self.logger.warning("存在未分配独立监听端口的节点，退化为顺序检测")
+            workers = 1
+
+        if workers == 1:
+            for i, proxy in enumerate(proxies):
+                self._check_cancelled()
+                self.logger.info(f"检测进度: {i + 1}/{total} - {proxy.get('name', 'Unknown')}")
+                results[i] = self.check_single_proxy(proxy)
+                self._record_result(results[i])
+                self._log_result(results[i], i + 1, results)
+            return results
+
+        self.logger.info(f"使用 {workers} 个并发线程检测")
+        # 多实例模式下节点按顺序轮流分配到各实例，按原顺序提交即可让并发请求分散到不同实例
+        completed = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="NetflixCheck") as executor:
+            futures = {executor.submit(self.check_single_proxy, proxy): i for i, proxy in enumerate(proxies)}
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = futures[future]
+                    results[i] = future.result()
+                    completed += 1
+                    self._record_result(results[i])
+                    self.logger.info(f"检测进度: {completed}/{total} - {results[i]['name']}")
+                    self._log_result(results[i], completed, results)
+                if self._run is not None and self._run.cancelled:
+                    # 丢弃尚未开始的节点，正在检测的节点完成后照常记录
+                    pending = {f for f in pending if not f.cancel()}
+
+        self._check_cancelled()
+        return results
+
+    def _check_all_async(self, proxies: List[Dict]) -> List[Dict]:
+        """使用异步引擎检测所有代理"""
+        self.logger.info(f"使用异步检测引擎，并发数: {self.async_concurrency}")
+        total = len(proxies)
+        completed: List[Dict] = []
+
+        def on_result(result: Dict):
+            completed.append(result)
+            self._record_result(result)
+            self.logger.info(f"检测进度: {len(completed)}/{total} - {result['name']}")
+            self._log_result(result, len(completed), completed)
+            # 在检测协程中抛出后其余协程会被取消
+            self._check_cancelled()
+
+        prober = async_prober.AsyncNetflixProber(self, self.async_concurrency)
+        return prober.check_all(proxies, on_result)
+
+    def _log_result(self, result: Dict, completed: int, results: List[Optional[Dict]]):
+        """输出单个节点结果及阶段性进度"""
+        status_emoji = {
+            'full': '✅',
+            'partial': '⚠️',
+            'blocked': '❌',
+            'failed': '💔'
+        }.get(result['status'], '❓')
+
+        log_msg = f"{status_emoji} {result['name']} - {result['status']}"
+        if result['region']:
+            log_msg += f" - {result['region']}"
+        log_msg += f" - {result['details']}"
+        self.logger.info(log_msg)
+
+        # 每10个节点输出进度
+        if completed % 10 == 0:
+            unlocked_count = sum(1 for r in results if r and r['status'] in ['full', 'partial'])
+            self.logger.info(f"已测试 {completed} 个节点，找到 {unlocked_count} 个可解锁节点")
+
+    def _expand_aliases(self, results: List[Dict]) -> List[Dict]:
+        """将保留节点的检测结果复制给去重时折叠的同连接参数节点"""
+        aliases = self.clash_manager.get_proxy_aliases()
+        if not aliases:
+            return results
+
+        # 旧的别名记录可能包含与保留节点同名的条目，按名称去重
+        expanded = []
+        seen = {result['name'] for result in results}
+        for result in results:
+            expanded.append(result)
+            for alias in aliases.get(result['name'], []):
+                if alias.get('name', 'Unknown') in seen:
+                    continue
+                seen.add(alias.get('name', 'Unknown'))
+                alias_result = dict(result)
+                alias_result['name'] = alias.get('name', 'Unknown')
+                alias_result['alias_of'] = result['name']
+                expanded.append(alias_result)
+        return expanded
+
+    def save_results(self, results: List[Dict]):
+        """保存检测结果"""
+        try:
+            results = self._expand_aliases(results)
+            with self._results_lock:
+                results = self._keep_newer_results(results)
+                summary = self._summarize(results)
+                self._write_results(results, summary)
+                self.save_clash_subscription(results)
+            self.journal.complete()
+            self._record_history(results, summary)
+
+            EventBus.publish('scan_finished', {'summary': summary})
 
             # 输出汇总信息
             self.logger.info(f"检测完成 - 总计: {summary['total']}, "
@@ -326,6 +785,7 @@ class NetflixChecker:
                            f"失败: {summary['failed']}")
 
             # 输出地区统计
+            region_stats = summary['regions']
             if region_stats:
                 self.logger.info("地区分布:")
                 for region, stats in sorted(region_stats.items()):
@@ -334,6 +794,133 @@ class NetflixChecker:
         except Exception as e:
             self.logger.error(f"保存结果失败: {e}")
 
+    def _keep_newer_results(self, results: List[Dict]) -> List[Dict]:
+        """完整检测期间指定节点检测合并进结果文件的节点，比本轮结果更新时保留文件中的结果"""
+        if self._scan_started_at is None:
+            return results
+        existing = ResultsService().get_results()
+        if not existing:
+            return results
+
+        newer = {}
+        for r in existing.get('results', []):
+            checked_at = self._parse_check_time(r.get('check_time'))
+            if checked_at is not None and checked_at > self._scan_started_at:
+                newer[r['name']] = (checked_at, r)
+        if not newer:
+            return results
+
+        kept = 0
+        merged = []
+        for r in results:
+            if r['name'] in newer:
+                checked_at, existing_result = newer[r['name']]
+                own = self._parse_check_time(r.get('check_time'))
+                if own is None or checked_at > own:
+                    r = existing_result
+                    kept += 1
+            merged.append(r)
+        if kept:
+            self.logger.info(f"保留检测期间由指定节点检测更新的 {kept} 个节点结果")
+        return merged
+
+    @staticmethod
+    def _parse_check_time(value) -> Optional[datetime]:
+        try:
+            return datetime.fromisoformat(value) if value else None
+        except (TypeError, ValueError):
+            return None
+
+    def merge_results(self, checked: List[Dict]) -> bool:
+        """将部分节点的新结果合并进最近一次保存的结果，用于指定节点的检测任务"""
+        try:
+            checked = self._expand_aliases(checked)
+            with self._results_lock:
+                existing = ResultsService().get_results()
+                if not existing:
+                    self.logger.warning("没有已保存的检测结果，跳过合并")
+                    return False
+
+                updated = {r['name']: r for r in checked}
+                results = [updated.get(r['name'], r) for r in existing.get('results', [])]
+                known = {r['name'] for r in results}
+                results.extend(r for r in checked if r['name'] not in known)
+
+                summary = self._summarize(results)
+                self._write_results(results, summary)
+                self.save_clash_subscription(results)
+            self._record_history(checked, self._summarize(checked))
+            EventBus.publish('results_updated', {'summary': summary, 'updated': len(checked)})
+            return True
+
+        except Exception as e:
+            self.logger.error(f"合并结果失败: {e}")
+            return False
+
+    @staticmethod
+    def _summarize(results: List[Dict]) -> Dict:
+        """汇总各状态数量和地区分布"""
+        summary = {
+            'check_time': datetime.now().isoformat(),
+            'total': len(results),
+            'full': sum(1 for r in results if r['status'] == 'full'),
+            'partial': sum(1 for r in results if r['status'] == 'partial'),
+            'blocked': sum(1 for r in results if r['status'] == 'blocked'),
+            'failed': sum(1 for r in results if r['status'] == 'failed'),
+            'duplicates': sum(1 for r in results if r.get('alias_of'))
+        }
+
+        # 按地区统计
+        region_stats = {}
+        for r in results:
+            if r['status'] in ['full', 'partial'] and r['region']:
+                region = r['region']
+                if region not in region_stats:
+                    region_stats[region] = {'full': 0, 'partial': 0}
+                region_stats[region][r['status']] += 1
+
+        summary['regions'] = region_stats
+        return summary
+
+    def _write_results(self, results: List[Dict], summary: Dict):
+        data = {
+            'summary': summary,
+            'results': results
+        }
+
+        with open(self.results_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        ResultsService().invalidate(self.results_file)
+
+        self.logger.info(f"结果已保存到: {self.results_file}")
+
+    def _record_history(self, results: List[Dict], summary: Dict):
+        try:
+            HistoryStore(self.config).record_run(results, summary)
+        except Exception as e:
+            self.logger.error(f"写入历史记录失败: {e}")
+
+    def check_proxies_now(self, proxies: List[Dict], run: Optional[ScanRun] = None) -> List[Dict]:
+        """立即检测指定节点
+
+        不读取结果缓存也不写结果日志，可以与完整检测同时进行；结果写回缓存，
+        更新这些节点的下次复检时间。进度以 job_progress 事件发布，不计入完整检测的进度指标。
+        """
+        self._run = run
+        self._progress_event = 'job_progress'
+        self._delays = {}
+        self._progress = ScanProgress(len(proxies), run.run_id if run else None)
+        if run is not None:
+            run.progress = self._progress
+
+        results = self._check_live_proxies(proxies)
+
+        if self.result_cache.enabled:
+            for result in results:
+                self.result_cache.put(result['fingerprint'], result)
+            self.result_cache.save()
+        return results
+
     def save_clash_subscription(self, results: List[Dict]):
         """保存完全解锁的节点为Clash订阅格式"""
         try:
@@ -344,30 +931,48 @@ class NetflixChecker:
             # 读取原始配置文件
             config_file = '/root/.config/mihomo/config.yaml'
             with open(config_file, 'r', encoding='utf-8') as f:
-                clash_config = yaml.safe_load(f)
+                # 获取所有代理节点
+                all_proxies = yaml_utils.extract_proxies(f.read())
 
-            # 获取所有代理节点
-            all_proxies = clash_config.get('proxies', [])
-
-            # 创建一个字典方便查找
+            # 创建一个字典方便查找，包含去重时折叠的别名节点
             proxy_dict = {proxy['name']: proxy for proxy in all_proxies}
+            for alias_proxies in self.clash_manager.get_proxy_aliases().values():
+                for alias in alias_proxies:
+                    proxy_dict.setdefault(alias['name'], alias)
 
-            # 只筛选完全解锁的节点
+            # 文件订阅只包含完全解锁的节点；部分解锁节点另存到节点列表，供按条件筛选的订阅使用
             unlocked_proxies = []
+            subscription_nodes = []
+            suffixes = {'full': '-NF', 'partial': '-NF-P'}
             for result in results:
-                if result.get('status') == 'full':  # 只要完全解锁的
+                status = result.get('status')
+                if status in suffixes:
                     original_name = result.get('name', '')
 
                     # 从原始配置中查找完整的节点信息
                     if original_name in proxy_dict:
                         # 复制完整的节点配置
                         full_proxy = proxy_dict[original_name].copy()
-                        # 修改节点名称，添加 -NF 后缀
-                        full_proxy['name'] = f"{original_name}-NF"
-                        unlocked_proxies.append(full_proxy)
+                        # 修改节点名称，添加 -NF / -NF-P 后缀
+                        full_proxy['name'] = f"{original_name}{suffixes[status]}"
+                        if status == 'full':
+                            unlocked_proxies.append(full_proxy)
+                        subscription_nodes.append({
+                            'status': status,
+                            'region': result.get('region'),
+                            'delay': result.get('delay'),
+                            'proxy': full_proxy
+                        })
                     else:
                         self.logger.warning(f"在原始配置中未找到节点: {original_name}")
 
+            nodes_file = os.path.join(results_dir, 'subscription_nodes.json')
+            tmp_file = f"{nodes_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'check_time': datetime.now().isoformat(), 'nodes': subscription_nodes},
+                          f, ensure_ascii=False)
+            os.replace(tmp_file, nodes_file)
+
             # 创建Clash订阅格式
             clash_subscription = {
                 'proxies': unlocked_proxies
@@ -376,7 +981,9 @@ class NetflixChecker:
             # 保存为YAML文件
             clash_file = os.path.join(results_dir, 'netflix_unlocked_proxies.yaml')
             with open(clash_file, 'w', encoding='utf-8') as f:
-                yaml.dump(clash_subscription, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+                yaml_utils.dump(clash_subscription, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+
+            SubscriptionService().refresh()
 
             if unlocked_proxies:
                 self.logger.info(f"Clash订阅已保存到: {clash_file}")
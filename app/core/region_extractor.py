@@ -0,0 +1,89 @@
+"""
+Netflix地区提取模块
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+# 从最终URL提取地区，格式: https://www.netflix.com/sg/title/xxx 或 https://www.netflix.com/sg-en/title/xxx
+URL_REGION_RE = re.compile(r'netflix\.com/([a-z]{2}(?:-[a-z]{2})?)/title', re.IGNORECASE)
+
+# 页面内容中的地区模式，按优先级排列，每个模式只包含一个捕获组
+CONTENT_REGION_PATTERNS: List[Tuple[str, str]] = [
+    ('geoCountry', r'"geoCountry":"([A-Z]{2})"'),
+    ('countryCode', r'"countryCode":"([A-Z]{2})"'),
+    ('data-geo', r'data-geo="([A-Z]{2})"'),
+    ('location', r'"location":"([A-Z]{2})"'),
+    ('geolocation', r'\"geolocation\"\s*:\s*\"([A-Z]{2})\"'),
+    ('reactContext', r'window\.netflix\.reactContext\.models\.geo\.country\s*=\s*["\']([A-Z]{2})["\']'),
+]
+
+# 各模式必然包含的字面前缀，用于快速定位扫描起点
+CONTENT_REGION_ANCHORS: Dict[str, str] = {
+    'geoCountry': '"geoCountry":"',
+    'countryCode': '"countryCode":"',
+    'data-geo': 'data-geo="',
+    'location': '"location":"',
+    'geolocation': '"geolocation"',
+    'reactContext': 'window.netflix.reactContext',
+}
+
+
+def region_from_url(url: str) -> Optional[str]:
+    """从URL路径中提取地区码"""
+    match = URL_REGION_RE.search(url)
+    return match.group(1).upper() if match else None
+
+
+class RegionExtractor:
+    """单次扫描的地区提取器
+
+    所有模式合并为一个预编译的多选正则。先用字面前缀定位第一个可能命中的位置，
+    再从该位置起用合并后的正则扫描一遍页面；页面中没有任何前缀时直接返回。
+    多个模式同时命中时按模式优先级返回，遇到最高优先级的匹配立即结束。
+    """
+
+    def __init__(self, patterns: Optional[List[Tuple[str, str]]] = None,
+                 anchors: Optional[Dict[str, str]] = None):
+        self.patterns = patterns or CONTENT_REGION_PATTERNS
+        anchors = CONTENT_REGION_ANCHORS if anchors is None else anchors
+        self.sources = [name for name, _ in self.patterns]
+        self.anchors = [anchors[name] for name in self.sources if name in anchors]
+        # 任一模式缺少字面前缀时无法安全跳过，退化为从头扫描
+        if len(self.anchors) != len(self.sources):
+            self.anchors = []
+        self.regex = re.compile('|'.join(pattern for _, pattern in self.patterns))
+
+    def _scan_start(self, content: str) -> int:
+        """第一个可能命中的位置，没有候选时返回-1"""
+        if not self.anchors:
+            return 0
+        positions = [pos for pos in (content.find(anchor) for anchor in self.anchors) if pos >= 0]
+        return min(positions) if positions else -1
+
+    def extract(self, content: str) -> Optional[Tuple[str, str]]:
+        """提取地区，返回 (地区码, 匹配来源)，未找到返回None"""
+        start = self._scan_start(content)
+        if start < 0:
+            return None
+
+        best_priority = None
+        best_region = None
+
+        for match in self.regex.finditer(content, start):
+            # 每个模式只有一个捕获组，lastindex即为命中模式的序号
+            priority = match.lastindex - 1
+            if best_priority is None or priority < best_priority:
+                best_priority = priority
+                best_region = match.group(match.lastindex)
+                if priority == 0:
+                    break
+
+        if best_priority is None:
+            return None
+        return best_region, self.sources[best_priority]
+
+
+# 模块级共享实例，正则只编译一次
+DEFAULT_EXTRACTOR = RegionExtractor()
@@ -0,0 +1,170 @@
+"""
+检测结果缓存模块
+"""
+
+import json
+import os
+import threading
+import time
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+from app.core.logger import LoggerManager
+from app.core.config import Config
+
+
+class RecheckPolicy:
+    """节点复检间隔策略
+
+    每个状态有基础间隔；被封锁和失败的节点每连续一次相同结果间隔翻倍，
+    直到上限，长期不可用的节点不会每轮都占用检测时间。
+    """
+
+    DEFAULT_INTERVAL = {
+        'full': 3600,
+        'partial': 7200,
+        'blocked': 21600,
+        'failed': 3600
+    }
+    DEFAULT_BACKOFF = ('blocked', 'failed')
+    DEFAULT_MAX_INTERVAL = 3 * 86400
+
+    def __init__(self, config: Config):
+        self.interval = dict(self.DEFAULT_INTERVAL)
+        self.interval.update(config.get('cache.ttl', {}) or {})
+        self.backoff = set(config.get('cache.backoff', self.DEFAULT_BACKOFF) or ())
+        self.max_interval = config.get('cache.max_ttl', self.DEFAULT_MAX_INTERVAL)
+
+    def next_interval(self, status: str, streak: int) -> float:
+        """连续 streak 次得到 status 后距离下次复检的秒数"""
+        base = self.interval.get(status, 0)
+        if status not in self.backoff or streak <= 1:
+            return base
+        return max(base, min(base * 2 ** min(streak - 1, 32), self.max_interval))
+
+
+class ResultCache:
+    """以节点指纹为键的检测结果缓存，持久化到磁盘
+
+    每个节点记录连续相同状态的次数和下次复检时间，未到期的节点直接复用结果。
+    完整检测和指定节点检测各自持有实例，保存时只写回本实例改动过的节点。
+    """
+
+    # 同一进程内所有实例共用，保存时的读取、合并和替换不会交错
+    _file_lock = Lock()
+
+    def __init__(self, config: Config, cache_file: str = "results/result_cache.json"):
+        self.config = config
+        self.logger = LoggerManager.get_logger()
+        self.cache_file = cache_file
+        self.enabled = config.get('cache.enable', True)
+        self.policy = RecheckPolicy(config)
+        self._entries: Dict[str, Dict] = {}
+        # 本实例改动过的节点，指纹 -> 新记录，已删除为None
+        self._touched: Dict[str, Optional[Dict]] = {}
+        self._lock = Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """从磁盘加载缓存"""
+        self._entries = self._read_entries()
+        self.logger.debug(f"已加载 {len(self._entries)} 条结果缓存")
+
+    def _read_entries(self) -> Dict[str, Dict]:
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f).get('entries', {})
+        except Exception as e:
+            self.logger.error(f"加载结果缓存失败: {e}")
+        return {}
+
+    def save(self):
+        """写入磁盘，先写临时文件再替换避免写坏
+
+        其他实例（如同时进行的指定节点检测）可能在本实例加载后写入过，
+        保存前重新读取磁盘上的缓存，只更新本实例改动过的节点。
+        """
+        with ResultCache._file_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                touched = self._touched
+                self._touched = {}
+                self._dirty = False
+
+            entries = self._read_entries()
+            for fingerprint, entry in touched.items():
+                if entry is None:
+                    entries.pop(fingerprint, None)
+                else:
+                    entries[fingerprint] = entry
+
+            try:
+                os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+                # 临时文件名带上进程和线程，多个写入者不会共用同一个临时文件
+                tmp_file = f"{self.cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump({'entries': entries}, f, ensure_ascii=False)
+                os.replace(tmp_file, self.cache_file)
+            except Exception as e:
+                self.logger.error(f"保存结果缓存失败: {e}")
+
+            with self._lock:
+                # 保存期间本实例又改动的节点以内存中的为准
+                for fingerprint, entry in entries.items():
+                    if fingerprint not in self._touched:
+                        self._entries[fingerprint] = entry
+
+    def _next_due(self, entry: Dict) -> float:
+        if 'next_due' in entry:
+            return entry['next_due']
+        # 旧版本缓存只记录了写入时间
+        return entry['cached_at'] + self.policy.next_interval(entry['result'].get('status'), 1)
+
+    def get_fresh(self, fingerprint: str) -> Optional[Dict]:
+        """获取未到复检时间的缓存结果"""
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if not entry:
+                return None
+            if time.time() >= self._next_due(entry):
+                return None
+            return dict(entry['result'])
+
+    def put(self, fingerprint: str, result: Dict):
+        """写入检测结果并按连续相同状态的次数安排下次复检"""
+        status = result.get('status')
+        now = time.time()
+        with self._lock:
+            previous = self._entries.get(fingerprint)
+            streak = 1
+            if previous and previous['result'].get('status') == status:
+                streak = previous.get('streak', 1) + 1
+            entry = {
+                'cached_at': now,
+                'next_due': now + self.policy.next_interval(status, streak),
+                'streak': streak,
+                'result': dict(result)
+            }
+            self._entries[fingerprint] = entry
+            self._touched[fingerprint] = entry
+            self._dirty = True
+
+    def next_due(self) -> Optional[float]:
+        """最早到期的节点的复检时间，没有缓存时返回None"""
+        with self._lock:
+            return min((self._next_due(e) for e in self._entries.values()), default=None)
+
+    def prune(self, fingerprints: Iterable[str]) -> int:
+        """删除已不在任何订阅中的节点，返回删除数量"""
+        valid = set(fingerprints)
+        with self._lock:
+            stale = [fp for fp in self._entries if fp not in valid]
+            for fp in stale:
+                del self._entries[fp]
+                self._touched[fp] = None
+            if stale:
+                self._dirty = True
+        return len(stale)
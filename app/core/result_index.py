@@ -0,0 +1,110 @@
+"""
+检测结果内存索引模块 - 支持分页、排序和筛选
+"""
+
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+
+SORT_FIELDS = ('name', 'status', 'region', 'delay', 'type', 'server', 'check_time')
+# 状态排序按可用程度，而非字母顺序
+STATUS_RANK = {'full': 0, 'partial': 1, 'blocked': 2, 'failed': 3}
+MAX_PAGE_SIZE = 1000
+# 带任一参数时 /api/results 返回分页结果
+RESULT_QUERY_ARGS = ('offset', 'limit', 'sort', 'order', 'status', 'region', 'type', 'name')
+
+
+def _sort_key(field: str):
+    if field == 'status':
+        return lambda item: STATUS_RANK.get(item.get('status'), 9)
+    if field == 'delay':
+        # 没有延迟的节点排在最后
+        return lambda item: (item.get('delay') is None, item.get('delay') or 0)
+    return lambda item: (item.get(field) is None, str(item.get(field) or '').lower())
+
+
+class ResultIndex:
+    """一轮结果的只读索引
+
+    每种排序的顺序在首次使用时计算一次；相同筛选条件的匹配结果缓存起来，
+    滚动加载后续页面时只需切片。
+    """
+
+    QUERY_CACHE_SIZE = 32
+
+    def __init__(self, items: List[Dict]):
+        self.items = items
+        self._orders: Dict[str, List[int]] = {}
+        self._names: Optional[Tuple[List[str], List[int]]] = None
+        self._matches: 'OrderedDict[Tuple, List[int]]' = OrderedDict()
+        self._lock = Lock()
+        self.facets = self._build_facets()
+
+    def _build_facets(self) -> Dict[str, Dict[str, int]]:
+        facets = {'status': {}, 'region': {}, 'type': {}}
+        for item in self.items:
+            for field, counts in facets.items():
+                value = item.get(field)
+                if value:
+                    counts[value] = counts.get(value, 0) + 1
+        return facets
+
+    def _order(self, field: str) -> List[int]:
+        order = self._orders.get(field)
+        if order is None:
+            key = _sort_key(field)
+            order = sorted(range(len(self.items)), key=lambda i: key(self.items[i]))
+            self._orders[field] = order
+        return order
+
+    def _name_range(self, prefix: str) -> List[int]:
+        """按名称前缀二分查找匹配的下标"""
+        if self._names is None:
+            order = sorted(range(len(self.items)), key=lambda i: str(self.items[i].get('name') or '').lower())
+            self._names = ([str(self.items[i].get('name') or '').lower() for i in order], order)
+        names, order = self._names
+        start = bisect_left(names, prefix)
+        end = bisect_left(names, prefix + '\U0010ffff', lo=start)
+        return order[start:end]
+
+    def query(self, offset: int = 0, limit: int = 100, sort: str = 'name', order: str = 'asc',
+              status: Optional[List[str]] = None, region: Optional[str] = None,
+              type: Optional[str] = None, name: Optional[str] = None) -> Dict:
+        """查询一页结果，返回 {'total', 'offset', 'limit', 'items'}"""
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"不支持的排序字段: {sort}")
+        offset = max(0, int(offset))
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        descending = order == 'desc'
+        statuses = frozenset(status) if status else None
+        region = region.upper() if region else None
+        prefix = name.lower() if name else None
+
+        cache_key = (sort, descending, statuses, region, type, prefix)
+        with self._lock:
+            matched = self._matches.get(cache_key)
+            if matched is not None:
+                self._matches.move_to_end(cache_key)
+            else:
+                candidates = self._order(sort)
+                if prefix:
+                    allowed = set(self._name_range(prefix))
+                    candidates = [i for i in candidates if i in allowed]
+                matched = [i for i in candidates
+                           if (statuses is None or self.items[i].get('status') in statuses)
+                           and (region is None or (self.items[i].get('region') or '').upper() == region)
+                           and (type is None or self.items[i].get('type') == type)]
+                if descending:
+                    matched.reverse()
+                self._matches[cache_key] = matched
+                if len(self._matches) > self.QUERY_CACHE_SIZE:
+                    self._matches.popitem(last=False)
+
+        return {
+            'total': len(matched),
+            'offset': offset,
+            'limit': limit,
+            'items': [self.items[i] for i in matched[offset:offset + limit]]
+        }
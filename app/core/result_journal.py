@@ -0,0 +1,214 @@
+"""
+检测结果日志模块
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, Optional
+
+from app.core.logger import LoggerManager
+from app.core.config import Config
+
+
+class ResultJournal:
+    """本轮检测的JSONL结果日志
+
+    每个节点出结果后立即追加一行，由后台线程写入磁盘；进程中断后下一轮可从日志恢复
+    已完成的节点，Web接口也可以在检测进行中读取部分结果。
+    文件由一行 run 记录开头，随后是 result 记录，结果正式保存后追加 end 记录；
+    任务被取消时追加 cancel 记录，之后恢复时追加带有新检测ID的 resume 记录。
+    """
+
+    # 本进程中正在写入的日志文件 -> 检测ID，只有这些日志代表进行中的检测
+    _active: Dict[str, str] = {}
+
+    def __init__(self, config: Config, journal_file: str = "results/current_run.jsonl"):
+        self.logger = LoggerManager.get_logger()
+        self.journal_file = journal_file
+        self.enabled = config.get('journal.enable', True)
+        self.resume_window = config.get('journal.resume_window', 6 * 3600)
+        self.run_id: Optional[str] = None
+        self._queue: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def begin(self, fingerprints: Iterable[str], total: int, run_id: Optional[str] = None) -> Dict[str, Dict]:
+        """开始新一轮检测，返回可从未完成日志中恢复的结果（指纹 -> 结果）
+
+        日志中的检测ID为 run_id（未指定时生成新ID）；从日志恢复且未指定 run_id 时沿用中断的检测ID。
+        """
+        if not self.enabled:
+            return {}
+
+        valid = set(fingerprints)
+        previous = self.read(self.journal_file)
+        resumed: Dict[str, Dict] = {}
+
+        if previous and not previous['finished'] \
+                and time.time() - previous['run'].get('started_at', 0) < self.resume_window:
+            for result in previous['results']:
+                if result.get('fingerprint') in valid:
+                    resumed[result['fingerprint']] = result
+
+        os.makedirs(os.path.dirname(self.journal_file), exist_ok=True)
+        if resumed:
+            previous_id = previous['run']['run_id']
+            self.run_id = run_id or previous_id
+            self.logger.info(f"从未完成的检测 {previous_id} 恢复 {len(resumed)} 个节点结果，本轮检测 {self.run_id}")
+            handle = open(self.journal_file, 'a', encoding='utf-8')
+            # 上次中断时可能留下写了一半的行，先补换行避免与新记录连在一起
+            if handle.tell() > 0:
+                with open(self.journal_file, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        handle.write('\n')
+            self._write_line(handle, {'type': 'resume', 'run_id': self.run_id, 'resumed_at': time.time()})
+            handle.flush()
+        else:
+            self.run_id = run_id or uuid.uuid4().hex[:12]
+            handle = open(self.journal_file, 'w', encoding='utf-8')
+            self._write_line(handle, {'type': 'run', 'run_id': self.run_id,
+                                      'started_at': time.time(), 'total': total})
+            handle.flush()
+
+        self._writer = threading.Thread(target=self._write_loop, args=(handle,),
+                                        name="ResultJournal", daemon=True)
+        self._writer.start()
+        ResultJournal._active[self.journal_file] = self.run_id
+        return resumed
+
+    def append(self, result: Dict):
+        """追加一个节点结果，不阻塞检测线程"""
+        if self._writer is not None:
+            self._queue.put({'type': 'result', 'result': result})
+
+    def complete(self):
+        """结果已正式保存，标记本轮结束，下一轮不再从此日志恢复"""
+        self._mark('end', finished_at=time.time())
+        self.run_id = None
+
+    def cancel(self):
+        """任务被取消，已完成的结果仍可由下一轮恢复，但服务启动时不再自动继续"""
+        self._mark('cancel', cancelled_at=time.time())
+
+    def _mark(self, kind: str, **fields):
+        self.close()
+        if self.run_id is None:
+            return
+        try:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                self._write_line(f, {'type': kind, 'run_id': self.run_id, **fields})
+        except Exception as e:
+            self.logger.error(f"写入结果日志失败: {e}")
+
+    def resumable(self) -> Optional[Dict]:
+        """被中断（而非取消）且仍在恢复时限内的检测的 run 记录，没有时返回None"""
+        if not self.enabled:
+            return None
+        previous = self.read(self.journal_file)
+        if not previous or previous['finished'] or previous['cancelled']:
+            return None
+        if time.time() - previous['run'].get('started_at', 0) >= self.resume_window:
+            return None
+        return previous['run']
+
+    def close(self):
+        """停止后台写入线程，未标记结束的日志保留用于恢复"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        ResultJournal._active.pop(self.journal_file, None)
+
+    @staticmethod
+    def active_run_id(journal_file: str = "results/current_run.jsonl") -> Optional[str]:
+        """本进程正在写入该日志的检测ID，没有进行中的检测时返回None"""
+        return ResultJournal._active.get(journal_file)
+
+    def _write_loop(self, handle):
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    break
+                self._write_line(handle, record)
+                # 队列暂时为空时再刷新，结果密集到达时合并写入
+                if self._queue.empty():
+                    handle.flush()
+        except Exception as e:
+            self.logger.error(f"写入结果日志失败: {e}")
+        finally:
+            handle.close()
+
+    @staticmethod
+    def _write_line(handle, record: Dict):
+        handle.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    @staticmethod
+    def read(journal_file: str = "results/current_run.jsonl") -> Optional[Dict]:
+        """读取结果日志，返回 {'run', 'results', 'finished', 'cancelled'}，不存在或无效时返回None
+
+        同一节点出现多次时以最后一条为准，末尾写了一半的行会被忽略。
+        """
+        if not os.path.exists(journal_file):
+            return None
+
+        try:
+            with open(journal_file, 'r', encoding='utf-8') as f:
+                return ResultJournal.parse(f)
+        except Exception as e:
+            LoggerManager.get_logger().error(f"读取结果日志失败: {e}")
+            return None
+
+    @staticmethod
+    def parse(lines: Iterable[str]) -> Optional[Dict]:
+        """解析结果日志的各行，格式同 read()"""
+        run = None
+        results: Dict[str, Dict] = {}
+        finished = False
+        cancelled = False
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            kind = record.get('type')
+            if kind == 'run':
+                run = record
+            elif kind == 'result':
+                result = record['result']
+                results[result.get('fingerprint') or result.get('name')] = result
+            elif kind == 'end':
+                finished = True
+            elif kind == 'cancel':
+                cancelled = True
+            elif kind == 'resume':
+                cancelled = False
+                # 恢复后由新的检测继续写入，之后的记录使用新的检测ID
+                if run is not None and record.get('run_id'):
+                    run = {**run, 'run_id': record['run_id']}
+
+        if run is None:
+            return None
+        return {'run': run, 'results': list(results.values()), 'finished': finished, 'cancelled': cancelled}
+
+    @staticmethod
+    def to_partial(journal: Optional[Dict]) -> Optional[Dict]:
+        """将未完成的日志转换为接口返回的部分结果，已结束、已取消或不存在时返回None
+
+        中断后留下的日志同样是未完成的，调用方需用 active_run_id() 确认检测仍在进行。
+        """
+        if not journal or journal['finished'] or journal.get('cancelled'):
+            return None
+        run = journal['run']
+        return {
+            'run_id': run.get('run_id'),
+            'started_at': run.get('started_at'),
+            'total': run.get('total', 0),
+            'completed': len(journal['results']),
+            'results': journal['results']
+        }
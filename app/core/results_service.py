@@ -0,0 +1,187 @@
+"""
+检测结果读取服务 - 常驻内存，供Web接口复用
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.logger import LoggerManager
+from app.core.result_index import ResultIndex
+from app.core.result_journal import ResultJournal
+
+
+# 小于该大小的响应体压缩收益不大，直接返回
+GZIP_MIN_SIZE = 1024
+
+
+class CachedBody:
+    """序列化好的响应体，附带ETag，压缩结果按需生成一次后复用"""
+
+    def __init__(self, body: bytes, last_modified: float):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.last_modified = last_modified
+        self._gzipped: Optional[bytes] = None
+        self._lock = Lock()
+
+    def gzipped(self) -> bytes:
+        with self._lock:
+            if self._gzipped is None:
+                self._gzipped = gzip.compress(self.body, compresslevel=6)
+            return self._gzipped
+
+
+class ResultsService:
+    """检测结果服务 - 单例模式
+
+    按文件的 mtime 和大小判断是否需要重新读取，未变化时直接返回已解析的数据
+    和预先序列化好的响应体；保存结果后也可以主动失效。
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, results_file: str = "results/netflix_check_results.json",
+                 journal_file: str = "results/current_run.jsonl"):
+        if self._initialized:
+            return
+        self.logger = LoggerManager.get_logger()
+        self.results_file = results_file
+        self.journal_file = journal_file
+        # 路径 -> (文件状态, 解析后的数据, 原始内容)
+        self._files: Dict[str, Tuple[Tuple[int, int], Any, CachedBody]] = {}
+        self._api_body: Optional[Tuple[Tuple, CachedBody]] = None
+        self._index: Optional[Tuple[Tuple, ResultIndex, Dict]] = None
+        self._cache_lock = Lock()
+        self._initialized = True
+
+    def invalidate(self, path: Optional[str] = None):
+        """丢弃缓存，下次访问时重新读取"""
+        with self._cache_lock:
+            if path is None:
+                self._files.clear()
+            else:
+                self._files.pop(path, None)
+            self._api_body = None
+            self._index = None
+
+    def _load(self, path: str, parse: Callable[[bytes], Any]) -> Optional[Tuple[Tuple[int, int], Any, CachedBody]]:
+        """读取文件，文件未变化时返回缓存；文件不存在返回None"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._cache_lock:
+                self._files.pop(path, None)
+            return None
+
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._cache_lock:
+            cached = self._files.get(path)
+            if cached and cached[0] == key:
+                return cached
+
+        with open(path, 'rb') as f:
+            raw = f.read()
+        entry = (key, parse(raw), CachedBody(raw, stat.st_mtime))
+        with self._cache_lock:
+            self._files[path] = entry
+        return entry
+
+    def get_results(self) -> Optional[Dict]:
+        """最近一次保存的检测结果"""
+        entry = self._load(self.results_file, json.loads)
+        return entry[1] if entry else None
+
+    def get_current_run(self) -> Optional[Dict]:
+        """正在进行的检测已得出的部分结果"""
+        return self._current_run(self._load(self.journal_file, self._parse_journal))
+
+    def _current_run(self, entry) -> Optional[Dict]:
+        """结果日志中的部分结果，仅当本进程正在写入同一轮日志时有效
+
+        进程中断或保存结果失败时日志会停留在未完成状态，此时不再当作进行中的检测，
+        以免遮住最近一次保存的结果。
+        """
+        current_run = entry[1] if entry else None
+        if current_run and current_run['run_id'] == ResultJournal.active_run_id(self.journal_file):
+            return current_run
+        return None
+
+    def _cache_key(self, results_entry, journal_entry) -> Tuple:
+        return (results_entry[0] if results_entry else None,
+                journal_entry[0] if journal_entry else None,
+                ResultJournal.active_run_id(self.journal_file))
+
+    @staticmethod
+    def _parse_journal(raw: bytes) -> Optional[Dict]:
+        return ResultJournal.to_partial(ResultJournal.parse(raw.decode('utf-8', 'replace').splitlines()))
+
+    def results_body(self) -> CachedBody:
+        """/api/results 的响应体，结果文件和结果日志都未变化时直接复用"""
+        results_entry = self._load(self.results_file, json.loads)
+        journal_entry = self._load(self.journal_file, self._parse_journal)
+        key = self._cache_key(results_entry, journal_entry)
+
+        with self._cache_lock:
+            if self._api_body and self._api_body[0] == key:
+                return self._api_body[1]
+
+        results = results_entry[1] if results_entry else None
+        current_run = self._current_run(journal_entry)
+        payload = {'success': True, 'results': results, 'current_run': current_run}
+        if not results and not current_run:
+            payload['message'] = '暂无检测结果'
+
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        last_modified = max([e[2].last_modified for e in (results_entry, journal_entry) if e] or [0])
+        cached = CachedBody(body, last_modified)
+        with self._cache_lock:
+            self._api_body = (key, cached)
+        return cached
+
+    def result_index(self) -> Tuple[ResultIndex, Dict]:
+        """分页查询用的结果索引及汇总信息
+
+        检测进行中时索引本轮已得出的结果，否则索引最近一次保存的结果；
+        数据未变化时复用同一个索引。
+        """
+        results_entry = self._load(self.results_file, json.loads)
+        journal_entry = self._load(self.journal_file, self._parse_journal)
+        key = self._cache_key(results_entry, journal_entry)
+
+        with self._cache_lock:
+            if self._index and self._index[0] == key:
+                return self._index[1], self._index[2]
+
+        results = results_entry[1] if results_entry else None
+        current_run = self._current_run(journal_entry)
+        if current_run:
+            index = ResultIndex(current_run['results'])
+            meta = {
+                'summary': None,
+                'current_run': {k: v for k, v in current_run.items() if k != 'results'}
+            }
+        else:
+            index = ResultIndex((results or {}).get('results', []))
+            meta = {'summary': (results or {}).get('summary'), 'current_run': None}
+
+        with self._cache_lock:
+            self._index = (key, index, meta)
+        return index, meta
+
+    def download_body(self) -> Optional[CachedBody]:
+        """结果文件原始内容"""
+        entry = self._load(self.results_file, json.loads)
+        return entry[2] if entry else None
@@ -0,0 +1,78 @@
+"""
+检测任务模块 - 任务ID、状态和协作式取消
+"""
+
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+
+class ScanCancelled(Exception):
+    """检测任务被取消"""
+
+
+class ScanRun:
+    """一次检测任务
+
+    取消是协作式的：检测流程在节点之间调用 check_cancelled()，
+    已完成的节点保留在结果日志中，下一轮可以从中恢复。
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    CANCELLING = 'cancelling'
+    CANCELLED = 'cancelled'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+
+    def __init__(self, trigger: str = 'manual'):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.trigger = trigger
+        self.state = self.PENDING
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        # 检测阶段由 NetflixChecker 设置，提供 snapshot()
+        self.progress = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (self.CANCELLED, self.COMPLETED, self.FAILED)
+
+    def start(self):
+        self.state = self.CANCELLING if self.cancelled else self.RUNNING
+
+    def cancel(self) -> bool:
+        """请求取消，任务已结束时返回False"""
+        if self.finished:
+            return False
+        self._cancel_event.set()
+        self.state = self.CANCELLING
+        return True
+
+    def check_cancelled(self):
+        """已请求取消时抛出 ScanCancelled"""
+        if self._cancel_event.is_set():
+            raise ScanCancelled(self.run_id)
+
+    def finish(self, state: str, error: Optional[str] = None):
+        self.state = state
+        self.error = error
+        self.finished_at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            'run_id': self.run_id,
+            'trigger': self.trigger,
+            'state': self.state,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+            'progress': self.progress.snapshot() if self.progress is not None else None
+        }
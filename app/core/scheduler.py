@@ -2,19 +2,36 @@
 定时任务调度模块
 """
 
+import queue
 import threading
-from datetime import datetime
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from croniter import croniter
 
 
+from app.core import metrics
 from app.core.logger import LoggerManager
 from app.core.config import Config
 from app.core.clash_manager import LocalClashManager
 from app.core.netflix_checker import NetflixChecker
+from app.core.jobs import Job, JOB_KINDS, CHECK_NODES, RECHECK_UNLOCKED
+from app.core.result_cache import ResultCache
+from app.core.result_journal import ResultJournal
+from app.core.results_service import ResultsService
+from app.core.scan_run import ScanCancelled, ScanRun
+from app.core.events import EventBus
 
 
 class TaskScheduler:
-    """任务调度器"""
+    """任务调度器
+
+    完整检测同一时间只执行一个；通过任务队列提交的指定节点检测在单独的队列中
+    按顺序执行，使用Clash当前已加载的配置，不会重新加载或重启mihomo。
+    """
+
+    MAX_JOBS = 100
 
     def __init__(self, config: Config):
         self.config = config
@@ -23,6 +40,21 @@ class TaskScheduler:
         self._thread = None
         self._stop_event = threading.Event()
         self._task_running = False
+        self._last_run_end = None
+        # 调度器启动时间，还没有执行过检测时按到期时间提前执行的间隔从这里算起
+        self._started_at: Optional[datetime] = None
+        # 正在执行或最近一次执行的检测任务
+        self._scan_run: Optional[ScanRun] = None
+        self._scan_lock = threading.Lock()
+        # 下载和应用新配置时节点的监听端口会重新分配，指定节点检测期间不能切换配置
+        self._config_lock = threading.Lock()
+        # 最近一次应用的Clash配置（管理器, 节点列表），指定节点检测复用
+        self._clash_context: Optional[Tuple[LocalClashManager, List[Dict]]] = None
+        # 任务队列：scan 执行完整检测，quick 执行指定节点检测
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._job_queues = {'scan': queue.Queue(), 'quick': queue.Queue()}
+        self._job_workers: Dict[str, threading.Thread] = {}
+        self._jobs_lock = threading.Lock()
 
     def start(self):
         """启动调度器"""
@@ -32,11 +64,19 @@ class TaskScheduler:
 
         self._running = True
         self._stop_event.clear()
+        self._started_at = datetime.now()
         self._thread = threading.Thread(target=self._run, name="TaskScheduler")
         self._thread.daemon = True
         self._thread.start()
         self.logger.info("任务调度器已启动")
 
+        # 服务重启前被中断的检测继续执行，已完成的节点从结果日志恢复
+        if self.config.get('journal.resume_on_start', True):
+            interrupted = ResultJournal(self.config).resumable()
+            if interrupted and not self._task_running:
+                self.logger.info(f"发现未完成的检测 {interrupted.get('run_id')}，继续执行")
+                self.run_task_now(trigger='resume')
+
     def stop(self):
         """停止调度器"""
         if not self._running:
@@ -62,17 +102,226 @@ class TaskScheduler:
         """检查是否有任务在执行"""
         return self._task_running
 
-    def run_task_now(self):
-        """立即执行一次任务"""
-        if self._task_running:
+    def run_task_now(self, trigger: str = 'manual') -> Optional[ScanRun]:
+        """立即执行一次任务，返回新建的检测任务；已有任务在执行时返回None
+
+        检测锁在这里获取后交给执行线程释放，返回的任务一定会被执行。
+        """
+        if not self._scan_lock.acquire(blocking=False):
             self.logger.warning("任务正在执行中，请稍后再试")
-            return False
+            return None
 
-        thread = threading.Thread(target=self._execute_task, name="ImmediateTask")
+        run = ScanRun(trigger)
+        thread = threading.Thread(target=self._execute_locked, args=(run,), name="ImmediateTask")
         thread.daemon = True
-        thread.start()
+        try:
+            thread.start()
+        except Exception:
+            self._scan_lock.release()
+            raise
+        return run
+
+    def get_run(self) -> Optional[Dict]:
+        """正在执行或最近一次执行的检测任务"""
+        run = self._scan_run
+        return run.to_dict() if run is not None else None
+
+    def cancel_run(self, run_id: Optional[str] = None) -> bool:
+        """取消正在执行的检测任务，当前节点检测完成后停止"""
+        run = self._scan_run
+        if run is None or (run_id and run.run_id != run_id):
+            return False
+        if not run.cancel():
+            return False
+        self.logger.info(f"已请求取消检测任务 {run.run_id}")
         return True
 
+    def submit_job(self, kind: str, names: Optional[List[str]] = None) -> Job:
+        """提交任务到队列，返回任务对象"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"不支持的任务类型: {kind}")
+        if kind == CHECK_NODES and not names:
+            raise ValueError("check_nodes 任务需要指定节点名称")
+
+        job = Job(kind, names)
+        lane = 'scan' if job.is_full_scan else 'quick'
+        with self._jobs_lock:
+            self._jobs[job.job_id] = job
+            # 只保留最近的任务记录，排队和执行中的任务不删除
+            for job_id in list(self._jobs):
+                if len(self._jobs) <= self.MAX_JOBS:
+                    break
+                if self._jobs[job_id].run.finished:
+                    del self._jobs[job_id]
+            self._job_queues[lane].put(job)
+            metrics.JOB_QUEUE_DEPTH.set(self._job_queues[lane].qsize(), lane=lane)
+            worker = self._job_workers.get(lane)
+            if worker is None or not worker.is_alive():
+                worker = threading.Thread(target=self._job_loop, args=(lane,), name=f"JobQueue-{lane}", daemon=True)
+                self._job_workers[lane] = worker
+                worker.start()
+
+        self.logger.info(f"已提交任务 {job.job_id} ({kind}" + (f", {len(job.names)} 个节点)" if job.names else ")"))
+        return job
+
+    def get_jobs(self) -> List[Dict]:
+        """最近提交的任务，新提交的在前"""
+        with self._jobs_lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in reversed(jobs)]
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def cancel_job(self, job_id: str) -> bool:
+        """取消排队中或执行中的任务"""
+        job = self.get_job(job_id)
+        if job is None or not job.run.cancel():
+            return False
+        self.logger.info(f"已请求取消任务 {job_id}")
+        return True
+
+    def _job_loop(self, lane: str):
+        """按提交顺序执行一个队列中的任务，空闲一段时间后退出"""
+        jobs = self._job_queues[lane]
+        while True:
+            try:
+                job = jobs.get(timeout=60)
+                metrics.JOB_QUEUE_DEPTH.set(jobs.qsize(), lane=lane)
+            except queue.Empty:
+                with self._jobs_lock:
+                    if jobs.empty():
+                        self._job_workers.pop(lane, None)
+                        return
+                continue
+
+            if job.run.cancelled:
+                job.run.finish(ScanRun.CANCELLED)
+                continue
+            try:
+                if job.is_full_scan:
+                    # 与定时或手动触发的完整检测排队执行
+                    self._execute_task(job.run, wait=True)
+                else:
+                    self._execute_quick_job(job)
+            except Exception as e:
+                self.logger.error(f"任务 {job.job_id} 执行失败: {e}", exc_info=True)
+
+    def _execute_quick_job(self, job: Job):
+        """检测部分节点，结果合并进最近一次保存的结果"""
+        run = job.run
+        run.start()
+        started = time.monotonic()
+        exclusive = False
+        try:
+            # 没有独立监听端口时需要切换GLOBAL，不能与完整检测同时进行；
+            # 先于配置锁获取检测锁，与完整检测的加锁顺序一致
+            manager, proxies = self._get_clash_context()
+            targets, _ = self._job_targets(job, manager, proxies)
+            exclusive = not all(manager.get_listener_port(p.get('name', '')) for p in targets)
+            if exclusive:
+                self._scan_lock.acquire()
+
+            with self._config_lock:
+                # 等待期间可能应用了新配置，重新取节点
+                manager, proxies = self._get_clash_context()
+                targets, missing = self._job_targets(job, manager, proxies)
+                job.summary = {'requested': len(targets) + len(missing), 'missing': missing}
+                if not targets:
+                    run.finish(ScanRun.FAILED, '没有找到可检测的节点')
+                    return
+
+                # 完整检测结束后可能已按 clash.auto_close 关闭了mihomo，未运行时检测结果全部失败，
+                # 不能合并进已保存的结果
+                started_clash = self._ensure_clash_ready(manager, targets)
+                if started_clash is None:
+                    run.finish(ScanRun.FAILED, 'Clash未能启动')
+                    self.logger.error(f"任务 {job.job_id} 失败: Clash未能启动，不合并结果")
+                    return
+
+                try:
+                    self.logger.info(f"任务 {job.job_id} 开始检测 {len(targets)} 个节点")
+                    checker = NetflixChecker(self.config, manager)
+                    results = checker.check_proxies_now(targets, run)
+                    checker.merge_results(results)
+                finally:
+                    # 持有配置锁期间完整检测无法应用新配置，由本任务启动的mihomo可以安全关闭
+                    if started_clash and self.config.get('clash.auto_close', False):
+                        manager.cleanup()
+
+            for status in ('full', 'partial', 'blocked', 'failed'):
+                job.summary[status] = sum(1 for r in results if r['status'] == status)
+            job.summary['results'] = [{k: r.get(k) for k in ('name', 'status', 'region', 'delay', 'details')}
+                                      for r in results]
+            run.finish(ScanRun.COMPLETED)
+            self.logger.info(f"任务 {job.job_id} 完成 - 完全解锁: {job.summary['full']}, "
+                             f"部分解锁: {job.summary['partial']}, 被封锁: {job.summary['blocked']}, "
+                             f"失败: {job.summary['failed']}")
+
+        except ScanCancelled:
+            run.finish(ScanRun.CANCELLED)
+            self.logger.info(f"任务 {job.job_id} 已取消")
+        except Exception as e:
+            run.finish(ScanRun.FAILED, str(e))
+            self.logger.error(f"任务 {job.job_id} 执行失败: {e}", exc_info=True)
+        finally:
+            if exclusive:
+                self._scan_lock.release()
+            metrics.SCAN_DURATION_SECONDS.observe(time.monotonic() - started, kind=job.kind, state=run.state)
+
+    def _get_clash_context(self) -> Tuple[LocalClashManager, List[Dict]]:
+        """最近一次检测使用的Clash管理器和节点，本进程还没有检测过时读取Clash当前配置"""
+        context = self._clash_context
+        if context is not None:
+            return context
+
+        manager = LocalClashManager(self.config)
+        proxies = manager.load_installed_proxies()
+        if not proxies:
+            raise RuntimeError("没有可用的Clash配置，请先执行一次完整检测")
+        self._clash_context = (manager, proxies)
+        return self._clash_context
+
+    def _ensure_clash_ready(self, manager: LocalClashManager, targets: List[Dict]) -> Optional[bool]:
+        """确保承载目标节点的mihomo在运行，返回是否由本次启动，无法启动时返回None"""
+        if manager.pool is not None:
+            # 多实例模式下按需重启崩溃的实例
+            if all(manager.ensure_node_ready(p.get('name', '')) for p in targets):
+                return False
+            return None
+
+        if manager.get_process_status()['running']:
+            return False
+        self.logger.info("Clash未运行，启动后再执行指定节点检测")
+        return True if manager.start_clash() else None
+
+    @staticmethod
+    def _job_targets(job: Job, manager: LocalClashManager, proxies: List[Dict]) -> Tuple[List[Dict], List[str]]:
+        """任务要检测的节点，以及在当前配置中找不到的节点名称"""
+        if job.kind == RECHECK_UNLOCKED:
+            saved = ResultsService().get_results() or {}
+            names = [r['name'] for r in saved.get('results', [])
+                     if r.get('status') in ('full', 'partial') and not r.get('alias_of')]
+        else:
+            names = job.names
+
+        # 去重时折叠的节点由保留的同连接参数节点代为检测
+        kept_name = {alias.get('name'): name for name, aliases in manager.get_proxy_aliases().items()
+                     for alias in aliases}
+        by_name = {p.get('name'): p for p in proxies}
+
+        targets, missing, seen = [], [], set()
+        for name in names:
+            name = kept_name.get(name, name)
+            proxy = by_name.get(name)
+            if proxy is None:
+                missing.append(name)
+            elif name not in seen:
+                seen.add(name)
+                targets.append(proxy)
+        return targets, missing
+
     def _run(self):
         """调度器主循环"""
         cron_expr = self.config.get('schedule.cron', '0 */6 * * *')
@@ -80,59 +329,122 @@ class TaskScheduler:
 
         while self._running:
             try:
-                cron = croniter(cron_expr, datetime.now())
-                next_run = cron.get_next(datetime)
-                wait_seconds = (next_run - datetime.now()).total_seconds()
+                # 手动、任务队列或启动时恢复的检测正在执行时等它结束，
+                # 否则到期时间已过会立即重试并被跳过，循环空转
+                if not self._wait_for_scan():
+                    break
+
+                next_run, reason = self._next_run(cron_expr)
+                wait_seconds = max(0, (next_run - datetime.now()).total_seconds())
 
-                self.logger.info(f"下次执行时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+                self.logger.info(f"下次执行时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')} ({reason})")
 
                 if self._stop_event.wait(timeout=wait_seconds):
                     break
 
                 if self._running:
-                    self._execute_task()
+                    self._execute_task(ScanRun('schedule'))
 
             except Exception as e:
                 self.logger.error(f"调度器错误: {e}", exc_info=True)
                 self._stop_event.wait(timeout=300)
 
-    def _execute_task(self):
-        """执行检查任务"""
-        if self._task_running:
+    def _wait_for_scan(self) -> bool:
+        """等待正在执行的检测结束，调度器停止时返回False"""
+        while self._running and not self._stop_event.is_set():
+            if self._scan_lock.acquire(timeout=1):
+                self._scan_lock.release()
+                return True
+        return False
+
+    def _next_run(self, cron_expr: str) -> Tuple[datetime, str]:
+        """下次执行时间：Cron触发时间和最早到期节点的复检时间中较早的一个
+
+        每轮只检测到期的节点，按到期时间提前触发时至少间隔 schedule.min_interval 秒。
+        """
+        cron_next = croniter(cron_expr, datetime.now()).get_next(datetime)
+        if not self.config.get('cache.enable', True) or not self.config.get('schedule.follow_due', True):
+            return cron_next, '定时'
+
+        due = ResultCache(self.config).next_due()
+        if due is None:
+            return cron_next, '定时'
+
+        # 还没有执行过检测时从调度器启动算起，避免服务启动时有过期节点就立即完整检测
+        due_time = datetime.fromtimestamp(due)
+        last_end = self._last_run_end or self._started_at or datetime.now()
+        min_interval = self.config.get('schedule.min_interval', 1800)
+        due_time = max(due_time, last_end + timedelta(seconds=min_interval))
+        if due_time < cron_next:
+            return due_time, '节点复检到期'
+        return cron_next, '定时'
+
+    def _execute_task(self, run: ScanRun, wait: bool = False):
+        """执行检查任务，wait 为True时等待正在执行的任务结束"""
+        if not self._scan_lock.acquire(blocking=wait):
             self.logger.warning("任务已在执行中，跳过本次执行")
             return
+        self._execute_locked(run)
+
+    def _execute_locked(self, run: ScanRun):
+        """在已持有检测锁时执行完整检测，结束后释放锁"""
+        try:
+            self._execute_scan(run)
+        finally:
+            self._scan_lock.release()
 
+    def _execute_scan(self, run: ScanRun):
         self._task_running = True
+        self._scan_run = run
+        run.start()
+        EventBus.publish('task_state', {'running': True, 'run_id': run.run_id})
         start_time = datetime.now()
+        started = time.monotonic()
         clash_manager = None
         try:
-            self.logger.info(f"开始执行Netflix检查任务")
+            self.logger.info(f"开始执行Netflix检查任务 {run.run_id}")
 
             clash_manager = LocalClashManager(self.config)
-            checker = NetflixChecker(self.config)
+            checker = NetflixChecker(self.config, clash_manager)
 
             urls = self.config.get('proxy_config_urls', [])
             if not urls:
                 self.logger.error("没有配置代理URL")
+                run.finish(ScanRun.FAILED, '没有配置代理URL')
                 return
 
-            self.logger.info(f"开始下载 {len(urls)} 个配置文件")
-            merged_config, all_proxies = clash_manager.download_and_merge_configs(urls)
-
-            if not merged_config:
-                self.logger.error("下载配置失败")
-                return
-
-            self.logger.info(f"成功合并配置，共 {len(all_proxies)} 个代理")
-
-            # 重启Clash
-            if not clash_manager.restart_clash(merged_config):
-                self.logger.error("Clash重启失败")
-                return
-
-            results = checker.check_all_proxies(all_proxies)
-
+            with self._config_lock:
+                self.logger.info(f"开始下载 {len(urls)} 个配置文件")
+                stage_started = time.monotonic()
+                merged_config, all_proxies = clash_manager.download_and_merge_configs(urls)
+                metrics.SCAN_STAGE_SECONDS.observe(time.monotonic() - stage_started, stage='download')
+
+                if not merged_config:
+                    self.logger.error("下载配置失败")
+                    run.finish(ScanRun.FAILED, '下载配置失败')
+                    return
+
+                self.logger.info(f"成功合并配置，共 {len(all_proxies)} 个代理")
+                run.check_cancelled()
+
+                # 应用新配置，Clash运行中时热加载，否则重启
+                stage_started = time.monotonic()
+                applied = clash_manager.apply_config(merged_config)
+                metrics.SCAN_STAGE_SECONDS.observe(time.monotonic() - stage_started, stage='apply')
+                if not applied:
+                    self.logger.error("Clash配置应用失败")
+                    run.finish(ScanRun.FAILED, 'Clash配置应用失败')
+                    return
+                self._clash_context = (clash_manager, all_proxies)
+
+            stage_started = time.monotonic()
+            results = checker.check_all_proxies(all_proxies, run=run)
+            metrics.SCAN_STAGE_SECONDS.observe(time.monotonic() - stage_started, stage='check')
+
+            stage_started = time.monotonic()
             checker.save_results(results)
+            metrics.SCAN_STAGE_SECONDS.observe(time.monotonic() - stage_started, stage='save')
+            run.finish(ScanRun.COMPLETED)
 
             total = len(results)
             unlocked = sum(1 for r in results if r['status'] == 'full')
@@ -151,9 +463,20 @@ class TaskScheduler:
             duration = (datetime.now() - start_time).total_seconds()
             self.logger.info(f"任务执行完成，耗时: {duration:.2f}秒")
 
+        except ScanCancelled:
+            run.finish(ScanRun.CANCELLED)
+            self.logger.info(f"检测任务 {run.run_id} 已取消，已完成的节点保留在结果日志中")
         except Exception as e:
+            run.finish(ScanRun.FAILED, str(e))
             self.logger.error(f"任务执行失败: {e}", exc_info=True)
         finally:
+            if not run.finished:
+                run.finish(ScanRun.FAILED)
+            metrics.SCAN_DURATION_SECONDS.observe(time.monotonic() - started, kind='full_scan', state=run.state)
+            metrics.SCAN_PENDING_NODES.set(0)
             self._task_running = False
+            self._last_run_end = datetime.now()
+            EventBus.publish('task_state', {'running': False, 'run_id': run.run_id, 'state': run.state})
             if clash_manager is not None and self.config.get('clash.auto_close', False):
-                clash_manager.cleanup()
\ No newline at end of file
+                clash_manager.cleanup()
+                self._clash_context = None
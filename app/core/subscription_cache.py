@@ -0,0 +1,61 @@
+"""
+订阅源缓存模块
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.core.logger import LoggerManager
+
+
+class SubscriptionCache:
+    """按订阅URL保存 ETag / Last-Modified 和上次成功下载的订阅原文
+
+    保存原文而不是解析结果，合并时由实际成为基础配置的订阅完整解析，
+    其余订阅只提取节点列表，与订阅在列表中的顺序无关。
+    """
+
+    def __init__(self, cache_dir: str = "temp/subscriptions"):
+        self.logger = LoggerManager.get_logger()
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        return self.cache_dir / f"{key}.meta.json", self.cache_dir / f"{key}.yaml"
+
+    def load(self, url: str) -> Tuple[Dict, Optional[str]]:
+        """读取缓存，返回 (元数据, 订阅原文)，没有缓存时原文为None"""
+        meta_path, data_path = self._paths(url)
+        try:
+            if meta_path.exists() and data_path.exists():
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                with open(data_path, 'r', encoding='utf-8') as f:
+                    return meta, f.read()
+        except Exception as e:
+            self.logger.error(f"读取订阅缓存失败 {url}: {e}")
+        return {}, None
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], text: str):
+        """保存订阅原文和校验信息"""
+        meta_path, data_path = self._paths(url)
+        meta = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': time.time(),
+            'size': len(text)
+        }
+        try:
+            for path, content in ((data_path, text), (meta_path, json.dumps(meta, ensure_ascii=False))):
+                tmp_path = path.with_name(path.name + '.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.error(f"保存订阅缓存失败 {url}: {e}")
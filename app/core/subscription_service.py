@@ -0,0 +1,132 @@
+"""
+解锁节点订阅服务 - 常驻内存，按筛选条件预先生成订阅内容
+"""
+
+import json
+import os
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from app.core import yaml_utils
+from app.core.logger import LoggerManager
+from app.core.results_service import CachedBody
+
+
+# 订阅可选的状态筛选，all 表示完全解锁和部分解锁的节点
+STATUS_FILTERS = {
+    'full': ('full',),
+    'partial': ('partial',),
+    'all': ('full', 'partial')
+}
+SORT_KEYS = ('', 'delay')
+
+
+class SubscriptionService:
+    """订阅服务 - 单例模式
+
+    读取检测结束时写入的节点列表，一次遍历按 状态 × 地区 分组，
+    并为每种 状态 × 地区 × 排序 组合生成YAML响应体，客户端请求时直接返回。
+    节点列表文件的 mtime 变化或保存新结果后重新生成。
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self, nodes_file: str = "results/subscription_nodes.json",
+                 legacy_file: str = "results/netflix_unlocked_proxies.yaml"):
+        if self._initialized:
+            return
+        self.logger = LoggerManager.get_logger()
+        self.nodes_file = nodes_file
+        # 旧版本只生成了完全解锁节点的YAML，没有节点列表时用它作为 full 订阅
+        self.legacy_file = legacy_file
+        self._state: Optional[Tuple[Tuple[int, int], float]] = None
+        self._variants: Dict[Tuple[str, str, str], CachedBody] = {}
+        self._empty: Optional[CachedBody] = None
+        self._build_lock = Lock()
+        self._initialized = True
+
+    def refresh(self):
+        """保存新结果后立即重新生成，客户端请求时不再需要等待"""
+        with self._build_lock:
+            self._state = None
+        self._ensure_built()
+
+    def get(self, status: str = 'full', region: str = '', sort: str = '') -> CachedBody:
+        """获取指定筛选条件的订阅内容，没有匹配节点时返回空订阅"""
+        self._ensure_built()
+        key = (status, region.upper(), sort)
+        return self._variants.get(key) or self._empty
+
+    def _ensure_built(self):
+        try:
+            stat = os.stat(self.nodes_file)
+            file_state = (stat.st_mtime_ns, stat.st_size)
+            mtime = stat.st_mtime
+        except FileNotFoundError:
+            file_state, mtime = None, 0
+
+        with self._build_lock:
+            if self._state is not None and self._state[0] == file_state:
+                return
+            if file_state:
+                nodes = self._load_nodes()
+            elif os.path.exists(self.legacy_file):
+                nodes = self._load_legacy_nodes()
+                mtime = os.path.getmtime(self.legacy_file)
+            else:
+                nodes = []
+            self._variants, self._empty = self._build(nodes, mtime)
+            self._state = (file_state, mtime)
+
+    def _load_nodes(self) -> List[Dict]:
+        try:
+            with open(self.nodes_file, 'r', encoding='utf-8') as f:
+                return json.load(f).get('nodes', [])
+        except Exception as e:
+            self.logger.error(f"读取订阅节点失败: {e}")
+            return []
+
+    def _load_legacy_nodes(self) -> List[Dict]:
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                return [{'status': 'full', 'proxy': p} for p in yaml_utils.extract_proxies(f.read())]
+        except Exception as e:
+            self.logger.error(f"读取订阅文件失败: {e}")
+            return []
+
+    def _build(self, nodes: List[Dict], mtime: float) -> Tuple[Dict[Tuple[str, str, str], CachedBody], CachedBody]:
+        """按状态和地区分组后生成所有组合的订阅内容"""
+        groups: Dict[Tuple[str, str], List[Dict]] = {}
+        for node in nodes:
+            region = (node.get('region') or '').upper()
+            for status, accepted in STATUS_FILTERS.items():
+                if node.get('status') not in accepted:
+                    continue
+                groups.setdefault((status, ''), []).append(node)
+                if region:
+                    groups.setdefault((status, region), []).append(node)
+
+        variants = {}
+        for (status, region), members in groups.items():
+            by_delay = sorted(members, key=lambda n: (n.get('delay') is None, n.get('delay') or 0))
+            for sort, ordered in (('', members), ('delay', by_delay)):
+                variants[(status, region, sort)] = self._render([n['proxy'] for n in ordered], mtime)
+
+        empty = self._render([], mtime)
+        self.logger.info(f"订阅已生成: {len(nodes)} 个节点, {len(variants)} 种筛选组合")
+        return variants, empty
+
+    @staticmethod
+    def _render(proxies: List[Dict], mtime: float) -> CachedBody:
+        body = yaml_utils.dump({'proxies': proxies}, allow_unicode=True,
+                               default_flow_style=False, sort_keys=False)
+        return CachedBody(body.encode('utf-8'), mtime)
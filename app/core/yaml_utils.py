@@ -0,0 +1,62 @@
+"""
+YAML读写工具 - 优先使用libyaml加速
+"""
+
+import re
+from typing import Any, Dict, List
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+    LIBYAML_AVAILABLE = True
+except ImportError:  # 未编译libyaml时使用纯Python实现
+    from yaml import SafeLoader, SafeDumper
+    LIBYAML_AVAILABLE = False
+
+
+# 顶层的 proxies 键（第0列）
+_PROXIES_KEY_RE = re.compile(r'^(?:proxies|"proxies"|\'proxies\')[ \t]*:', re.MULTILINE)
+# 第0列开始的下一个顶层内容行（排除缩进、注释、列表项和空行）
+_TOP_LEVEL_LINE_RE = re.compile(r'^(?![ \t#\-\r\n])', re.MULTILINE)
+# 任意位置的 proxies 键，兼容流式/JSON写法
+_ANY_PROXIES_KEY_RE = re.compile(r'(?:\bproxies|"proxies"|\'proxies\')[ \t]*:')
+
+
+def safe_load(stream) -> Any:
+    """安全加载YAML"""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(data: Any, stream=None, **kwargs):
+    """输出YAML，参数与 yaml.dump 相同"""
+    return yaml.dump(data, stream, Dumper=SafeDumper, **kwargs)
+
+
+def has_proxies_key(text: str) -> bool:
+    """粗略判断文本中是否含有 proxies 键，用于在缓存前排除错误页面等无效订阅"""
+    return bool(_ANY_PROXIES_KEY_RE.search(text))
+
+
+def extract_proxies(text: str) -> List[Dict]:
+    """只解析订阅中的 proxies 列表，不构建整个文档
+
+    按行定位顶层 proxies 键及其后的下一个顶层键，只加载这一段文本；
+    遇到流式写法、锚点引用等无法单独解析的情况时回退为完整解析。
+    """
+    match = _PROXIES_KEY_RE.search(text)
+    if match:
+        line_end = text.find('\n', match.end())
+        next_key = _TOP_LEVEL_LINE_RE.search(text, line_end + 1) if line_end >= 0 else None
+        section = text[match.start():next_key.start() if next_key else len(text)]
+        try:
+            data = safe_load(section)
+            if isinstance(data, dict) and isinstance(data.get('proxies'), list):
+                return data['proxies']
+        except yaml.YAMLError:
+            pass
+
+    data = safe_load(text)
+    if isinstance(data, dict):
+        return data.get('proxies') or []
+    return []
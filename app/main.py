@@ -19,6 +19,7 @@ from app.core.logger import setup_logger
 from app.core.scheduler import TaskScheduler
 from app.core.clash_manager import LocalClashManager
 from app.api.routes import api_bp, set_scheduler
+from app.api.metrics import metrics_bp
 from app.api.websocket import setup_websocket
 
 # 全局变量
@@ -61,6 +62,7 @@ def create_app():
 
     # 注册API蓝图
     flask_app.register_blueprint(api_bp, url_prefix='/api')
+    flask_app.register_blueprint(metrics_bp)
 
     # 设置WebSocket
     setup_websocket(socketio_instance)
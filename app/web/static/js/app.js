@@ -4,7 +4,35 @@
 
 // 全局变量
 let socket = null;
+let lastLogSeq = null;  // 已显示的最新日志序号，重连时只补发之后的日志
 let statusCheckInterval = null;
+let liveRun = null;  // 检测进行中时由进度事件维护的本轮进度
+let liveRenderTimer = null;
+
+// 结果表格只渲染可见的行，按页从接口读取
+const RESULT_PAGE_SIZE = 200;
+const RESULT_ROW_HEIGHT = 33;  // 与 .results-table .result-row td 的高度一致
+const RESULT_VIEWPORT_HEIGHT = 600;
+const RESULT_OVERSCAN = 10;
+const RESULT_MAX_PAGES = 10;
+const resultView = {
+    sort: 'name',
+    order: 'asc',
+    filters: {status: '', region: '', type: '', name: ''},
+    total: 0,
+    pages: new Map(),
+    pending: new Set(),
+    generation: 0,
+    meta: null,       // 最近一次读取的汇总、分面和当前检测
+    loading: false,
+    backlog: [],      // 读取期间到达的本轮推送，读取完成后合并
+    countedThrough: 0, // 已计入汇总和页中的本轮结果数（按结果得出顺序）
+    liveLoadedFor: null
+};
+// 与 app/core/result_index.py 的 STATUS_RANK 一致
+const RESULT_STATUS_RANK = {full: 0, partial: 1, blocked: 2, failed: 3};
+let resultScrollFrame = null;
+let resultFilterTimer = null;
 
 // 初始化
 document.addEventListener('DOMContentLoaded', function() {
@@ -21,8 +49,12 @@ document.addEventListener('DOMContentLoaded', function() {
     updateStatus();
     loadResults();
 
-    // 启动状态检查
-    statusCheckInterval = setInterval(updateStatus, 5000);
+    // 启动状态检查，WebSocket连接正常时状态由推送更新，无需轮询
+    statusCheckInterval = setInterval(function() {
+        if (!socket || !socket.connected) {
+            updateStatus();
+        }
+    }, 5000);
 });
 
 // 认证相关
@@ -88,15 +120,65 @@ function initWebSocket() {
 
     socket.on('connect', function() {
         console.log('WebSocket已连接');
-        socket.emit('join_logs');
+        socket.emit('join_logs', lastLogSeq === null ? {} : {since: lastLogSeq});
+        socket.emit('join_scan');
+        // 断开期间可能错过状态变化，重连后同步一次
+        updateStatus();
+    });
+
+    socket.on('task_state', function(data) {
+        setTaskStatus(data.running);
+    });
+
+    socket.on('scan_started', function(data) {
+        setTaskStatus(true);
+        liveRun = {run_id: data.run_id, stats: data};
+        loadResults();
+    });
+
+    socket.on('scan_progress', function(data) {
+        liveRun = {run_id: data.stats.run_id, stats: data.stats};
+        const results = data.results || [];
+        if (resultView.loading) {
+            resultView.backlog.push({results: results, stats: data.stats});
+            return;
+        }
+        const run = resultView.meta && resultView.meta.current_run;
+        if (!run || run.run_id !== liveRun.run_id) {
+            // 表格仍是上一轮的结果，读取一次本轮已得出的结果，之后只合并推送；
+            // 未启用结果日志时接口没有本轮结果，只更新进度
+            if (resultView.liveLoadedFor !== liveRun.run_id) {
+                resultView.liveLoadedFor = liveRun.run_id;
+                loadResults();
+            }
+            return;
+        }
+        mergeLiveResults(results, data.stats);
+        scheduleLiveRender();
+    });
+
+    socket.on('scan_finished', function() {
+        liveRun = null;
+        loadResults();
+    });
+
+    // 指定节点检测任务的结果已合并
+    socket.on('results_updated', function() {
+        loadResults();
     });
 
     socket.on('logs_history', function(data) {
         displayLogs(data.logs);
+        lastLogSeq = data.last_seq;
     });
 
     socket.on('new_logs', function(data) {
-        appendLogs(data.logs);
+        // 按序号过滤，避免历史日志与推送重叠时重复显示
+        const fresh = lastLogSeq === null ? data.logs : data.logs.filter(log => log.seq > lastLogSeq);
+        appendLogs(fresh);
+        if (data.last_seq !== undefined && (lastLogSeq === null || data.last_seq > lastLogSeq)) {
+            lastLogSeq = data.last_seq;
+        }
     });
 
     socket.on('disconnect', function() {
@@ -265,6 +347,29 @@ async function runNow() {
     }
 }
 
+async function cancelRun() {
+    if (!confirm('确定要取消正在执行的检测吗？已完成的节点会保留，下次执行时继续')) {
+        return;
+    }
+
+    try {
+        const response = await apiRequest('/api/scan/cancel', {
+            method: 'POST'
+        });
+
+        if (response && response.ok) {
+            const data = await response.json();
+            showAlert(data.message, 'info');
+        } else if (response) {
+            const data = await response.json();
+            showAlert(data.error || '取消失败', 'danger');
+        }
+    } catch (error) {
+        console.error('取消检测错误:', error);
+        showAlert('取消失败', 'danger');
+    }
+}
+
 // 状态更新
 async function updateStatus() {
     try {
@@ -285,41 +390,316 @@ async function updateStatus() {
             }
 
             // 更新任务状态
-            const taskStatus = document.getElementById('taskStatus');
-            if (status.task_running) {
-                taskStatus.textContent = '执行中';
-                taskStatus.className = 'badge bg-warning';
-            } else {
-                taskStatus.textContent = '空闲';
-                taskStatus.className = 'badge bg-info';
-            }
+            setTaskStatus(status.task_running);
         }
     } catch (error) {
         console.error('更新状态错误:', error);
     }
 }
 
+function setTaskStatus(running) {
+    const taskStatus = document.getElementById('taskStatus');
+    document.getElementById('cancelRunBtn').classList.toggle('d-none', !running);
+    if (running) {
+        taskStatus.textContent = '执行中';
+        taskStatus.className = 'badge bg-warning';
+    } else {
+        taskStatus.textContent = '空闲';
+        taskStatus.className = 'badge bg-info';
+    }
+}
+
 // 结果管理
+function resultsQuery(page) {
+    const params = new URLSearchParams({
+        offset: page * RESULT_PAGE_SIZE,
+        limit: RESULT_PAGE_SIZE,
+        sort: resultView.sort,
+        order: resultView.order
+    });
+    Object.entries(resultView.filters).forEach(([key, value]) => {
+        if (value) {
+            params.set(key, value);
+        }
+    });
+    return '/api/results?' + params.toString();
+}
+
 async function loadResults() {
+    // 重新读取汇总和当前可见的一页，丢弃已缓存的其他页
+    const generation = ++resultView.generation;
+    const viewport = document.getElementById('resultsViewport');
+    const firstRow = viewport ? Math.floor(viewport.scrollTop / RESULT_ROW_HEIGHT) : 0;
+    const page = Math.floor(firstRow / RESULT_PAGE_SIZE);
+    resultView.loading = true;
+
     try {
-        const response = await apiRequest('/api/results');
+        const response = await apiRequest(resultsQuery(page));
 
         if (response && response.ok) {
             const data = await response.json();
-            displayResults(data.results);
+            if (generation !== resultView.generation) {
+                return;
+            }
+            resultView.pages = new Map([[page, data.items]]);
+            resultView.pending = new Set();
+            resultView.total = data.total;
+            resultView.meta = data;
+            resultView.loading = false;
+            // 读取期间到达的推送可能已包含在本次结果中，合并时跳过已计入的部分
+            const backlog = resultView.backlog;
+            resultView.backlog = [];
+            resultView.countedThrough = data.current_run ? data.current_run.completed : 0;
+            if (data.current_run && liveRun && liveRun.run_id === data.current_run.run_id) {
+                backlog.filter(push => push.stats.run_id === data.current_run.run_id)
+                    .forEach(push => mergeLiveResults(push.results, push.stats));
+            }
+            displayResults(data);
         } else if (response) {
             showAlert('加载结果失败', 'danger');
         }
     } catch (error) {
         console.error('加载结果错误:', error);
         showAlert('加载结果出错', 'danger');
+    } finally {
+        if (generation === resultView.generation) {
+            resultView.loading = false;
+        }
+    }
+}
+
+async function fetchResultsPage(page) {
+    if (resultView.pending.has(page)) {
+        return;
+    }
+    const generation = resultView.generation;
+    const pending = resultView.pending;
+    pending.add(page);
+
+    try {
+        const response = await apiRequest(resultsQuery(page));
+        if (!response || !response.ok || generation !== resultView.generation) {
+            return;
+        }
+        const data = await response.json();
+        if (generation !== resultView.generation) {
+            return;
+        }
+        resultView.pages.set(page, data.items);
+        resultView.total = data.total;
+        // 只保留最近读取的几页
+        for (const key of resultView.pages.keys()) {
+            if (resultView.pages.size <= RESULT_MAX_PAGES) {
+                break;
+            }
+            if (key !== page) {
+                resultView.pages.delete(key);
+            }
+        }
+        renderVisibleRows();
+    } catch (error) {
+        console.error('加载结果错误:', error);
+    } finally {
+        pending.delete(page);
+    }
+}
+
+function scheduleLiveRender() {
+    // 进度事件密集时最多每秒重绘一次汇总和可见的行
+    if (liveRenderTimer) {
+        return;
+    }
+    liveRenderTimer = setTimeout(function() {
+        liveRenderTimer = null;
+        if (resultView.meta && document.getElementById('resultsViewport')) {
+            renderResultsSummary(resultView.meta);
+            updateResultFilters(resultView.meta.facets);
+            renderVisibleRows();
+        }
+    }, 1000);
+}
+
+function mergeLiveResults(results, stats) {
+    // 推送的结果按得出顺序编号，最后一个为 stats.completed；读取时接口已包含前 countedThrough 个，
+    // 只合并之后的结果。新结果按当前排序和筛选插入已读取的页，同步更新汇总的分面计数
+    if (stats.completed <= resultView.countedThrough) {
+        return;
+    }
+    const first = stats.completed - results.length + 1;
+    const fresh = results.filter((item, i) => first + i > resultView.countedThrough);
+    resultView.countedThrough = stats.completed;
+
+    const facets = resultView.meta.facets;
+    // 状态分面直接取本轮的累计计数
+    facets.status = {};
+    Object.entries(stats.counts || {}).forEach(([status, count]) => {
+        if (count) {
+            facets.status[status] = count;
+        }
+    });
+    const countFacets = (item, delta) => {
+        ['region', 'type'].forEach(field => {
+            if (item[field]) {
+                facets[field][item[field]] = (facets[field][item[field]] || 0) + delta;
+                if (facets[field][item[field]] <= 0) {
+                    delete facets[field][item[field]];
+                }
+            }
+        });
+    };
+    fresh.forEach(item => {
+        // 同一节点再次推送时先移除旧结果，状态变化后按新的排序位置和筛选重新插入
+        const previous = removeLoadedResult(item.name);
+        if (previous) {
+            countFacets(previous, -1);
+        }
+        countFacets(item, 1);
+        if (matchesResultFilters(item)) {
+            insertLiveResult(item);
+        }
+    });
+}
+
+function removeLoadedResult(name) {
+    // 从已读取的页中移除同名结果，之后的页依次前移一行；下一页未读取时缺行的页重新读取
+    const pages = Array.from(resultView.pages.keys()).sort((a, b) => a - b);
+    for (const page of pages) {
+        const rows = resultView.pages.get(page);
+        const index = rows.findIndex(row => row.name === name);
+        if (index === -1) {
+            continue;
+        }
+        const previous = rows.splice(index, 1)[0];
+        resultView.total -= 1;
+        for (let current = page; ; current++) {
+            const currentRows = resultView.pages.get(current);
+            const nextRows = resultView.pages.get(current + 1);
+            if (nextRows && nextRows.length) {
+                currentRows.push(nextRows.shift());
+                continue;
+            }
+            if (currentRows.length < Math.min(RESULT_PAGE_SIZE, resultView.total - current * RESULT_PAGE_SIZE)) {
+                dropResultPages(current);
+            }
+            break;
+        }
+        return previous;
+    }
+    return null;
+}
+
+function matchesResultFilters(item) {
+    // 与 ResultIndex.query 的筛选条件一致
+    const filters = resultView.filters;
+    if (filters.status && !filters.status.split(',').includes(item.status)) {
+        return false;
+    }
+    if (filters.region && (item.region || '').toUpperCase() !== filters.region.toUpperCase()) {
+        return false;
+    }
+    if (filters.type && item.type !== filters.type) {
+        return false;
     }
+    return !filters.name || String(item.name || '').toLowerCase().startsWith(filters.name.toLowerCase());
 }
 
-function displayResults(results) {
+function compareCodePoints(a, b) {
+    // 按码点比较，与后端的字符串排序一致（节点名常含表情符号等补充平面字符）
+    const x = Array.from(a);
+    const y = Array.from(b);
+    for (let i = 0; i < Math.min(x.length, y.length); i++) {
+        if (x[i] !== y[i]) {
+            return x[i].codePointAt(0) - y[i].codePointAt(0);
+        }
+    }
+    return x.length - y.length;
+}
+
+function compareResults(a, b, field) {
+    // 与 result_index._sort_key 一致：状态按可用程度，缺少的值排在最后
+    if (field === 'status') {
+        const rank = item => item.status in RESULT_STATUS_RANK ? RESULT_STATUS_RANK[item.status] : 9;
+        return rank(a) - rank(b);
+    }
+    const missingA = a[field] === null || a[field] === undefined;
+    const missingB = b[field] === null || b[field] === undefined;
+    if (missingA !== missingB) {
+        return missingA ? 1 : -1;
+    }
+    if (field === 'delay') {
+        return (a.delay || 0) - (b.delay || 0);
+    }
+    return compareCodePoints(String(a[field] || '').toLowerCase(), String(b[field] || '').toLowerCase());
+}
+
+function insertLiveResult(item) {
+    // 后端按结果到达顺序稳定排序，降序时整体反转，新结果排在相同值的最后（降序时最前）
+    const descending = resultView.order === 'desc';
+    const before = row => {
+        const result = compareResults(item, row, resultView.sort);
+        return descending ? result >= 0 : result < 0;
+    };
+    resultView.total += 1;
+
+    const pages = Array.from(resultView.pages.keys()).sort((a, b) => a - b);
+    for (const page of pages) {
+        const rows = resultView.pages.get(page);
+        if (page > 0 && !resultView.pages.has(page - 1) && rows.length && before(rows[0])) {
+            // 插入位置在未读取的范围内，之后的页整体后移一行，滚动到时重新读取
+            dropResultPages(page);
+            return;
+        }
+        const index = rows.findIndex(before);
+        if (index === -1) {
+            if (rows.length < RESULT_PAGE_SIZE) {
+                rows.push(item);
+                return;
+            }
+            continue;
+        }
+
+        rows.splice(index, 0, item);
+        // 每页超出的最后一行移入下一页，下一页未读取时之后的页都已错位
+        let next = page + 1;
+        let carry = rows.length > RESULT_PAGE_SIZE ? rows.pop() : null;
+        while (carry) {
+            const nextRows = resultView.pages.get(next);
+            if (!nextRows) {
+                dropResultPages(next + 1);
+                return;
+            }
+            nextRows.unshift(carry);
+            carry = nextRows.length > RESULT_PAGE_SIZE ? nextRows.pop() : null;
+            next += 1;
+        }
+        return;
+    }
+}
+
+function dropResultPages(fromPage) {
+    for (const page of Array.from(resultView.pages.keys())) {
+        if (page >= fromPage) {
+            resultView.pages.delete(page);
+        }
+    }
+}
+
+function runProgress(run) {
+    const stats = liveRun && liveRun.run_id === run.run_id ? liveRun.stats : null;
+    let progress = `${stats ? stats.completed : run.completed}/${run.total}`;
+    if (stats && stats.rate) {
+        progress += ` · ${stats.rate} 节点/秒`;
+    }
+    if (stats && stats.eta_time) {
+        progress += ` · 预计 ${new Date(stats.eta_time).toLocaleTimeString('zh-CN')} 完成`;
+    }
+    return progress;
+}
+
+function displayResults(data) {
     const container = document.getElementById('resultsContainer');
 
-    if (!results || !results.results) {
+    if (!data || (!data.summary && !data.current_run)) {
         container.innerHTML = `
             <div class="text-center text-muted py-5">
                 <i class="fas fa-inbox fa-3x mb-3"></i>
@@ -329,97 +709,240 @@ function displayResults(results) {
         return;
     }
 
-    const summary = results.summary;
-    const items = results.results;
-
-    // 构建HTML
-    let html = `
-        <div class="mb-3">
-            <h5>检测概况</h5>
-            <div class="row g-3">
-                <div class="col-md-3">
-                    <div class="card text-center">
-                        <div class="card-body">
-                            <h3 class="text-primary">${summary.total}</h3>
-                            <small class="text-muted">总计</small>
-                        </div>
-                    </div>
-                </div>
-                <div class="col-md-3">
-                    <div class="card text-center">
-                        <div class="card-body">
-                            <h3 class="text-success">${summary.full}</h3>
-                            <small class="text-muted">完全解锁</small>
-                        </div>
-                    </div>
-                </div>
-                <div class="col-md-3">
-                    <div class="card text-center">
-                        <div class="card-body">
-                            <h3 class="text-warning">${summary.partial}</h3>
-                            <small class="text-muted">部分解锁</small>
-                        </div>
-                    </div>
-                </div>
-                <div class="col-md-3">
-                    <div class="card text-center">
-                        <div class="card-body">
-                            <h3 class="text-danger">${summary.blocked + summary.failed}</h3>
-                            <small class="text-muted">不可用</small>
-                        </div>
-                    </div>
-                </div>
+    ensureResultsView(container);
+    renderResultsSummary(data);
+    updateResultFilters(data.facets);
+    renderSortIndicators();
+    renderVisibleRows();
+}
+
+function ensureResultsView(container) {
+    // 筛选控件和表格只创建一次，刷新时不影响输入焦点和滚动位置
+    if (document.getElementById('resultsViewport')) {
+        return;
+    }
+
+    container.innerHTML = `
+        <div class="mb-3" id="resultsSummary"></div>
+
+        <div class="row g-2 mb-2 results-filters">
+            <div class="col-md-3">
+                <select class="form-select form-select-sm" id="resultFilterStatus">
+                    <option value="">全部状态</option>
+                    <option value="full,partial">可用（完全+部分）</option>
+                    <option value="full">完全解锁</option>
+                    <option value="partial">部分解锁</option>
+                    <option value="blocked">被封锁</option>
+                    <option value="failed">失败</option>
+                </select>
+            </div>
+            <div class="col-md-2">
+                <select class="form-select form-select-sm" id="resultFilterRegion">
+                    <option value="">全部地区</option>
+                </select>
             </div>
-            <p class="text-muted mt-2">
-                <i class="fas fa-clock"></i> 
-                检测时间: ${new Date(summary.check_time).toLocaleString('zh-CN')}
-            </p>
+            <div class="col-md-2">
+                <select class="form-select form-select-sm" id="resultFilterType">
+                    <option value="">全部类型</option>
+                </select>
+            </div>
+            <div class="col-md-3">
+                <input type="text" class="form-control form-control-sm" id="resultFilterName" placeholder="名称前缀">
+            </div>
+            <div class="col-md-2 text-muted small align-self-center" id="resultsCount"></div>
         </div>
-        
-        <div class="table-responsive">
+
+        <div class="results-viewport" id="resultsViewport">
             <table class="table table-sm table-hover results-table">
                 <thead>
                     <tr>
-                        <th>代理名称</th>
-                        <th>类型</th>
-                        <th>服务器</th>
-                        <th>状态</th>
-                        <th>地区</th>
+                        <th data-sort="name">代理名称</th>
+                        <th data-sort="type">类型</th>
+                        <th data-sort="server">服务器</th>
+                        <th data-sort="status">状态</th>
+                        <th data-sort="region">地区</th>
+                        <th data-sort="delay">延迟</th>
                         <th>详情</th>
                     </tr>
                 </thead>
-                <tbody>
+                <tbody id="resultsBody"></tbody>
+            </table>
+        </div>
     `;
 
-    // 添加结果行
-    items.forEach(item => {
-        const statusClass = item.status;
-        const statusText = {
-            'full': '完全解锁',
-            'partial': '部分解锁',
-            'blocked': '被封锁',
-            'failed': '失败'
-        }[item.status] || '未知';
-
-        html += `
-            <tr>
-                <td>${escapeHtml(item.name)}</td>
-                <td>${item.type || '-'}</td>
-                <td>${item.server || '-'}</td>
-                <td><span class="proxy-status ${statusClass}">${statusText}</span></td>
-                <td>${item.region || '-'}</td>
-                <td>${escapeHtml(item.details)}</td>
-            </tr>
-        `;
+    document.getElementById('resultsViewport').addEventListener('scroll', function() {
+        if (resultScrollFrame === null) {
+            resultScrollFrame = requestAnimationFrame(function() {
+                resultScrollFrame = null;
+                renderVisibleRows();
+            });
+        }
     });
 
-    html += `
-                </tbody>
-            </table>
+    container.querySelectorAll('.results-table th[data-sort]').forEach(th => {
+        th.addEventListener('click', () => setResultsSort(th.dataset.sort));
+    });
+
+    ['Status', 'Region', 'Type'].forEach(name => {
+        document.getElementById('resultFilter' + name).addEventListener('change', applyResultFilters);
+    });
+    document.getElementById('resultFilterName').addEventListener('input', function() {
+        clearTimeout(resultFilterTimer);
+        resultFilterTimer = setTimeout(applyResultFilters, 300);
+    });
+}
+
+function renderResultsSummary(data) {
+    const counts = data.facets.status;
+    const count = status => counts[status] || 0;
+    const total = Object.values(counts).reduce((sum, n) => sum + n, 0);
+    const run = data.current_run;
+    const checkTime = run ? new Date(run.started_at * 1000) : new Date(data.summary.check_time);
+
+    document.getElementById('resultsSummary').innerHTML = `
+        <h5>检测概况</h5>
+        <div class="row g-3">
+            <div class="col-md-3">
+                <div class="card text-center">
+                    <div class="card-body">
+                        <h3 class="text-primary">${total}</h3>
+                        <small class="text-muted">总计</small>
+                    </div>
+                </div>
+            </div>
+            <div class="col-md-3">
+                <div class="card text-center">
+                    <div class="card-body">
+                        <h3 class="text-success">${count('full')}</h3>
+                        <small class="text-muted">完全解锁</small>
+                    </div>
+                </div>
+            </div>
+            <div class="col-md-3">
+                <div class="card text-center">
+                    <div class="card-body">
+                        <h3 class="text-warning">${count('partial')}</h3>
+                        <small class="text-muted">部分解锁</small>
+                    </div>
+                </div>
+            </div>
+            <div class="col-md-3">
+                <div class="card text-center">
+                    <div class="card-body">
+                        <h3 class="text-danger">${count('blocked') + count('failed')}</h3>
+                        <small class="text-muted">不可用</small>
+                    </div>
+                </div>
+            </div>
         </div>
+        <p class="text-muted mt-2">
+            <i class="fas fa-clock"></i> 
+            检测时间: ${checkTime.toLocaleString('zh-CN')}
+            ${run ? `<span class="ms-2"><i class="fas fa-spinner fa-spin"></i> 检测进行中 ${runProgress(run)}</span>` : ''}
+        </p>
     `;
+    document.getElementById('resultsCount').textContent = `共 ${resultView.total} 条`;
+}
+
+function updateResultFilters(facets) {
+    // 地区和类型选项来自本轮结果，保留当前选择
+    [['Region', facets.region, '全部地区'], ['Type', facets.type, '全部类型']].forEach(([name, values, label]) => {
+        const select = document.getElementById('resultFilter' + name);
+        const current = select.value;
+        const options = Object.keys(values).sort();
+        if (current && !options.includes(current)) {
+            options.push(current);
+        }
+        select.innerHTML = `<option value="">${label}</option>` + options.map(value =>
+            `<option value="${escapeHtml(value)}">${escapeHtml(value)} (${values[value] || 0})</option>`
+        ).join('');
+        select.value = current;
+    });
+}
+
+function applyResultFilters() {
+    resultView.filters = {
+        status: document.getElementById('resultFilterStatus').value,
+        region: document.getElementById('resultFilterRegion').value,
+        type: document.getElementById('resultFilterType').value,
+        name: document.getElementById('resultFilterName').value.trim()
+    };
+    document.getElementById('resultsViewport').scrollTop = 0;
+    loadResults();
+}
+
+function setResultsSort(field) {
+    if (resultView.sort === field) {
+        resultView.order = resultView.order === 'asc' ? 'desc' : 'asc';
+    } else {
+        resultView.sort = field;
+        resultView.order = 'asc';
+    }
+    document.getElementById('resultsViewport').scrollTop = 0;
+    loadResults();
+}
+
+function renderSortIndicators() {
+    document.querySelectorAll('.results-table th[data-sort]').forEach(th => {
+        th.classList.toggle('sorted-asc', th.dataset.sort === resultView.sort && resultView.order === 'asc');
+        th.classList.toggle('sorted-desc', th.dataset.sort === resultView.sort && resultView.order === 'desc');
+    });
+}
 
-    container.innerHTML = html;
+function renderVisibleRows() {
+    const viewport = document.getElementById('resultsViewport');
+    const tbody = document.getElementById('resultsBody');
+    if (!viewport || !tbody) {
+        return;
+    }
+
+    const total = resultView.total;
+    if (total === 0) {
+        tbody.innerHTML = '<tr><td colspan="7" class="text-center text-muted py-4">没有符合条件的结果</td></tr>';
+        return;
+    }
+
+    // 只渲染可见范围前后的行，其余高度由占位行撑开
+    const visible = Math.ceil(Math.max(viewport.clientHeight, RESULT_VIEWPORT_HEIGHT) / RESULT_ROW_HEIGHT);
+    const first = Math.max(0, Math.floor(viewport.scrollTop / RESULT_ROW_HEIGHT) - RESULT_OVERSCAN);
+    const last = Math.min(total, first + visible + RESULT_OVERSCAN * 2);
+
+    let html = `<tr class="results-spacer" style="height: ${first * RESULT_ROW_HEIGHT}px"></tr>`;
+    for (let i = first; i < last; i++) {
+        const page = Math.floor(i / RESULT_PAGE_SIZE);
+        const items = resultView.pages.get(page);
+        if (!items) {
+            fetchResultsPage(page);
+        }
+        const item = items ? items[i - page * RESULT_PAGE_SIZE] : null;
+        html += item ? resultRow(item) : '<tr class="result-row"><td colspan="7" class="text-muted">加载中...</td></tr>';
+    }
+    html += `<tr class="results-spacer" style="height: ${(total - last) * RESULT_ROW_HEIGHT}px"></tr>`;
+
+    tbody.innerHTML = html;
+}
+
+function resultRow(item) {
+    const statusText = {
+        'full': '完全解锁',
+        'partial': '部分解锁',
+        'blocked': '被封锁',
+        'failed': '失败'
+    }[item.status] || '未知';
+    const name = escapeHtml(item.name || '');
+    const details = escapeHtml(item.details || '');
+
+    return `
+        <tr class="result-row">
+            <td title="${name}">${name}</td>
+            <td>${escapeHtml(item.type || '-')}</td>
+            <td>${escapeHtml(item.server || '-')}</td>
+            <td><span class="proxy-status ${item.status}">${statusText}</span></td>
+            <td>${escapeHtml(item.region || '-')}</td>
+            <td>${item.delay != null ? item.delay + ' ms' : '-'}</td>
+            <td title="${details}">${details}</td>
+        </tr>
+    `;
 }
 
 async function showResults() {
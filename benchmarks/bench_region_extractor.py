@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+地区提取性能测试
+
+用法:
+    python benchmarks/bench_region_extractor.py [页面目录] [-n 重复次数]
+
+页面目录中放置保存下来的Netflix标题页（*.html），未提供时使用合成页面。
+分别统计旧的逐个re.search实现与RegionExtractor单次扫描的耗时，并校验两者结果一致。
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.region_extractor import CONTENT_REGION_PATTERNS, RegionExtractor
+
+
+def legacy_extract(content: str) -> Optional[Tuple[str, str]]:
+    """旧实现：每次调用按字符串模式逐个搜索整个页面"""
+    patterns = [(pattern, name) for name, pattern in CONTENT_REGION_PATTERNS]
+    for pattern, name in patterns:
+        match = re.search(pattern, content)
+        if match:
+            return match.group(1), name
+    return None
+
+
+def synthetic_pages(count: int = 50, size: int = 400 * 1024) -> List[str]:
+    """生成带随机脚本内容的合成页面，地区信息位于页面末尾附近"""
+    rng = random.Random(42)
+    filler = 'abcdefghijklmnopqrstuvwxyz0123456789{}[]:;,"= '
+    pages = []
+    for i in range(count):
+        body = ''.join(rng.choice(filler) for _ in range(size))
+        region = rng.choice(['US', 'SG', 'JP', 'HK', 'TW', 'GB'])
+        if i % 5 == 0:
+            marker = ''  # 部分页面没有地区信息，需扫描全文
+        elif i % 2 == 0:
+            marker = f'window.netflix.reactContext.models.geo.country = "{region}";'
+        else:
+            marker = f'{{"geoCountry":"{region}"}}'
+        cut = int(size * 0.9)
+        pages.append(f'<html><body>{body[:cut]}{marker}{body[cut:]}</body></html>')
+    return pages
+
+
+def load_corpus(directory: Optional[str]) -> List[str]:
+    """读取页面目录，目录为空或不存在时返回合成页面"""
+    if directory and Path(directory).is_dir():
+        pages = [p.read_text(encoding='utf-8', errors='replace')
+                 for p in sorted(Path(directory).glob('*.html'))]
+        if pages:
+            print(f"已加载 {len(pages)} 个页面: {directory}")
+            return pages
+        print(f"目录中没有 .html 页面: {directory}")
+
+    pages = synthetic_pages()
+    print(f"使用 {len(pages)} 个合成页面")
+    return pages
+
+
+def bench(name: str, func, pages: List[str], repeat: int) -> List:
+    results = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(page) for page in pages]
+    elapsed = time.perf_counter() - started
+    total_mb = sum(len(p) for p in pages) * repeat / 1024 / 1024
+    per_page = elapsed / (len(pages) * repeat) * 1000
+    print(f"{name:<16} 总耗时 {elapsed:8.3f}s  每页 {per_page:8.3f}ms  吞吐 {total_mb / elapsed:8.1f}MB/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='地区提取性能测试')
+    parser.add_argument('corpus', nargs='?', default='benchmarks/corpus/netflix', help='Netflix页面目录')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='重复次数')
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    extractor = RegionExtractor()
+
+    legacy = bench('legacy re.search', legacy_extract, pages, args.repeat)
+    current = bench('RegionExtractor', extractor.extract, pages, args.repeat)
+
+    mismatches = [i for i, (a, b) in enumerate(zip(legacy, current)) if a != b]
+    if mismatches:
+        print(f"结果不一致的页面: {mismatches[:20]}")
+        sys.exit(1)
+    print("两种实现结果一致")
+
+
+if __name__ == '__main__':
+    main()
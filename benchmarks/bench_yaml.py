@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+YAML解析/输出性能测试
+
+用法:
+    python benchmarks/bench_yaml.py [-s 1000 10000 50000] [-r 规则数]
+
+生成包含指定节点数的合成订阅，对比纯Python的 yaml.safe_load / yaml.dump、
+libyaml加速的 yaml_utils.safe_load / yaml_utils.dump 以及只提取节点列表的 extract_proxies。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import yaml_utils
+
+
+def synthetic_config(nodes: int, rules: int) -> dict:
+    """生成合成订阅配置"""
+    proxies = []
+    for i in range(nodes):
+        if i % 3 == 0:
+            proxies.append({
+                'name': f'🇸🇬 新加坡 {i:05d}',
+                'type': 'vmess',
+                'server': f'sg{i}.example.com',
+                'port': 443,
+                'uuid': f'00000000-0000-4000-8000-{i:012d}',
+                'alterId': 0,
+                'cipher': 'auto',
+                'tls': True,
+                'network': 'ws',
+                'ws-opts': {'path': f'/ws/{i}', 'headers': {'Host': f'cdn{i}.example.com'}}
+            })
+        elif i % 3 == 1:
+            proxies.append({
+                'name': f'🇯🇵 日本 {i:05d}',
+                'type': 'ss',
+                'server': f'jp{i}.example.com',
+                'port': 8000 + i % 1000,
+                'cipher': 'aes-256-gcm',
+                'password': f'password-{i}',
+                'udp': True
+            })
+        else:
+            proxies.append({
+                'name': f'🇺🇸 美国 {i:05d}',
+                'type': 'trojan',
+                'server': f'us{i}.example.com',
+                'port': 443,
+                'password': f'trojan-{i}',
+                'sni': f'us{i}.example.com',
+                'skip-cert-verify': False
+            })
+
+    names = [p['name'] for p in proxies]
+    return {
+        'port': 7890,
+        'mode': 'rule',
+        'proxies': proxies,
+        'proxy-groups': [
+            {'name': 'PROXY', 'type': 'select', 'proxies': names},
+            {'name': 'AUTO', 'type': 'url-test', 'proxies': names,
+             'url': 'http://www.gstatic.com/generate_204', 'interval': 300}
+        ],
+        'rules': [f'DOMAIN-SUFFIX,site{i}.example.com,PROXY' for i in range(rules)] + ['MATCH,PROXY']
+    }
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='YAML解析/输出性能测试')
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='节点数量')
+    parser.add_argument('-r', '--rules', type=int, default=5000, help='规则数量')
+    args = parser.parse_args()
+
+    print(f"libyaml可用: {yaml_utils.LIBYAML_AVAILABLE}")
+
+    for size in args.sizes:
+        config = synthetic_config(size, args.rules)
+        text = yaml_utils.dump(config, allow_unicode=True, sort_keys=False)
+        print(f"\n节点数 {size}, 规则数 {args.rules}, 文本 {len(text) / 1024 / 1024:.1f}MB")
+
+        t_py_load, py_data = timed(yaml.safe_load, text)
+        t_c_load, c_data = timed(yaml_utils.safe_load, text)
+        t_extract, proxies = timed(yaml_utils.extract_proxies, text)
+        assert py_data == c_data and proxies == py_data['proxies'], "解析结果不一致"
+
+        t_py_dump, _ = timed(yaml.dump, config, allow_unicode=True, sort_keys=False)
+        t_c_dump, _ = timed(yaml_utils.dump, config, allow_unicode=True, sort_keys=False)
+
+        print(f"  解析  yaml.safe_load            {t_py_load:8.3f}s")
+        print(f"  解析  yaml_utils.safe_load      {t_c_load:8.3f}s  ({t_py_load / t_c_load:5.1f}x)")
+        print(f"  解析  yaml_utils.extract_proxies {t_extract:7.3f}s  ({t_py_load / t_extract:5.1f}x)")
+        print(f"  输出  yaml.dump                 {t_py_dump:8.3f}s")
+        print(f"  输出  yaml_utils.dump           {t_c_dump:8.3f}s  ({t_py_dump / t_c_dump:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()